@@ -0,0 +1,127 @@
+"""Local HTTP stand-ins for Google Finance and the BLS API.
+
+Benchmarks point the providers at these so network latency and upstream rate
+limits don't leak into the timings, while the real HTTP client, connection
+pooling and response parsing are still exercised. Faults can make the
+server fail, stall or hang a share of requests, to measure how the HTTP
+client's retries and breaker bound latency against a flaky upstream.
+"""
+from __future__ import annotations
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+from urllib.parse import unquote
+
+from benchmarks import synthetic
+
+QUOTE_PATH = "/finance/quote/"
+BLS_PATH = "/bls/"
+
+
+@dataclass
+class Faults:
+    """Share of requests answered with error_status, delayed, or hung past a client's read timeout.
+
+    Mutable so a running server can switch between healthy and flaky.
+    """
+
+    error_rate: float = 0.0
+    error_status: int = 503
+    delay_seconds: float = 0.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 2.0
+    seed: int = 0
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rng = random.Random(self.seed)
+
+    def reset(self) -> None:
+        self.error_rate = self.hang_rate = self.delay_seconds = 0.0
+
+    def draw(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+
+@lru_cache(maxsize=4096)
+def _page(symbol: str) -> bytes:
+    return synthetic.quote_page(symbol)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keep-alive, so the Google provider's pooled session reuses connections as it would upstream.
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self._inject_fault():
+            return
+        if not self.path.startswith(QUOTE_PATH):
+            self._send(404, b"not found", "text/plain")
+            return
+        symbol, _, _market = unquote(self.path[len(QUOTE_PATH):]).partition(":")
+        if not synthetic.is_symbol(symbol):
+            self._send(404, b"unknown symbol", "text/plain")
+            return
+        self._send(200, _page(symbol), "text/html; charset=utf-8")
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self._inject_fault():
+            return
+        if not self.path.startswith(BLS_PATH):
+            self._send(404, b"not found", "text/plain")
+            return
+        request = json.loads(body or b"{}")
+        payload = synthetic.bls_payload(
+            request.get("seriesid") or [], int(request["startyear"]), int(request["endyear"])
+        )
+        self._send(200, json.dumps(payload).encode(), "application/json")
+
+    def _inject_fault(self) -> bool:
+        """Apply the server's Faults; returns True if the request was answered with an error."""
+        faults: Faults = self.server.faults
+        if faults.delay_seconds:
+            time.sleep(faults.delay_seconds)
+        draw = faults.draw()
+        if draw < faults.hang_rate:
+            time.sleep(faults.hang_seconds)
+        elif draw < faults.hang_rate + faults.error_rate:
+            self._send(faults.error_status, b"injected failure", "text/plain")
+            return True
+        return False
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up first, e.g. its read timeout fired during an injected hang.
+            pass
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@contextmanager
+def serve(faults: Faults | None = None) -> Iterator[str]:
+    """Run the stub server on a free local port and yield its base URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.faults = faults or Faults()
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="stub-http", daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
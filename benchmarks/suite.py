@@ -0,0 +1,535 @@
+"""Benchmarks for the analysis kernels, repositories and price/CPI providers.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1k,100k,1m] [--repeat 3] [--only PREFIX ...]
+                               [--baseline PATH] [--save] [--threshold 0.25]
+
+Inputs come from benchmarks.synthetic, so every run measures the same work.
+Database benchmarks use a throwaway SQLite file, and provider benchmarks talk
+to the local stub servers in benchmarks.stub_servers rather than the network;
+the .flaky variants turn on the stub server's fault injection to measure how
+far retries and backoff stretch latency.
+
+Each timing benchmark reports the median and fastest of --repeat runs. The
+memory.* benchmarks instead report the bytes their result keeps alive and the
+peak allocated while building it, measured with tracemalloc. When the
+baseline file exists, a median (or retained size) more than --threshold above
+the baseline is a regression and the exit status is 1. --save writes this run's results
+into the baseline (other entries are kept), e.g. after an intended change or
+on a new machine.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+from benchmarks import stub_servers, synthetic
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_THRESHOLD = 0.25
+# Fixed workloads for the provider benchmarks, which don't scale with portfolio size.
+QUOTE_SYMBOLS = 200
+# BeautifulSoup takes ~150 ms per synthetic page, so the parse benchmarks use fewer pages.
+PARSE_PAGES = 20
+# Closes per symbol in the price history benchmark, about ten years of trading days.
+HISTORY_DAYS_PER_SYMBOL = 2500
+BLS_SERIES_IDS = ("CUSR0000SA0", "CUUR0000SA0", "CUSR0000SA0L1E")
+BLS_START_YEAR = "2000"
+# Injected into the stub server for the .flaky benchmarks, with a client policy
+# whose read timeout is shorter than the hang so hung requests are retried.
+FLAKY_FAULTS = {"error_rate": 0.1, "hang_rate": 0.02, "hang_seconds": 1.0}
+FLAKY_POLICY = {
+    "read_timeout": 0.25,
+    "max_attempts": 4,
+    "backoff_base": 0.02,
+    "backoff_cap": 0.2,
+    "total_timeout": 5.0,
+    "failure_threshold": 50,
+}
+STUB_HOST = "127.0.0.1"
+
+_faults = stub_servers.Faults(seed=1)
+
+# prepare(size) builds the inputs and returns the call to time; size is None for fixed workloads.
+Prepare = Callable[[Any], Callable[[], object]]
+
+
+class Benchmark(NamedTuple):
+    name: str
+    prepare: Prepare
+    scaled: bool = True
+    # "time" for wall-clock timings, "memory" for the result's retained size.
+    measure: str = "time"
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(text.rstrip("km")) * multiplier
+
+
+@lru_cache(maxsize=None)
+def _portfolio(size: int):
+    from core.analysis import InflationIndex
+
+    rows = synthetic.purchases(size)
+    return rows, InflationIndex.from_cpi_index(synthetic.cpi_series()), synthetic.current_prices(rows)
+
+
+@lru_cache(maxsize=None)
+def _batch(size: int):
+    from core.batch import PurchaseBatch
+
+    return PurchaseBatch.from_rows(_portfolio(size)[0])
+
+
+@lru_cache(maxsize=None)
+def _sales(size: int):
+    return synthetic.sales(_portfolio(size)[0])
+
+
+def _prepare_analyze(size: int) -> Callable[[], object]:
+    from core.analysis import analyze
+
+    rows, index, prices = _portfolio(size)
+    return lambda: analyze(rows, index, prices)
+
+
+def _prepare_analyze_vectorized(size: int) -> Callable[[], object]:
+    from core.analysis_vectorized import analyze_vectorized
+
+    rows, index, prices = _portfolio(size)
+    return lambda: analyze_vectorized(rows, index, prices)
+
+
+def _prepare_analyze_batch(size: int) -> Callable[[], object]:
+    from core.analysis import analyze
+
+    _, index, prices = _portfolio(size)
+    batch = _batch(size)
+    return lambda: analyze(batch, index, prices)
+
+
+def _prepare_analyze_vectorized_batch(size: int) -> Callable[[], object]:
+    from core.analysis_vectorized import analyze_vectorized
+
+    _, index, prices = _portfolio(size)
+    batch = _batch(size)
+    return lambda: analyze_vectorized(batch, index, prices)
+
+
+def _prepare_analyze_deflators(size: int) -> Callable[[], object]:
+    from core.analysis import InflationIndex, analyze_deflators
+
+    rows, _, prices = _portfolio(size)
+    indexes = {f"cpi-{seed}": InflationIndex.from_cpi_index(synthetic.cpi_series(seed=seed)) for seed in range(3)}
+    return lambda: analyze_deflators(rows, indexes, prices)
+
+
+def _prepare_compute_returns(size: int) -> Callable[[], object]:
+    from core.returns import compute_returns
+
+    rows, index, prices = _portfolio(size)
+    return lambda: compute_returns(rows, index, prices, date(2025, 1, 1))
+
+
+def _prepare_match_lots(method: str) -> Prepare:
+    def prepare(size: int) -> Callable[[], object]:
+        from core.lots import match_lots
+
+        rows, index, prices = _portfolio(size)
+        sale_rows = _sales(size)
+        return lambda: match_lots(rows, sale_rows, index, prices, method)
+
+    return prepare
+
+
+def _prepare_convert_rows(size: int) -> Callable[[], object]:
+    from core.currency import FxRateTable, convert_rows, currency_for_market
+
+    rows, _, _ = _portfolio(size)
+    currencies = {
+        p["symbol"]: {"GBX": "GBP"}.get(code, code)
+        for p in rows
+        for code in [currency_for_market(p["market"], "USD")]
+    }
+    history = {
+        currency: synthetic.fx_history(date(2004, 12, 1), date(2025, 1, 31), seed=i)
+        for i, currency in enumerate(("GBP", "EUR"))
+    }
+    keys = [(currencies[p["symbol"]], p["purchase_date"]) for p in rows if currencies[p["symbol"]] != "USD"]
+
+    def run() -> object:
+        fx = FxRateTable.from_history("USD", history, keys)
+        return convert_rows(rows, currencies, fx)
+
+    return run
+
+
+_db_size: int | None = None
+_history_size: int | None = None
+
+
+def _reset_db() -> None:
+    global _db_size
+    from data.db import db
+    from data.models import PurchaseMonthSummary, ShareMarketMap, SharePurchase, ShareSale
+
+    with db.atomic():
+        for model in (ShareSale, PurchaseMonthSummary, SharePurchase, ShareMarketMap):
+            model.delete().execute()
+    _db_size = None
+
+
+def _populated_history(size: int) -> List[str]:
+    """Fill PriceHistory with `size` closes spread over symbols of HISTORY_DAYS_PER_SYMBOL days each."""
+    global _history_size
+    from data.db import db
+    from data.models import PriceHistory, PriceHistoryState
+    from data.repositories import save_price_history
+
+    names = synthetic.symbols(max(1, size // HISTORY_DAYS_PER_SYMBOL))
+    if _history_size != size:
+        with db.atomic():
+            PriceHistory.delete().execute()
+            PriceHistoryState.delete().execute()
+        for symbol in names:
+            save_price_history(symbol, synthetic.daily_closes(symbol, min(size, HISTORY_DAYS_PER_SYMBOL)))
+        _history_size = size
+    return names
+
+
+def _purchase_tuples(size: int) -> List[Tuple[str, str, Decimal, Decimal, date]]:
+    return [
+        (p["symbol"], p["market"], p["quantity"], p["cost"], date.fromisoformat(p["purchase_date"]))
+        for p in _portfolio(size)[0]
+    ]
+
+
+def _populated_db(size: int) -> None:
+    global _db_size
+    from data.repositories import bulk_add_share_purchases
+
+    if _db_size != size:
+        _reset_db()
+        bulk_add_share_purchases(_purchase_tuples(size))
+        _db_size = size
+
+
+def _prepare_bulk_add(size: int) -> Callable[[], object]:
+    from data.repositories import bulk_add_share_purchases
+
+    purchases = _purchase_tuples(size)
+    _reset_db()
+    return lambda: bulk_add_share_purchases(purchases)
+
+
+def _prepare_load_purchases(size: int) -> Callable[[], object]:
+    from data.repositories import load_share_purchases_as_rows
+
+    _populated_db(size)
+    return load_share_purchases_as_rows
+
+
+def _prepare_load_purchases_batch(size: int) -> Callable[[], object]:
+    from data.repositories import load_share_purchases_as_batch
+
+    _populated_db(size)
+    return load_share_purchases_as_batch
+
+
+def _prepare_load_summaries(size: int) -> Callable[[], object]:
+    from data.repositories import load_purchase_summaries_as_rows
+
+    _populated_db(size)
+    return load_purchase_summaries_as_rows
+
+
+def _prepare_report_held(batch: bool) -> Prepare:
+    """What `cli report` does before fetching anything: load the held purchases and analyze them."""
+
+    def prepare(size: int) -> Callable[[], object]:
+        from core.analysis import analyze
+        from data.repositories import load_held_purchases_as_batch, load_held_purchases_as_rows
+
+        _populated_db(size)
+        _, index, prices = _portfolio(size)
+        load = load_held_purchases_as_batch if batch else load_held_purchases_as_rows
+        return lambda: analyze(load("USD"), index, prices)
+
+    return prepare
+
+
+def _prepare_load_price_history(size: int) -> Callable[[], object]:
+    from data.repositories import load_price_history
+
+    names = _populated_history(size)
+    symbol = names[len(names) // 2]
+    return lambda: load_price_history(symbol, date(2000, 1, 1), date(2024, 12, 31))
+
+
+def _google_quotes(min_success: float) -> Prepare:
+    def prepare(_: None) -> Callable[[], object]:
+        from infra.google_finance_price_provider import get_prices
+
+        pairs = [{"symbol": symbol, "market": synthetic.market_for(symbol)} for symbol in synthetic.symbols(QUOTE_SYMBOLS)]
+
+        def run() -> object:
+            quotes = list(get_prices(pairs))
+            if len(quotes) < len(pairs) * min_success:
+                raise RuntimeError(f"expected {len(pairs)} quotes from the stub server, got {len(quotes)}")
+            return quotes
+
+        return run
+
+    return prepare
+
+
+def _flaky(prepare: Prepare) -> Prepare:
+    """Run a fixed-workload benchmark against the faulty stub server with the flaky client policy."""
+
+    def prepare_flaky(size: None) -> Callable[[], object]:
+        from infra.http_client import default_http_client
+
+        run = prepare(size)
+
+        def run_flaky() -> object:
+            policy = default_http_client.policy_for(STUB_HOST)
+            default_http_client.set_policy(STUB_HOST, **FLAKY_POLICY)
+            for field, value in FLAKY_FAULTS.items():
+                setattr(_faults, field, value)
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    return run()
+            finally:
+                _faults.reset()
+                default_http_client.set_policy(STUB_HOST, policy)
+
+        return run_flaky
+
+    return prepare_flaky
+
+
+def _prepare_bls_series(_: None) -> Callable[[], object]:
+    from infra.cpi_data_provider import fetch_bls_series
+
+    return lambda: fetch_bls_series(BLS_SERIES_IDS, BLS_START_YEAR)
+
+
+def _quote_page_parse(full: bool) -> Prepare:
+    """Extract the price from PARSE_PAGES synthetic quote pages, by streaming scan or full BeautifulSoup parse."""
+
+    def prepare(_: None) -> Callable[[], object]:
+        from infra.google_finance_price_provider import _CHUNK_SIZE, _soup_price_text, scan_price_text
+
+        pages = [synthetic.quote_page(symbol) for symbol in synthetic.symbols(PARSE_PAGES)]
+
+        def scan(page: bytes) -> object:
+            return scan_price_text(page[i:i + _CHUNK_SIZE] for i in range(0, len(page), _CHUNK_SIZE))[0]
+
+        parse = _soup_price_text if full else scan
+        return lambda: [parse(page) for page in pages]
+
+    return prepare
+
+
+def _prepare_quote_cache_hits(_: None) -> Callable[[], object]:
+    from infra.quote_cache import QuoteCache
+
+    pairs = [{"symbol": symbol, "market": synthetic.market_for(symbol)} for symbol in synthetic.symbols(2000)]
+    cache = QuoteCache(
+        fetcher=lambda misses: [
+            {"symbol": p["symbol"], "price": synthetic.price_for(p["symbol"]), "currency": "USD"} for p in misses
+        ],
+        default_ttl=3600.0,
+    )
+    list(cache.get_prices(pairs))
+    return lambda: list(cache.get_prices(pairs))
+
+
+BENCHMARKS: Tuple[Benchmark, ...] = (
+    Benchmark("analysis.analyze", _prepare_analyze),
+    Benchmark("analysis.analyze_vectorized", _prepare_analyze_vectorized),
+    Benchmark("analysis.analyze.batch", _prepare_analyze_batch),
+    Benchmark("analysis.analyze_vectorized.batch", _prepare_analyze_vectorized_batch),
+    Benchmark("analysis.analyze_deflators", _prepare_analyze_deflators),
+    Benchmark("returns.compute_returns", _prepare_compute_returns),
+    Benchmark("lots.match_lots.fifo", _prepare_match_lots("fifo")),
+    Benchmark("lots.match_lots.average", _prepare_match_lots("average")),
+    Benchmark("currency.convert_rows", _prepare_convert_rows),
+    Benchmark("db.bulk_add_share_purchases", _prepare_bulk_add),
+    Benchmark("db.load_share_purchases_as_rows", _prepare_load_purchases),
+    Benchmark("db.load_share_purchases_as_batch", _prepare_load_purchases_batch),
+    Benchmark("db.load_purchase_summaries_as_rows", _prepare_load_summaries),
+    # The report path; .batch is what cli report runs.
+    Benchmark("report.load_held_and_analyze", _prepare_report_held(batch=False)),
+    Benchmark("report.load_held_and_analyze.batch", _prepare_report_held(batch=True)),
+    # One symbol's ten years out of a table of `size` closes; should not grow with the table.
+    Benchmark("db.load_price_history", _prepare_load_price_history),
+    Benchmark("http.google_finance.get_prices", _google_quotes(1.0), scaled=False),
+    # Retries should recover almost every quote; the timing shows what they cost.
+    Benchmark("http.google_finance.get_prices.flaky", _flaky(_google_quotes(0.98)), scaled=False),
+    Benchmark("http.bls.fetch_bls_series", _prepare_bls_series, scaled=False),
+    Benchmark("http.bls.fetch_bls_series.flaky", _flaky(_prepare_bls_series), scaled=False),
+    Benchmark("parse.quote_page.scan", _quote_page_parse(full=False), scaled=False),
+    Benchmark("parse.quote_page.soup", _quote_page_parse(full=True), scaled=False),
+    Benchmark("cache.quotes.hits", _prepare_quote_cache_hits, scaled=False),
+    Benchmark("memory.load_share_purchases_as_rows", _prepare_load_purchases, measure="memory"),
+    Benchmark("memory.load_share_purchases_as_batch", _prepare_load_purchases_batch, measure="memory"),
+)
+
+
+def _time(benchmark: Benchmark, size: int | None, repeat: int) -> Dict[str, float]:
+    timings: List[float] = []
+    for _ in range(repeat):
+        run = benchmark.prepare(size)
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return {"median_seconds": statistics.median(timings), "min_seconds": min(timings), "repeat": repeat}
+
+
+def _memory(benchmark: Benchmark, size: int | None) -> Dict[str, float]:
+    """Bytes still allocated once the call returns (i.e. held by its result) and the peak while it ran."""
+    run = benchmark.prepare(size)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = run()
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return {"retained_bytes": retained, "peak_bytes": peak}
+
+
+def _measure(benchmark: Benchmark, size: int | None, repeat: int) -> Dict[str, float]:
+    if benchmark.measure == "memory":
+        return _memory(benchmark, size)
+    return _time(benchmark, size, repeat)
+
+
+def _summary(result: Dict[str, float]) -> Tuple[str, str, str]:
+    """The compared metric's key and the result's main and secondary figures, formatted."""
+    if "retained_bytes" in result:
+        return "retained_bytes", _mib(result["retained_bytes"]), f"peak {_mib(result['peak_bytes'])}"
+    return "median_seconds", f"{result['median_seconds'] * 1000:.1f} ms", f"{result['min_seconds'] * 1000:.1f} ms"
+
+
+def _mib(size: float) -> str:
+    return f"{size / 2 ** 20:.2f} MiB"
+
+
+def run_benchmarks(sizes: List[str], repeat: int, only: List[str]) -> Dict[str, Dict[str, float]]:
+    """Run the selected benchmarks and return result key -> timings, printing each as it finishes."""
+    selected = [b for b in BENCHMARKS if not only or any(b.name.startswith(prefix) for prefix in only)]
+    results: Dict[str, Dict[str, float]] = {}
+    for benchmark in selected:
+        for label in sizes if benchmark.scaled else [None]:
+            key = f"{benchmark.name}[{label}]" if label else benchmark.name
+            results[key] = _measure(benchmark, parse_size(label) if label else None, repeat)
+            print(f"  {key}: {_summary(results[key])[1]}", file=sys.stderr)
+    return results
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float
+) -> Tuple[List[List[str]], List[str]]:
+    """Return table rows and the keys whose median (or retained size) is more than `threshold` above the baseline."""
+    rows: List[List[str]] = []
+    regressions: List[str] = []
+    for key, result in results.items():
+        metric, value, detail = _summary(result)
+        base_result = baseline.get(key, {})
+        base = base_result.get(metric)
+        if base:
+            change = result[metric] / base - 1
+            status = "REGRESSION" if change > threshold else ""
+            if status:
+                regressions.append(key)
+            rows.append([key, value, detail, _summary(base_result)[1], f"{change:+.0%}", status])
+        else:
+            rows.append([key, value, detail, "-", "-", "new"])
+    return rows, regressions
+
+
+def _print_table(rows: List[List[str]]) -> None:
+    headers = ["Benchmark", "Median", "Min / peak", "Baseline", "Change", ""]
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+    for line in [headers, ["-" * w for w in widths]] + rows:
+        print("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(line)).rstrip())
+
+
+def _load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"results": {}}
+    with open(path, encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.suite")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated lot counts, e.g. 1k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", default=[], help="run benchmarks whose name starts with one of these")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="write this run's results into the baseline file")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed slowdown, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+
+    # data.db opens DB_PATH at import, so point it at a scratch file before anything imports it.
+    scratch = tempfile.mkdtemp(prefix="financial-report-bench-")
+    os.environ["DB_PATH"] = os.path.join(scratch, "bench.db")
+    os.environ["NO_PROXY"] = ",".join(filter(None, [os.getenv("NO_PROXY"), "127.0.0.1"]))
+    from data.models import init_db
+    from infra import cpi_data_provider, google_finance_price_provider
+
+    try:
+        init_db()
+        with stub_servers.serve(_faults) as base_url:
+            google_finance_price_provider.URL = base_url + stub_servers.QUOTE_PATH
+            cpi_data_provider.BLS_URL = base_url + stub_servers.BLS_PATH
+            results = run_benchmarks(sizes, args.repeat, args.only)
+    finally:
+        from data.db import db
+
+        db.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    baseline = _load_baseline(args.baseline)
+    rows, regressions = compare(results, baseline.get("results", {}), args.threshold)
+    _print_table(rows)
+
+    if args.save:
+        baseline["python"] = platform.python_version()
+        baseline["machine"] = f"{platform.system()} {platform.machine()}"
+        baseline.setdefault("results", {}).update(results)
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} result(s) to {args.baseline}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Deterministic synthetic portfolios, CPI series, FX history and provider payloads.
+
+Every generator takes a seed and returns the same data for the same
+arguments, so benchmark runs on different days and machines measure the same
+work.
+"""
+from __future__ import annotations
+import hashlib
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from core.currency import currency_for_market
+from core.dto import PurchaseLotRow, SaleRow
+
+# USD, pence-quoted GBX and EUR markets, so currency conversion is exercised.
+MARKETS = ("NASDAQ", "NYSE", "LON", "ETR")
+# Google Finance quote pages are a few hundred KB; the price node sits past the head.
+QUOTE_PAGE_BYTES = 300 * 1024
+QUOTE_NODE_OFFSET = 0.6
+
+_CENT = Decimal("0.01")
+
+
+def symbol_count(lots: int) -> int:
+    """Symbols in a portfolio of `lots` purchases: about a thousand lots per symbol, at least 10."""
+    return max(10, min(2000, lots // 1000))
+
+
+def symbols(count: int) -> List[str]:
+    return [f"S{i:04d}" for i in range(count)]
+
+
+def is_symbol(text: str) -> bool:
+    """True for names produced by symbols()."""
+    return text[:1] == "S" and text[1:].isdigit()
+
+
+def market_for(symbol: str) -> str:
+    return MARKETS[int(symbol[1:]) % len(MARKETS)]
+
+
+def price_for(symbol: str) -> Decimal:
+    """Stable current price for a symbol, between 1.00 and 1000.00."""
+    digest = hashlib.blake2b(symbol.encode(), digest_size=4).digest()
+    return Decimal(100 + int.from_bytes(digest, "big") % 99_901) * _CENT
+
+
+def purchases(
+    lots: int, start: date = date(2005, 1, 3), end: date = date(2024, 12, 31), seed: int = 0
+) -> List[PurchaseLotRow]:
+    """`lots` purchases spread over start..end, in purchase_date order like the repositories return them."""
+    rng = random.Random(seed)
+    names = symbols(symbol_count(lots))
+    span = (end - start).days
+    days = sorted(rng.randrange(span + 1) for _ in range(lots))
+    rows: List[PurchaseLotRow] = []
+    for purchase_id, day in enumerate(days, start=1):
+        symbol = names[rng.randrange(len(names))]
+        quantity = Decimal(rng.randint(1, 500))
+        unit_cost = Decimal(rng.randint(100, 100_000)) * _CENT
+        rows.append({
+            "purchase_id": purchase_id,
+            "symbol": symbol,
+            "market": market_for(symbol),
+            "quantity": quantity,
+            "cost": unit_cost,
+            "purchase_date": (start + timedelta(days=day)).isoformat(),
+        })
+    return rows
+
+
+def sales(purchase_rows: Iterable[PurchaseLotRow], fraction: float = 0.2, seed: int = 0) -> List[SaleRow]:
+    """Sales that never oversell: after a `fraction` of purchases, half the symbol's holding is sold the next day."""
+    rng = random.Random(seed)
+    held: Dict[str, Decimal] = {}
+    rows: List[SaleRow] = []
+    for p in purchase_rows:
+        symbol = p["symbol"]
+        held[symbol] = held.get(symbol, Decimal(0)) + p["quantity"]
+        if rng.random() >= fraction:
+            continue
+        quantity = Decimal(int(held[symbol]) // 2)
+        if quantity <= 0:
+            continue
+        held[symbol] -= quantity
+        rows.append({
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": Decimal(rng.randint(100, 100_000)) * _CENT,
+            "sale_date": (date.fromisoformat(p["purchase_date"]) + timedelta(days=1)).isoformat(),
+            "lot_id": None,
+        })
+    rows.sort(key=lambda s: s["sale_date"])
+    return rows
+
+
+def current_prices(purchase_rows: Iterable[PurchaseLotRow]) -> Dict[str, Decimal]:
+    return {symbol: price_for(symbol) for symbol in {p["symbol"] for p in purchase_rows}}
+
+
+def cpi_series(start_year: int = 2005, end_year: int = 2024, seed: int = 0) -> Dict[str, Decimal]:
+    """Monthly CPI drifting up about 0.2% a month with noise, as YYYY-MM -> index."""
+    rng = random.Random(seed)
+    level = 190.0
+    series: Dict[str, Decimal] = {}
+    for year in range(start_year, end_year + 1):
+        for month in range(1, 13):
+            level *= 1.002 + rng.uniform(-0.002, 0.002)
+            series[f"{year:04d}-{month:02d}"] = Decimal(f"{level:.3f}")
+    return series
+
+
+def fx_history(start: date, end: date, seed: int = 0) -> Dict[date, Decimal]:
+    """Business-day rates between start and end that random-walk around 1.25."""
+    rng = random.Random(seed)
+    rate = 1.25
+    history: Dict[date, Decimal] = {}
+    day = start
+    while day <= end:
+        if day.weekday() < 5:
+            rate *= 1 + rng.uniform(-0.005, 0.005)
+            history[day] = Decimal(f"{rate:.6f}")
+        day += timedelta(days=1)
+    return history
+
+
+def daily_closes(symbol: str, days: int, end: date = date(2024, 12, 31)) -> Dict[date, Decimal]:
+    """`days` weekday closes ending at `end`, random-walking from the symbol's current price."""
+    rng = random.Random(symbol)
+    price = float(price_for(symbol))
+    closes: Dict[date, Decimal] = {}
+    day = end
+    while len(closes) < days:
+        if day.weekday() < 5:
+            closes[day] = Decimal(f"{price:.2f}")
+            price = max(0.01, price * (1 + rng.uniform(-0.02, 0.02)))
+        day -= timedelta(days=1)
+    return closes
+
+
+def quote_page(symbol: str, size: int = QUOTE_PAGE_BYTES) -> bytes:
+    """A Google Finance-like quote page of about `size` bytes with the price node part way in."""
+    currency = currency_for_market(market_for(symbol), "USD")
+    price = price_for(symbol)
+    text = {"USD": f"${price:,}", "EUR": f"€{price:,}", "GBX": f"GBX {price * 100:,}"}[currency]
+    node = f'<div class="YMlKec fxKbKc">{text}</div>'.encode()
+    filler = b'<div class="filler">' + b"x" * 80 + b"</div>\n"
+    head_bytes = int(size * QUOTE_NODE_OFFSET)
+    head = filler * (head_bytes // len(filler))
+    tail = filler * (max(0, size - len(head) - len(node)) // len(filler))
+    return b"<html><body>" + head + node + tail + b"</body></html>"
+
+
+def bls_payload(series_ids: Iterable[str], start_year: int, end_year: int) -> Dict[str, object]:
+    """A BLS v2 timeseries response for the requested series and years, newest month first."""
+    result = []
+    for series_id in series_ids:
+        seed = int.from_bytes(hashlib.blake2b(series_id.encode(), digest_size=4).digest(), "big")
+        series = cpi_series(start_year, end_year, seed)
+        data = [
+            {"year": month[:4], "period": f"M{month[5:]}", "periodName": month, "value": str(value)}
+            for month, value in reversed(list(series.items()))
+        ]
+        result.append({"seriesID": series_id, "data": data})
+    return {"status": "REQUEST_SUCCEEDED", "Results": {"series": result}}
@@ -0,0 +1,539 @@
+"""Headless entry point: run the investment analysis without the GUI.
+
+Usage:
+    python -m cli report [--format table|json|csv] [--output PATH] [--backend exact|fast] [--cpi SOURCE]
+    python -m cli deflators [--series SOURCE,SOURCE,...]
+    python -m cli gains [--method fifo|lifo|specific|average] [--format table|json|csv] [--output PATH]
+    python -m cli returns [--format table|json|csv] [--output PATH] [--cpi SOURCE]
+    python -m cli timeline [--format table|json|csv] [--output PATH] [--cpi SOURCE]
+    python -m cli sell SYMBOL QUANTITY PRICE YYYY-MM-DD [--lot PURCHASE_ID]
+    python -m cli backfill
+    python -m cli importcheck
+
+Every command also takes --metrics PATH (record spans and write them as JSON,
+or Prometheus text for .prom) and --profile PATH (cProfile stats, "-" to print).
+
+This module must stay importable without PySide6, matplotlib or pandas so it
+can run from cron or on a server without a display; `importcheck` enforces it.
+"""
+from __future__ import annotations
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import contextlib
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import TYPE_CHECKING, List, TextIO
+
+from core import instrumentation
+from core.formatting import format_currency
+from core.models import CompanyAggregate, LotGains, PortfolioTotals, ReturnMetrics
+
+if TYPE_CHECKING:
+    from core.timeline import ValueTimeline
+
+# Modules a headless report must never pull in.
+FORBIDDEN_IMPORTS = ("PySide6", "matplotlib", "pandas")
+# Cumulative import time budget for `import cli`, in microseconds.
+IMPORT_TIME_BUDGET_US = 1_500_000
+
+# Currency every amount is reported in; foreign holdings are converted with cached daily FX rates.
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "USD")
+# CPI source used to deflate (see infra.cpi_registry), and optional per-currency sources, e.g. "GBP=file:uk_cpi.csv".
+CPI_SERIES = os.getenv("CPI_SERIES", "us-cpi-u-sa")
+CPI_SERIES_BY_CURRENCY = os.getenv("CPI_SERIES_BY_CURRENCY", "")
+
+REPORT_FIELDS = (
+    "total_nominal_invested",
+    "total_real_invested",
+    "total_current_value",
+    "total_nominal_profit",
+    "total_real_profit",
+)
+
+
+def _render_table(headers: List[str], rows: List[List[str]], footer: List[str] | None = None) -> str:
+    """Align columns under a dashed rule: the first left-justified, the rest right. A footer gets its own rule."""
+    body = [headers] + rows + ([footer] if footer else [])
+    widths = [max(len(row[i]) for row in body) for i in range(len(headers))]
+    rule = ["-" * w for w in widths]
+    lines = [headers, rule] + rows + ([rule, footer] if footer else [])
+    return "".join(
+        "  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(line)) + "\n"
+        for line in lines
+    )
+
+
+def _write_table(out: TextIO, companies: List[CompanyAggregate], totals: PortfolioTotals) -> None:
+    headers = ["Symbol", "Invested (Nominal)", "Invested (Real)", "Current Value", "Profit (Nominal)", "Profit (Real)"]
+    rows = [[c.name] + [format_currency(getattr(c, field), BASE_CURRENCY) for field in REPORT_FIELDS] for c in companies]
+    footer = ["TOTAL"] + [format_currency(getattr(totals, field), BASE_CURRENCY) for field in REPORT_FIELDS]
+    out.write(_render_table(headers, rows, footer))
+
+
+def _write_json(out: TextIO, companies: List[CompanyAggregate], totals: PortfolioTotals) -> None:
+    payload = {
+        "companies": [{"name": c.name, **{field: str(getattr(c, field)) for field in REPORT_FIELDS}} for c in companies],
+        "totals": {field: str(getattr(totals, field)) for field in REPORT_FIELDS},
+    }
+    json.dump(payload, out, indent=2)
+    out.write("\n")
+
+
+def _write_csv(out: TextIO, companies: List[CompanyAggregate], totals: PortfolioTotals) -> None:
+    writer = csv.writer(out)
+    writer.writerow(["name", *REPORT_FIELDS])
+    for c in companies:
+        writer.writerow([c.name, *(getattr(c, field) for field in REPORT_FIELDS)])
+    writer.writerow(["TOTAL", *(getattr(totals, field) for field in REPORT_FIELDS)])
+
+
+WRITERS = {"table": _write_table, "json": _write_json, "csv": _write_csv}
+
+GAINS_FIELDS = (
+    "held_quantity",
+    "remaining_cost",
+    "remaining_real_cost",
+    "current_value",
+    "realized_nominal_gain",
+    "realized_real_gain",
+    "unrealized_nominal_gain",
+    "unrealized_real_gain",
+)
+
+
+def _write_gains(out: TextIO, output_format: str, gains: List[LotGains]) -> None:
+    if output_format == "json":
+        json.dump([{"name": g.name, **{field: str(getattr(g, field)) for field in GAINS_FIELDS}} for g in gains], out, indent=2)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["name", *GAINS_FIELDS])
+        for g in gains:
+            writer.writerow([g.name, *(getattr(g, field) for field in GAINS_FIELDS)])
+        return
+    headers = ["Symbol", "Held", "Cost Basis", "Current Value", "Realized", "Realized (Real)", "Unrealized", "Unrealized (Real)"]
+    fields = ("remaining_cost", "current_value", "realized_nominal_gain", "realized_real_gain",
+              "unrealized_nominal_gain", "unrealized_real_gain")
+    rows = [[g.name, f"{g.held_quantity.normalize():f}"] + [format_currency(getattr(g, f), BASE_CURRENCY) for f in fields] for g in gains]
+    out.write(_render_table(headers, rows))
+
+
+RETURN_FIELDS = ("nominal_twr", "real_twr", "nominal_xirr", "real_xirr")
+
+
+def _format_rate(value: float) -> str:
+    return "n/a" if math.isnan(value) else f"{value:.2%}"
+
+
+def _write_returns(out: TextIO, output_format: str, results: List[ReturnMetrics], portfolio: ReturnMetrics) -> None:
+    rows = results + [portfolio]
+    if output_format == "json":
+        # NaN (undefined return) is written as null.
+        json.dump(
+            [{"name": r.name, **{f: None if math.isnan(getattr(r, f)) else getattr(r, f) for f in RETURN_FIELDS}} for r in rows],
+            out,
+            indent=2,
+        )
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["name", *RETURN_FIELDS])
+        for r in rows:
+            writer.writerow([r.name, *(getattr(r, f) for f in RETURN_FIELDS)])
+        return
+    headers = ["Symbol", "TWR", "TWR (Real)", "XIRR", "XIRR (Real)"]
+    table = [[r.name] + [_format_rate(getattr(r, f)) for f in RETURN_FIELDS] for r in rows]
+    out.write(_render_table(headers, table[:-1], table[-1]))
+
+
+TIMELINE_FIELDS = ("nominal_invested", "real_invested", "market_value")
+
+
+def _write_timeline(out: TextIO, output_format: str, timeline: ValueTimeline) -> None:
+    columns = [getattr(timeline, field) for field in TIMELINE_FIELDS]
+    if output_format == "json":
+        payload = {field: [round(float(value), 2) for value in column] for field, column in zip(TIMELINE_FIELDS, columns)}
+        json.dump({"months": timeline.months, **payload}, out, indent=2)
+        out.write("\n")
+        return
+    if output_format == "csv":
+        writer = csv.writer(out)
+        writer.writerow(["month", *TIMELINE_FIELDS])
+        for i, month in enumerate(timeline.months):
+            writer.writerow([month, *(f"{column[i]:.2f}" for column in columns)])
+        return
+    headers = ["Month", "Invested (Nominal)", "Invested (Real)", "Market Value"]
+    rows = [
+        [month] + [format_currency(Decimal(f"{column[i]:.2f}"), BASE_CURRENCY) for column in columns]
+        for i, month in enumerate(timeline.months)
+    ]
+    out.write(_render_table(headers, rows))
+
+
+def report(output_format: str, output_path: str | None, backend: str, cpi_source: str) -> int:
+    from data.models import init_db
+    from core.batch import PurchaseBatch
+    from data.repositories import ensure_purchase_summaries, load_held_purchases_as_batch
+    from infra.cpi_registry import default_cpi_registry
+    from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+    from infra.quote_cache import default_quote_cache
+    from services.investment_service import run_investment_analysis
+
+    init_db()
+    ensure_purchase_summaries()
+    default_quote_cache.persist = True
+    default_quote_cache.revalidate_inline = True
+
+    try:
+        purchases = load_held_purchases_as_batch(BASE_CURRENCY)
+    except ValueError as exc:
+        print(f"Could not match sales to lots: {exc}", file=sys.stderr)
+        return 1
+    if not purchases:
+        print("No holdings found. Add purchases to see analysis.", file=sys.stderr)
+        return 1
+    if isinstance(purchases, PurchaseBatch):
+        initial_year = date.fromordinal(purchases.days[0]).isoformat()
+    else:
+        initial_year = purchases[0]["purchase_date"]
+
+    # Provider warnings go to stderr so stdout carries only the report.
+    with contextlib.redirect_stdout(sys.stderr):
+        companies, totals = run_investment_analysis(
+            purchase_rows=purchases,
+            initial_year=initial_year,
+            cpi_data_provider=default_cpi_registry.provider(cpi_source),
+            backend=backend,
+            fx_rate_provider=CachedFxRateProvider(FrankfurterFxRateProvider()),
+            base_currency=BASE_CURRENCY,
+            local_cpi_providers=default_cpi_registry.providers_by_currency(CPI_SERIES_BY_CURRENCY),
+        )
+
+    writer = WRITERS[output_format]
+    if output_path:
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            writer(out, companies, totals)
+    else:
+        writer(sys.stdout, companies, totals)
+    return 0
+
+
+def gains(method: str, output_format: str, output_path: str | None, cpi_source: str) -> int:
+    from data.models import init_db
+    from data.repositories import load_share_sales_as_rows, iter_share_lots_as_rows
+    from infra.cpi_registry import default_cpi_registry
+    from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+    from infra.quote_cache import default_quote_cache
+    from services.investment_service import run_gains_analysis
+
+    init_db()
+    default_quote_cache.persist = True
+    default_quote_cache.revalidate_inline = True
+
+    purchases = list(iter_share_lots_as_rows())
+    if not purchases:
+        print("No purchases found. Add purchases to see analysis.", file=sys.stderr)
+        return 1
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_gains_analysis(
+                purchase_rows=purchases,
+                sale_rows=load_share_sales_as_rows(),
+                initial_year=purchases[0]["purchase_date"],
+                cpi_data_provider=default_cpi_registry.provider(cpi_source),
+                method=method,
+                fx_rate_provider=CachedFxRateProvider(FrankfurterFxRateProvider()),
+                base_currency=BASE_CURRENCY,
+            )
+    except ValueError as exc:
+        print(f"Could not match sales to lots: {exc}", file=sys.stderr)
+        return 1
+
+    if output_path:
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            _write_gains(out, output_format, results)
+    else:
+        _write_gains(sys.stdout, output_format, results)
+    return 0
+
+
+def returns(output_format: str, output_path: str | None, cpi_source: str) -> int:
+    from data.models import init_db
+    from data.repositories import iter_share_lots_as_rows, load_share_sales_as_rows
+    from infra.cpi_registry import default_cpi_registry
+    from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+    from infra.quote_cache import default_quote_cache
+    from services.investment_service import run_returns_analysis
+
+    init_db()
+    default_quote_cache.persist = True
+    default_quote_cache.revalidate_inline = True
+
+    purchases = list(iter_share_lots_as_rows())
+    if not purchases:
+        print("No purchases found. Add purchases to see analysis.", file=sys.stderr)
+        return 1
+
+    with contextlib.redirect_stdout(sys.stderr):
+        results, portfolio = run_returns_analysis(
+            purchase_rows=purchases,
+            initial_year=purchases[0]["purchase_date"],
+            cpi_data_provider=default_cpi_registry.provider(cpi_source),
+            fx_rate_provider=CachedFxRateProvider(FrankfurterFxRateProvider()),
+            base_currency=BASE_CURRENCY,
+            sale_rows=load_share_sales_as_rows(),
+        )
+
+    if output_path:
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            _write_returns(out, output_format, results, portfolio)
+    else:
+        _write_returns(sys.stdout, output_format, results, portfolio)
+    return 0
+
+
+def timeline(output_format: str, output_path: str | None, cpi_source: str) -> int:
+    from data.models import init_db
+    from data.repositories import iter_share_lots_as_rows, load_month_end_closes, load_share_sales_as_rows
+    from infra.cpi_registry import default_cpi_registry
+    from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+    from infra.quote_cache import default_quote_cache
+    from services.investment_service import run_value_timeline
+
+    init_db()
+    default_quote_cache.persist = True
+    default_quote_cache.revalidate_inline = True
+
+    purchases = list(iter_share_lots_as_rows())
+    if not purchases:
+        print("No purchases found. Add purchases to see analysis.", file=sys.stderr)
+        return 1
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            result = run_value_timeline(
+                purchase_rows=purchases,
+                initial_year=purchases[0]["purchase_date"],
+                cpi_data_provider=default_cpi_registry.provider(cpi_source),
+                monthly_closes=load_month_end_closes({p["symbol"] for p in purchases}),
+                fx_rate_provider=CachedFxRateProvider(FrankfurterFxRateProvider()),
+                base_currency=BASE_CURRENCY,
+                sale_rows=load_share_sales_as_rows(),
+            )
+    except ValueError as exc:
+        print(f"Could not match sales to lots: {exc}", file=sys.stderr)
+        return 1
+
+    if output_path:
+        with open(output_path, "w", newline="", encoding="utf-8") as out:
+            _write_timeline(out, output_format, result)
+    else:
+        _write_timeline(sys.stdout, output_format, result)
+    return 0
+
+
+def deflators(series_names: List[str]) -> int:
+    from data.models import init_db
+    from data.repositories import ensure_purchase_summaries, load_held_purchases_as_rows
+    from infra.cpi_registry import default_cpi_registry
+    from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+    from infra.quote_cache import default_quote_cache
+    from services.investment_service import run_deflator_analysis
+
+    init_db()
+    ensure_purchase_summaries()
+    default_quote_cache.persist = True
+    default_quote_cache.revalidate_inline = True
+
+    try:
+        purchases = load_held_purchases_as_rows(BASE_CURRENCY)
+    except ValueError as exc:
+        print(f"Could not match sales to lots: {exc}", file=sys.stderr)
+        return 1
+    if not purchases:
+        print("No holdings found. Add purchases to see analysis.", file=sys.stderr)
+        return 1
+
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            results = run_deflator_analysis(
+                purchase_rows=purchases,
+                initial_year=purchases[0]["purchase_date"],
+                cpi_series_source=default_cpi_registry,
+                series_names=series_names,
+                fx_rate_provider=CachedFxRateProvider(FrankfurterFxRateProvider()),
+                base_currency=BASE_CURRENCY,
+            )
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 1
+
+    headers = ["Deflator", "Invested (Real)", "Profit (Real)"]
+    rows = [
+        [name, format_currency(totals.total_real_invested, BASE_CURRENCY), format_currency(totals.total_real_profit, BASE_CURRENCY)]
+        for name, (_, totals) in results.items()
+    ]
+    sys.stdout.write(_render_table(headers, rows))
+    return 0
+
+
+def sell(symbol: str, quantity: str, price: str, sale_date: str, lot_id: int | None) -> int:
+    from data.models import init_db
+    from data.repositories import add_share_sale
+
+    try:
+        parsed_quantity = Decimal(quantity)
+        parsed_price = Decimal(price)
+        parsed_date = date.fromisoformat(sale_date)
+    except (InvalidOperation, ValueError) as exc:
+        print(f"Invalid sale: {exc}", file=sys.stderr)
+        return 1
+    if parsed_quantity <= 0 or parsed_price < 0:
+        print("Quantity must be positive and price non-negative.", file=sys.stderr)
+        return 1
+
+    init_db()
+    result = add_share_sale(symbol.upper(), parsed_quantity, parsed_price, parsed_date, lot_id)
+    if not result["success"]:
+        print(f"Could not record sale: {result['error']}", file=sys.stderr)
+        return 1
+    print(f"Recorded sale #{result['sale_id']}: {parsed_quantity} {result['symbol']} at {parsed_price} on {result['sale_date']}")
+    return 0
+
+
+def backfill() -> int:
+    from data.models import init_db
+    from data.repositories import load_first_purchase_dates
+    from infra.twelve_data_price_history_provider import TwelveDataPriceHistoryProvider
+    from services.price_backfill import backfill_price_history
+
+    init_db()
+    written = backfill_price_history(load_first_purchase_dates(), TwelveDataPriceHistoryProvider())
+    for symbol, count in sorted(written.items()):
+        print(f"{symbol}: {count} daily closes stored")
+    if not written:
+        print("Price history is already up to date.")
+    return 0
+
+
+def importcheck() -> int:
+    """Import the report path under -X importtime and fail on forbidden modules or a blown budget."""
+    code = (
+        "import cli, data.repositories, infra.cpi_registry, services.investment_service\n"
+        "import sys\n"
+        f"bad = [m for m in {FORBIDDEN_IMPORTS!r} if m in sys.modules]\n"
+        "sys.exit('forbidden imports: ' + ', '.join(bad) if bad else 0)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"; top-level imports are unindented.
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if cumulative.strip().isdigit() and not name.startswith("  "):
+            total_us += int(cumulative.strip())
+
+    print(f"Cold import of the report path: {total_us / 1000:.1f} ms (budget {IMPORT_TIME_BUDGET_US / 1000:.0f} ms)")
+    if result.returncode != 0:
+        print(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+        return 1
+    if total_us > IMPORT_TIME_BUDGET_US:
+        print("Import time budget exceeded.")
+        return 1
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m cli")
+    parser.add_argument("--metrics", help="record spans and write them here (.prom for Prometheus text, JSON otherwise)")
+    parser.add_argument("--profile", help="write cProfile stats here, or '-' to print the top entries")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report_parser = commands.add_parser("report", help="run the analysis and print a report")
+    report_parser.add_argument("--format", choices=sorted(WRITERS), default="table")
+    report_parser.add_argument("--output", help="write to this file instead of stdout")
+    report_parser.add_argument(
+        "--backend", choices=["exact", "fast"], default=os.getenv("ANALYSIS_BACKEND", "exact")
+    )
+    report_parser.add_argument("--cpi", default=CPI_SERIES, help="CPI source name, bls:<series id> or file:<path>")
+
+    deflators_parser = commands.add_parser("deflators", help="compare real totals under several CPI series")
+    deflators_parser.add_argument(
+        "--series", default="us-cpi-u-sa,us-cpi-u-nsa,us-core-sa", help="comma-separated CPI source names"
+    )
+
+    gains_parser = commands.add_parser("gains", help="match sales to lots and print realized/unrealized gains")
+    gains_parser.add_argument("--method", choices=["fifo", "lifo", "specific", "average"], default="fifo")
+    gains_parser.add_argument("--format", choices=sorted(WRITERS), default="table")
+    gains_parser.add_argument("--output", help="write to this file instead of stdout")
+    gains_parser.add_argument("--cpi", default=CPI_SERIES, help="CPI source name, bls:<series id> or file:<path>")
+
+    returns_parser = commands.add_parser("returns", help="print time-weighted and money-weighted returns")
+    returns_parser.add_argument("--format", choices=sorted(WRITERS), default="table")
+    returns_parser.add_argument("--output", help="write to this file instead of stdout")
+    returns_parser.add_argument("--cpi", default=CPI_SERIES, help="CPI source name, bls:<series id> or file:<path>")
+
+    timeline_parser = commands.add_parser("timeline", help="print invested and market value month by month")
+    timeline_parser.add_argument("--format", choices=sorted(WRITERS), default="table")
+    timeline_parser.add_argument("--output", help="write to this file instead of stdout")
+    timeline_parser.add_argument("--cpi", default=CPI_SERIES, help="CPI source name, bls:<series id> or file:<path>")
+
+    sell_parser = commands.add_parser("sell", help="record a share sale")
+    sell_parser.add_argument("symbol")
+    sell_parser.add_argument("quantity")
+    sell_parser.add_argument("price")
+    sell_parser.add_argument("sale_date", help="YYYY-MM-DD")
+    sell_parser.add_argument("--lot", type=int, help="purchase id of the lot sold (for --method specific)")
+
+    commands.add_parser("backfill", help="fetch missing daily price history for held symbols")
+    commands.add_parser("importcheck", help="check cold-start imports stay headless and within budget")
+
+    args = parser.parse_args(argv)
+    if args.metrics:
+        instrumentation.enable()
+    try:
+        with instrumentation.profile(args.profile):
+            return _run_command(args)
+    finally:
+        if args.metrics:
+            instrumentation.write_metrics(args.metrics)
+
+
+def _run_command(args: argparse.Namespace) -> int:
+    if args.command == "report":
+        return report(args.format, args.output, args.backend, args.cpi)
+    if args.command == "deflators":
+        return deflators([name.strip() for name in args.series.split(",") if name.strip()])
+    if args.command == "gains":
+        return gains(args.method, args.format, args.output, args.cpi)
+    if args.command == "returns":
+        return returns(args.format, args.output, args.cpi)
+    if args.command == "timeline":
+        return timeline(args.format, args.output, args.cpi)
+    if args.command == "sell":
+        return sell(args.symbol, args.quantity, args.price, args.sale_date, args.lot)
+    if args.command == "backfill":
+        return backfill()
+    return importcheck()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,12 @@
 from __future__ import annotations
 from collections import defaultdict
+from dataclasses import dataclass
 from datetime import date
 from decimal import Decimal
 from typing import Dict, Iterable, List, Tuple
 
+from core.batch import PurchaseBatch, from_scaled
+from core.instrumentation import traced
 from core.models import CompanyAggregate, PortfolioTotals
 from core.dto import PurchaseRow
 
@@ -12,75 +15,105 @@ def _month_key(d: date) -> str:
     return f"{d.year:04d}-{d.month:02d}"
 
 
-def calculate_inflation_factor(purchase_date: date, cpi_index: Dict[str, Decimal]) -> Decimal:
-    purchase_month = _month_key(purchase_date)
-    purchase_cpi = cpi_index.get(purchase_month)
-    if purchase_cpi is None:
-        return Decimal("1")
-    latest_cpi = cpi_index[max(cpi_index.keys())]
-    return latest_cpi / purchase_cpi if purchase_cpi != 0 else Decimal("1")
-
-
-def analyze(
-    purchases: Iterable[PurchaseRow],
-    cpi_index: Dict[str, Decimal],
-    current_prices: Dict[str, Decimal],
-) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
-    grouped: Dict[str, List[PurchaseRow]] = defaultdict(list)
-    for p in purchases:
-        grouped[p["symbol"]].append(p)
+_ONE = Decimal("1")
+
+
+@dataclass(frozen=True)
+class InflationIndex:
+    """CPI index precomputed once per analysis: latest CPI and a month -> factor table."""
+
+    latest_cpi: Decimal | None
+    factors: Dict[str, Decimal]
+
+    @classmethod
+    def from_cpi_index(cls, cpi_index: Dict[str, Decimal]) -> InflationIndex:
+        if not cpi_index:
+            return cls(latest_cpi=None, factors={})
+        latest_cpi = cpi_index[max(cpi_index.keys())]
+        factors = {
+            month: latest_cpi / cpi if cpi != 0 else _ONE
+            for month, cpi in cpi_index.items()
+        }
+        return cls(latest_cpi=latest_cpi, factors=factors)
+
+    def factor_for_month(self, month_key: str) -> Decimal:
+        return self.factors.get(month_key, _ONE)
+
+    def factor_for_iso_date(self, iso_date: str) -> Decimal:
+        """Factor for a YYYY-MM-DD string, read from its YYYY-MM prefix without parsing."""
+        return self.factors.get(iso_date[:7], _ONE)
+
+
+def calculate_inflation_factor(purchase_date: date, cpi_index: Dict[str, Decimal] | InflationIndex) -> Decimal:
+    if not isinstance(cpi_index, InflationIndex):
+        cpi_index = InflationIndex.from_cpi_index(cpi_index)
+    return cpi_index.factor_for_month(_month_key(purchase_date))
+
+
+def missing_cpi_months(purchases: Iterable[PurchaseRow] | PurchaseBatch, cpi_index: Dict[str, Decimal]) -> List[str]:
+    """Return the sorted purchase months that have no CPI observation (and so get a factor of 1)."""
+    if isinstance(purchases, PurchaseBatch):
+        months = {iso[:7] for iso in purchases.iso_dates().values()}
+    else:
+        months = {purchase["purchase_date"][:7] for purchase in purchases}
+    return sorted(month for month in months if month not in cpi_index)
+
+
+def analyze_company(
+    name: str,
+    items: Iterable[PurchaseRow],
+    inflation_index: InflationIndex,
+    price: Decimal | None,
+) -> CompanyAggregate:
+    """Aggregate one symbol's purchases; a missing price counts as 0."""
+    company_nominal_invested = Decimal("0")
+    company_real_invested = Decimal("0")
+    company_current_value = Decimal("0")
+    company_nominal_profit = Decimal("0")
+    company_real_profit = Decimal("0")
+
+    if price is None:
+        price = Decimal("0")
+
+    for purchase in items:
+        qty = Decimal(purchase["quantity"])
+        batch_cost = qty * purchase["cost"]
+        batch_current = qty * price
+
+        inflation_factor = inflation_index.factor_for_iso_date(purchase["purchase_date"])
+        adjusted_cost = batch_cost * inflation_factor
+
+        company_nominal_invested += batch_cost
+        company_real_invested += adjusted_cost
+        company_current_value += batch_current
+        company_nominal_profit += batch_current - batch_cost
+        company_real_profit += batch_current - adjusted_cost
+
+    return CompanyAggregate(
+        name=name,
+        total_nominal_invested=company_nominal_invested,
+        total_real_invested=company_real_invested,
+        total_current_value=company_current_value,
+        total_nominal_profit=company_nominal_profit,
+        total_real_profit=company_real_profit,
+    )
 
-    results: List[CompanyAggregate] = []
 
+def totals_from_aggregates(results: Iterable[CompanyAggregate]) -> PortfolioTotals:
     total_nominal_invested = Decimal("0")
     total_real_invested = Decimal("0")
     total_current_value = Decimal("0")
     total_nominal_profit = Decimal("0")
     total_real_profit = Decimal("0")
 
-    for name, items in grouped.items():
-        company_nominal_invested = Decimal("0")
-        company_real_invested = Decimal("0")
-        company_current_value = Decimal("0")
-        company_nominal_profit = Decimal("0")
-        company_real_profit = Decimal("0")
+    for company in results:
+        total_nominal_invested += company.total_nominal_invested
+        total_real_invested += company.total_real_invested
+        total_current_value += company.total_current_value
+        total_nominal_profit += company.total_nominal_profit
+        total_real_profit += company.total_real_profit
 
-        price = current_prices.get(name)
-        if price is None:
-            price = Decimal("0")
-
-        for purchase in items:
-            qty = Decimal(purchase["quantity"])
-            batch_cost = qty * purchase["cost"]
-            batch_current = qty * price
-
-            inflation_factor = calculate_inflation_factor(date.fromisoformat(purchase["purchase_date"]), cpi_index)
-            adjusted_cost = batch_cost * inflation_factor
-
-            company_nominal_invested += batch_cost
-            company_real_invested += adjusted_cost
-            company_current_value += batch_current
-            company_nominal_profit += batch_current - batch_cost
-            company_real_profit += batch_current - adjusted_cost
-
-        results.append(
-            CompanyAggregate(
-                name=name,
-                total_nominal_invested=company_nominal_invested,
-                total_real_invested=company_real_invested,
-                total_current_value=company_current_value,
-                total_nominal_profit=company_nominal_profit,
-                total_real_profit=company_real_profit,
-            )
-        )
-
-        total_nominal_invested += company_nominal_invested
-        total_real_invested += company_real_invested
-        total_current_value += company_current_value
-        total_nominal_profit += company_nominal_profit
-        total_real_profit += company_real_profit
-
-    totals = PortfolioTotals(
+    return PortfolioTotals(
         total_nominal_invested=total_nominal_invested,
         total_real_invested=total_real_invested,
         total_current_value=total_current_value,
@@ -88,7 +121,111 @@ def analyze(
         total_real_profit=total_real_profit,
     )
 
-    return results, totals
+
+def group_by_symbol(purchases: Iterable[PurchaseRow]) -> Dict[str, List[PurchaseRow]]:
+    grouped: Dict[str, List[PurchaseRow]] = defaultdict(list)
+    for p in purchases:
+        grouped[p["symbol"]].append(p)
+    return grouped
+
+
+@traced("analysis.analyze")
+def analyze(
+    purchases: Iterable[PurchaseRow] | PurchaseBatch,
+    cpi_index: Dict[str, Decimal] | InflationIndex,
+    current_prices: Dict[str, Decimal],
+) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
+    inflation_index = (
+        cpi_index if isinstance(cpi_index, InflationIndex) else InflationIndex.from_cpi_index(cpi_index)
+    )
+    if isinstance(purchases, PurchaseBatch):
+        return analyze_batch(purchases, inflation_index, current_prices)
+
+    results: List[CompanyAggregate] = [
+        analyze_company(name, items, inflation_index, current_prices.get(name))
+        for name, items in group_by_symbol(purchases).items()
+    ]
+    return results, totals_from_aggregates(results)
+
+def analyze_batch(
+    batch: PurchaseBatch, inflation_index: InflationIndex, current_prices: Dict[str, Decimal]
+) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
+    """analyze for a PurchaseBatch.
+
+    Scaled quantities and amounts are summed as integers per symbol and per
+    (symbol, month), so Decimal arithmetic runs once per symbol-month instead
+    of once per lot. Values carry the batch's fixed-point scale, and agree with
+    analyze on the equivalent rows up to Decimal rounding.
+    """
+    month_of_day = {day: iso[:7] for day, iso in batch.iso_dates().items()}
+    quantities = [0] * len(batch.symbols)
+    monthly: List[Dict[str, int]] = [defaultdict(int) for _ in batch.symbols]
+    for code, day, quantity, amount in zip(batch.codes, batch.days, batch.quantities, batch.amounts):
+        quantities[code] += quantity
+        monthly[code][month_of_day[day]] += amount
+
+    results: List[CompanyAggregate] = []
+    for code, name in enumerate(batch.symbols):
+        nominal = from_scaled(sum(monthly[code].values()))
+        real = sum(
+            (from_scaled(amount) * inflation_index.factor_for_month(month) for month, amount in monthly[code].items()),
+            Decimal("0"),
+        )
+        current = from_scaled(quantities[code]) * (current_prices.get(name) or Decimal("0"))
+        results.append(CompanyAggregate(
+            name=name,
+            total_nominal_invested=nominal,
+            total_real_invested=real,
+            total_current_value=current,
+            total_nominal_profit=current - nominal,
+            total_real_profit=current - real,
+        ))
+    return results, totals_from_aggregates(results)
+
+
+@traced("analysis.analyze_deflators")
+def analyze_deflators(
+    purchases: Iterable[PurchaseRow],
+    inflation_indexes: Dict[str, InflationIndex],
+    current_prices: Dict[str, Decimal],
+) -> Dict[str, Tuple[List[CompanyAggregate], PortfolioTotals]]:
+    """Run analyze once per deflator in a single pass over the purchases.
+
+    Nominal cost and current value are computed once per purchase; only the
+    real cost is accumulated per deflator. Returns deflator name -> the same
+    (companies, totals) that analyze would return with that index.
+    """
+    names = list(inflation_indexes)
+    nominal: Dict[str, Decimal] = defaultdict(Decimal)
+    current: Dict[str, Decimal] = defaultdict(Decimal)
+    real: Dict[str, List[Decimal]] = {}
+    for purchase in purchases:
+        symbol = purchase["symbol"]
+        qty = Decimal(purchase["quantity"])
+        batch_cost = qty * purchase["cost"]
+        nominal[symbol] += batch_cost
+        current[symbol] += qty * (current_prices.get(symbol) or Decimal("0"))
+        sums = real.get(symbol)
+        if sums is None:
+            sums = real[symbol] = [Decimal("0")] * len(names)
+        for i, name in enumerate(names):
+            sums[i] += batch_cost * inflation_indexes[name].factor_for_iso_date(purchase["purchase_date"])
+
+    results: Dict[str, Tuple[List[CompanyAggregate], PortfolioTotals]] = {}
+    for i, name in enumerate(names):
+        companies = [
+            CompanyAggregate(
+                name=symbol,
+                total_nominal_invested=nominal[symbol],
+                total_real_invested=sums[i],
+                total_current_value=current[symbol],
+                total_nominal_profit=current[symbol] - nominal[symbol],
+                total_real_profit=current[symbol] - sums[i],
+            )
+            for symbol, sums in real.items()
+        ]
+        results[name] = (companies, totals_from_aggregates(companies))
+    return results
 
 def purchase_summary(purchases: Iterable[PurchaseRow]) -> None:
     for purchase in purchases:
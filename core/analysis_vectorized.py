@@ -0,0 +1,108 @@
+from __future__ import annotations
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from core.analysis import InflationIndex
+from core.batch import SCALE, PurchaseBatch
+from core.dto import PurchaseRow
+from core.instrumentation import traced
+from core.models import CompanyAggregate, PortfolioTotals
+
+# The fast backend works in float64, so results agree with the exact Decimal
+# path to within this relative tolerance (plus a sub-cent absolute slack).
+RELATIVE_TOLERANCE = 1e-9
+ABSOLUTE_TOLERANCE = 1e-6
+
+
+# date(1970, 1, 1).toordinal(), to turn day ordinals into numpy dates.
+_EPOCH_ORDINAL = 719163
+
+
+def _to_decimal(value: float) -> Decimal:
+    return Decimal(repr(float(value)))
+
+
+@traced("analysis.analyze_vectorized")
+def analyze_vectorized(
+    purchases: Iterable[PurchaseRow] | PurchaseBatch,
+    cpi_index: Dict[str, Decimal] | InflationIndex,
+    current_prices: Dict[str, Decimal],
+) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
+    """Columnar float64 equivalent of core.analysis.analyze.
+
+    Purchases are loaded into arrays once, inflation factors are joined by
+    month offset, and per-symbol sums are computed with bincount. Companies are
+    returned in first-seen order, like the exact backend. A PurchaseBatch's
+    columns are read in place without building per-row objects.
+    """
+    inflation_index = (
+        cpi_index if isinstance(cpi_index, InflationIndex) else InflationIndex.from_cpi_index(cpi_index)
+    )
+
+    if isinstance(purchases, PurchaseBatch):
+        names = purchases.symbols
+        code_arr = np.frombuffer(purchases.codes, dtype=np.uint32).astype(np.int64)
+        qty_arr = np.frombuffer(purchases.quantities, dtype=np.int64) / SCALE
+        batch_cost = np.frombuffer(purchases.amounts, dtype=np.int64) / SCALE
+        months = (
+            (np.frombuffer(purchases.days, dtype=np.int32) - _EPOCH_ORDINAL).astype("datetime64[D]").astype("datetime64[M]")
+        )
+    else:
+        symbol_codes: Dict[str, int] = {}
+        codes: List[int] = []
+        quantities: List[float] = []
+        costs: List[float] = []
+        dates: List[str] = []
+        for p in purchases:
+            codes.append(symbol_codes.setdefault(p["symbol"], len(symbol_codes)))
+            quantities.append(float(p["quantity"]))
+            costs.append(float(p["cost"]))
+            dates.append(p["purchase_date"])
+
+        names = list(symbol_codes)
+        code_arr = np.asarray(codes, dtype=np.int64)
+        qty_arr = np.asarray(quantities, dtype=np.float64)
+        batch_cost = qty_arr * np.asarray(costs, dtype=np.float64)
+        months = np.asarray(dates, dtype="datetime64[M]")
+    n_symbols = len(names)
+
+    factors = np.ones(len(code_arr), dtype=np.float64)
+    if len(code_arr) and inflation_index.factors:
+        months = months.astype(np.int64)
+        factor_months = np.asarray(list(inflation_index.factors), dtype="datetime64[M]").astype(np.int64)
+        first_month = int(factor_months.min())
+        table = np.ones(int(factor_months.max()) - first_month + 1, dtype=np.float64)
+        table[factor_months - first_month] = [float(f) for f in inflation_index.factors.values()]
+        offsets = months - first_month
+        in_range = (offsets >= 0) & (offsets < len(table))
+        factors[in_range] = table[offsets[in_range]]
+
+    nominal_invested = np.bincount(code_arr, weights=batch_cost, minlength=n_symbols)
+    real_invested = np.bincount(code_arr, weights=batch_cost * factors, minlength=n_symbols)
+    total_quantity = np.bincount(code_arr, weights=qty_arr, minlength=n_symbols)
+    prices = np.asarray([float(current_prices.get(name) or 0) for name in names], dtype=np.float64)
+    current_value = total_quantity * prices
+
+    results: List[CompanyAggregate] = [
+        CompanyAggregate(
+            name=name,
+            total_nominal_invested=_to_decimal(nominal_invested[i]),
+            total_real_invested=_to_decimal(real_invested[i]),
+            total_current_value=_to_decimal(current_value[i]),
+            total_nominal_profit=_to_decimal(current_value[i] - nominal_invested[i]),
+            total_real_profit=_to_decimal(current_value[i] - real_invested[i]),
+        )
+        for i, name in enumerate(names)
+    ]
+
+    totals = PortfolioTotals(
+        total_nominal_invested=_to_decimal(nominal_invested.sum()),
+        total_real_invested=_to_decimal(real_invested.sum()),
+        total_current_value=_to_decimal(current_value.sum()),
+        total_nominal_profit=_to_decimal(current_value.sum() - nominal_invested.sum()),
+        total_real_profit=_to_decimal(current_value.sum() - real_invested.sum()),
+    )
+
+    return results, totals
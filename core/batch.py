@@ -0,0 +1,137 @@
+from __future__ import annotations
+import sys
+from array import array
+from datetime import date
+from decimal import ROUND_HALF_EVEN, Decimal
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from core.dto import PurchaseRow
+
+# Fixed-point scale of quantities and amounts; SharePurchase stores 6 decimal places.
+SCALE_DIGITS = 6
+SCALE = 10 ** SCALE_DIGITS
+# Scaled quantities and amounts are int64, so each must stay strictly inside
+# +-_INT64_MAX: about 9.2 trillion units per lot. The limit itself is excluded
+# because SQLite's CAST saturates at it rather than failing.
+_INT64_MAX = 2 ** 63 - 1
+MAX_BATCH_VALUE = Decimal(_INT64_MAX - 1).scaleb(-SCALE_DIGITS)
+
+
+class BatchOverflowError(OverflowError):
+    """A quantity or total cost is beyond what PurchaseBatch's int64 columns hold; use PurchaseRow dicts."""
+
+
+def fits_scaled(value: int) -> bool:
+    """True if a scaled quantity or amount can be stored in a PurchaseBatch."""
+    return -_INT64_MAX < value < _INT64_MAX
+
+
+def to_scaled(value: Decimal) -> int:
+    """Decimal -> integer count of 10**-SCALE_DIGITS units, rounding half to even."""
+    return int(value.scaleb(SCALE_DIGITS).to_integral_value(ROUND_HALF_EVEN))
+
+
+def from_scaled(value: int) -> Decimal:
+    return Decimal(value).scaleb(-SCALE_DIGITS)
+
+
+class PurchaseBatch:
+    """Purchases as parallel typed arrays instead of one PurchaseRow dict per lot.
+
+    Row i is symbols[codes[i]] on market markets[codes[i]], bought on
+    date.fromordinal(days[i]): quantities[i] units for amounts[i] in total,
+    both scaled by SCALE. Symbols are stored once in the code table, dates as
+    day ordinals and money as int64, so a row takes 24 bytes rather than a
+    dict of Decimals and a date string.
+
+    The amount is the purchase's total cost (quantity times unit cost) rounded
+    to 10**-SCALE_DIGITS, so month summaries keep their exact totals. Quantities
+    and amounts must be within +-MAX_BATCH_VALUE; append raises
+    BatchOverflowError beyond that, and callers fall back to rows. A symbol's
+    market is the first one seen for it, as ShareMarketMap holds one per symbol.
+    Rows are expected in purchase_date order, like the repositories return them.
+    """
+
+    __slots__ = ("symbols", "markets", "codes", "days", "quantities", "amounts", "_code_of")
+
+    def __init__(self) -> None:
+        self.symbols: List[str] = []
+        self.markets: List[str | None] = []
+        self.codes = array("I")
+        self.days = array("i")
+        self.quantities = array("q")
+        self.amounts = array("q")
+        self._code_of: Dict[str, int] = {}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[PurchaseRow]) -> PurchaseBatch:
+        batch = cls()
+        for row in rows:
+            quantity = Decimal(row["quantity"])
+            batch.append(
+                row["symbol"],
+                row["market"],
+                to_scaled(quantity),
+                to_scaled(quantity * row["cost"]),
+                date.fromisoformat(row["purchase_date"]).toordinal(),
+            )
+        return batch
+
+    def append(self, symbol: str, market: str | None, quantity: int, amount: int, day: int) -> None:
+        """Add a row from already scaled quantity and amount and a day ordinal.
+
+        Raises BatchOverflowError, leaving the batch unchanged, if either is out of range.
+        """
+        if not (-_INT64_MAX < quantity < _INT64_MAX and -_INT64_MAX < amount < _INT64_MAX):
+            raise BatchOverflowError(
+                f"{symbol} quantity or total cost is beyond the {MAX_BATCH_VALUE:,f} a PurchaseBatch holds"
+            )
+        code = self._code_of.get(symbol)
+        if code is None:
+            code = self._code_of[symbol] = len(self.symbols)
+            self.symbols.append(sys.intern(symbol))
+            self.markets.append(market)
+        self.codes.append(code)
+        self.days.append(day)
+        self.quantities.append(quantity)
+        self.amounts.append(amount)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def with_amounts(self, amounts: array) -> PurchaseBatch:
+        """A batch sharing this one's symbols, dates and quantities with different amounts (e.g. FX-converted)."""
+        batch = PurchaseBatch()
+        batch.symbols, batch.markets, batch._code_of = self.symbols, self.markets, self._code_of
+        batch.codes, batch.days, batch.quantities = self.codes, self.days, self.quantities
+        batch.amounts = amounts
+        return batch
+
+    def iso_dates(self) -> Dict[int, str]:
+        """Day ordinal -> YYYY-MM-DD for every distinct purchase day."""
+        return {day: date.fromordinal(day).isoformat() for day in set(self.days)}
+
+    def symbol_markets(self) -> Iterator[Tuple[str, str | None]]:
+        return zip(self.symbols, self.markets)
+
+    def iter_rows(self) -> Iterator[PurchaseRow]:
+        """Expand back into PurchaseRow dicts, with cost as the per-unit amount."""
+        iso = self.iso_dates()
+        for code, day, quantity, amount in zip(self.codes, self.days, self.quantities, self.amounts):
+            qty = from_scaled(quantity)
+            yield {
+                "symbol": self.symbols[code],
+                "market": self.markets[code],
+                "quantity": qty,
+                "cost": from_scaled(amount) / qty if quantity else Decimal(0),
+                "purchase_date": iso[day],
+            }
+
+    def to_rows(self) -> List[PurchaseRow]:
+        return list(self.iter_rows())
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the batch, including its symbol table."""
+        columns = sum(column.buffer_info()[1] * column.itemsize for column in (self.codes, self.days, self.quantities, self.amounts))
+        table = sys.getsizeof(self.symbols) + sys.getsizeof(self.markets) + sys.getsizeof(self._code_of)
+        return columns + table + sum(sys.getsizeof(symbol) for symbol in self.symbols)
@@ -0,0 +1,231 @@
+from __future__ import annotations
+import re
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Tuple
+
+from core.analysis import InflationIndex, analyze_company
+from core.batch import PurchaseBatch, fits_scaled, from_scaled, to_scaled
+from core.dto import PurchaseRow
+from core.models import CompanyAggregate
+
+# Quote currency assumed for a market when the quote itself doesn't say.
+MARKET_CURRENCIES: Dict[str, str] = {
+    "NASDAQ": "USD",
+    "NYSE": "USD",
+    "NYSEARCA": "USD",
+    "NYSEAMERICAN": "USD",
+    "LON": "GBX",
+    "TYO": "JPY",
+    "IST": "TRY",
+    "ETR": "EUR",
+    "FRA": "EUR",
+    "EPA": "EUR",
+    "AMS": "EUR",
+    "BIT": "EUR",
+    "BME": "EUR",
+    "SWX": "CHF",
+    "TSE": "CAD",
+    "HKG": "HKD",
+    "ASX": "AUD",
+    "NSE": "INR",
+    "BOM": "INR",
+}
+
+# Longest prefixes first so "HK$" wins over "$".
+CURRENCY_SYMBOLS: Tuple[Tuple[str, str], ...] = (
+    ("HK$", "HKD"),
+    ("CA$", "CAD"),
+    ("US$", "USD"),
+    ("A$", "AUD"),
+    ("$", "USD"),
+    ("£", "GBP"),
+    ("€", "EUR"),
+    ("¥", "JPY"),
+    ("₺", "TRY"),
+    ("₹", "INR"),
+)
+_SYMBOL_FOR_CURRENCY = {currency: symbol for symbol, currency in reversed(CURRENCY_SYMBOLS)}
+
+# Minor-unit quote currencies and the major currency they are converted to.
+MINOR_UNITS: Dict[str, Tuple[str, Decimal]] = {
+    "GBX": ("GBP", Decimal("0.01")),
+    "GBp": ("GBP", Decimal("0.01")),
+    "ZAc": ("ZAR", Decimal("0.01")),
+    "ILA": ("ILS", Decimal("0.01")),
+}
+
+_CODE = re.compile(r"\b([A-Z]{3}|GBp|ZAc)\b")
+
+
+def parse_price_currency(raw_text: str) -> str | None:
+    """Return the currency a quote's text is written in, or None if it carries no marker."""
+    text = raw_text.strip()
+    code = _CODE.search(text)
+    if code:
+        return code.group(1)
+    for symbol, currency in CURRENCY_SYMBOLS:
+        if text.startswith(symbol) or text.endswith(symbol):
+            return currency
+    return None
+
+
+def currency_for_market(market: str | None, default: str) -> str:
+    return MARKET_CURRENCIES.get((market or "").upper(), default)
+
+
+def to_major_unit(amount: Decimal, currency: str) -> Tuple[Decimal, str]:
+    """Convert pence-style quotes (GBX, ZAc, ...) to their major currency."""
+    minor = MINOR_UNITS.get(currency)
+    if minor is None:
+        return amount, currency
+    major, scale = minor
+    return amount * scale, major
+
+
+def cost_currency_for_market(market: str | None, default: str) -> str:
+    """Currency purchase costs on a market are taken to be in: its quote currency, in major units."""
+    return to_major_unit(Decimal("0"), currency_for_market(market, default))[1]
+
+
+def currency_symbol(currency: str) -> str:
+    return _SYMBOL_FOR_CURRENCY.get(currency, f"{currency} ")
+
+
+@dataclass(frozen=True)
+class FxRateTable:
+    """Precomputed base-currency rates keyed by (currency, YYYY-MM-DD).
+
+    Built once per analysis for exactly the (currency, date) pairs the lots and
+    current prices need, so converting a lot is a dict lookup. Each rate is the
+    last one published on or before that date (markets are closed on weekends),
+    or the first one after it when the history starts later.
+    """
+
+    base: str
+    rates: Dict[Tuple[str, str], Decimal]
+
+    @classmethod
+    def from_history(
+        cls,
+        base: str,
+        history: Dict[str, Dict[date, Decimal]],
+        keys: Iterable[Tuple[str, str]],
+    ) -> FxRateTable:
+        sorted_history: Dict[str, Tuple[List[str], List[Decimal]]] = {}
+        for currency, series in history.items():
+            days = sorted(series)
+            sorted_history[currency] = ([d.isoformat() for d in days], [series[d] for d in days])
+
+        rates: Dict[Tuple[str, str], Decimal] = {}
+        for currency, iso_date in set(keys):
+            if currency == base or currency not in sorted_history:
+                continue
+            days, values = sorted_history[currency]
+            if not days:
+                continue
+            position = bisect_right(days, iso_date)
+            rates[(currency, iso_date)] = values[max(position - 1, 0)]
+        return cls(base=base, rates=rates)
+
+    def has_rate(self, currency: str, iso_date: str) -> bool:
+        return currency == self.base or (currency, iso_date) in self.rates
+
+    def rate(self, currency: str, iso_date: str) -> Decimal:
+        """Units of base per unit of currency; 1 for the base currency.
+
+        Raises KeyError when no rate is known, rather than treating the amount
+        as if it were already in base: leave such holdings out (see has_rate).
+        """
+        if currency == self.base:
+            return Decimal("1")
+        try:
+            return self.rates[(currency, iso_date)]
+        except KeyError:
+            raise KeyError(f"No {currency}/{self.base} rate for {iso_date}") from None
+
+
+def convert_rows(
+    purchases: Iterable[PurchaseRow], symbol_currencies: Dict[str, str], fx: FxRateTable
+) -> List[PurchaseRow]:
+    """Restate each purchase's cost in the base currency at its purchase-date rate."""
+    converted: List[PurchaseRow] = []
+    for p in purchases:
+        currency = symbol_currencies.get(p["symbol"], fx.base)
+        if currency == fx.base:
+            converted.append(p)
+            continue
+        converted.append({**p, "cost": p["cost"] * fx.rate(currency, p["purchase_date"])})
+    return converted
+
+
+def convert_batch(
+    batch: PurchaseBatch, symbol_currencies: Dict[str, str], fx: FxRateTable
+) -> PurchaseBatch | List[PurchaseRow]:
+    """convert_rows for a PurchaseBatch: amounts restated in the base currency, one rate lookup per (symbol, day).
+
+    If a converted amount no longer fits the batch (see core.batch.MAX_BATCH_VALUE),
+    the batch is converted as Decimal rows instead.
+    """
+    currencies = [symbol_currencies.get(symbol, fx.base) for symbol in batch.symbols]
+    if all(currency == fx.base for currency in currencies):
+        return batch
+    iso = batch.iso_dates()
+    rates: Dict[Tuple[int, int], Decimal] = {}
+    amounts = array("q")
+    for code, day, amount in zip(batch.codes, batch.days, batch.amounts):
+        currency = currencies[code]
+        if currency == fx.base:
+            amounts.append(amount)
+            continue
+        rate = rates.get((code, day))
+        if rate is None:
+            rate = rates[(code, day)] = fx.rate(currency, iso[day])
+        converted = to_scaled(from_scaled(amount) * rate)
+        if not fits_scaled(converted):
+            return convert_rows(batch.iter_rows(), symbol_currencies, fx)
+        amounts.append(converted)
+    return batch.with_amounts(amounts)
+
+
+def analyze_company_in_base(
+    name: str,
+    items: List[PurchaseRow],
+    currency: str,
+    price: Decimal | None,
+    fx: FxRateTable,
+    valuation_date: str,
+    base_index: InflationIndex,
+    local_index: InflationIndex | None = None,
+) -> CompanyAggregate:
+    """Aggregate one symbol held in `currency`, reported in fx.base.
+
+    Costs are converted at each purchase date's rate and the current value at
+    valuation_date's rate. Without local_index, real cost is the converted cost
+    deflated by base_index. With local_index, the cost is deflated in its own
+    currency first and the result converted at valuation_date's rate.
+    """
+    now_rate = fx.rate(currency, valuation_date)
+    base_price = price * now_rate if price is not None else None
+    if currency == fx.base or local_index is None:
+        base_items = items if currency == fx.base else convert_rows(items, {name: currency}, fx)
+        return analyze_company(name, base_items, base_index, base_price)
+
+    local = analyze_company(name, items, local_index, price)
+    nominal = sum(
+        (Decimal(p["quantity"]) * p["cost"] * fx.rate(currency, p["purchase_date"]) for p in items),
+        Decimal("0"),
+    )
+    real = local.total_real_invested * now_rate
+    current = local.total_current_value * now_rate
+    return CompanyAggregate(
+        name=name,
+        total_nominal_invested=nominal,
+        total_real_invested=real,
+        total_current_value=current,
+        total_nominal_profit=current - nominal,
+        total_real_profit=current - real,
+    )
@@ -10,6 +10,16 @@ class PurchaseRow(TypedDict):
     cost: Decimal
     purchase_date: str  # YYYY-MM-DD
 
+class PurchaseLotRow(PurchaseRow):
+    purchase_id: int
+
+class SaleRow(TypedDict):
+    symbol: str
+    quantity: Decimal
+    price: Decimal
+    sale_date: str  # YYYY-MM-DD
+    lot_id: int | None  # purchase_id of the lot sold, for specific-lot matching
+
 class ShareAndMarket(TypedDict):
     symbol: str
     market: str
@@ -17,6 +27,7 @@ class ShareAndMarket(TypedDict):
 class ShareWithPrice(TypedDict):
     symbol: str
     price: Decimal
+    currency: str  # ISO code in major units, e.g. GBP rather than GBX
 
 
 class AddPurchaseResult(TypedDict):
@@ -29,3 +40,23 @@ class AddPurchaseResult(TypedDict):
     purchase_date: str
     market_action: Literal["created", "updated", "unchanged"]
     error: str | None
+
+
+class AddSaleResult(TypedDict):
+    success: bool
+    sale_id: int | None
+    symbol: str
+    quantity: Decimal
+    price: Decimal
+    sale_date: str
+    lot_id: int | None
+    error: str | None
+
+
+class BulkImportResult(TypedDict):
+    rows_read: int
+    rows_imported: int
+    rows_rejected: int
+    errors: list[str]  # first MAX_REPORTED_ERRORS rejections, "line N: reason"
+    seconds: float
+    rows_per_second: float
@@ -0,0 +1,11 @@
+from __future__ import annotations
+from decimal import Decimal
+
+from core.currency import currency_symbol
+
+
+def format_currency(value: Decimal, currency: str = "USD") -> str:
+    try:
+        return f"{currency_symbol(currency)}{Decimal(value):,.2f}"
+    except Exception:
+        return str(value)
@@ -0,0 +1,271 @@
+"""Lightweight spans, counters and latency histograms shared by every layer.
+
+Usage:
+    with span("http.bls.window") as s:
+        resp = requests.post(...)
+        s.add("bytes", len(resp.content))
+
+    @traced("service.run_investment_analysis")
+    def run_investment_analysis(...): ...
+
+Tracing is off unless PERF_TRACE=1 or enable() is called. When off, span()
+returns a shared no-op object and traced() adds one flag check per call.
+snapshot(), to_json() and to_prometheus() export what was recorded, and
+profile() wraps a block in cProfile.
+"""
+from __future__ import annotations
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Tuple, TypeVar
+
+# Upper bounds of the latency histogram buckets, in seconds; the last bucket is +Inf.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Finished spans kept for the trace section of to_json().
+MAX_RECENT_SPANS = 512
+
+_enabled = os.getenv("PERF_TRACE", "").lower() in ("1", "true", "yes")
+_lock = threading.Lock()
+_local = threading.local()
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class _SpanStats:
+    __slots__ = ("count", "errors", "total_seconds", "max_seconds", "buckets", "counters")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors: Dict[str, int] = {}
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.counters: Dict[str, float] = {}
+
+
+_stats: Dict[str, _SpanStats] = {}
+_recent: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_SPANS)
+
+
+def enable(flag: bool = True) -> None:
+    global _enabled
+    _enabled = flag
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+        _recent.clear()
+
+
+class Span:
+    """A timed block. Counters added with add() are summed per span name."""
+
+    __slots__ = ("name", "parent", "counters", "_start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.parent: str | None = None
+        self.counters: Dict[str, float] = {}
+        self._start = 0.0
+
+    def add(self, key: str, amount: float = 1) -> None:
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def __enter__(self) -> Span:
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        self.parent = stack[-1] if stack else None
+        stack.append(self.name)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        _local.stack.pop()
+        _record(self, elapsed, exc_type.__name__ if exc_type else None)
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+    def __enter__(self) -> _NoopSpan:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str) -> Span | _NoopSpan:
+    """Time a block under `name`. Returns a no-op when tracing is disabled."""
+    if not _enabled:
+        return _NOOP
+    return Span(name)
+
+
+def traced(name: str, count_rows: bool = False) -> Callable[[F], F]:
+    """Decorator form of span() for whole functions.
+
+    With count_rows, the result's length (or the result itself, if it is an
+    int) is added to the span's "rows" counter.
+    """
+
+    def decorate(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name) as s:
+                result = func(*args, **kwargs)
+                if count_rows:
+                    s.add("rows", result if isinstance(result, int) else len(result))
+                return result
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+def count(name: str, key: str, amount: float = 1) -> None:
+    """Add to a counter outside of a span, e.g. a retry inside a loop."""
+    if not _enabled:
+        return
+    with _lock:
+        stats = _stats.setdefault(name, _SpanStats())
+        stats.counters[key] = stats.counters.get(key, 0) + amount
+
+
+def _record(s: Span, elapsed: float, error: str | None) -> None:
+    bucket = len(LATENCY_BUCKETS)
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if elapsed <= bound:
+            bucket = i
+            break
+    with _lock:
+        stats = _stats.setdefault(s.name, _SpanStats())
+        stats.count += 1
+        stats.total_seconds += elapsed
+        stats.max_seconds = max(stats.max_seconds, elapsed)
+        stats.buckets[bucket] += 1
+        if error:
+            stats.errors[error] = stats.errors.get(error, 0) + 1
+        for key, amount in s.counters.items():
+            stats.counters[key] = stats.counters.get(key, 0) + amount
+        _recent.append({
+            "name": s.name,
+            "parent": s.parent,
+            "thread": threading.current_thread().name,
+            "seconds": elapsed,
+            "error": error,
+            **({"counters": dict(s.counters)} if s.counters else {}),
+        })
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    """Return span name -> count, errors, total/max/mean seconds, histogram and counters."""
+    with _lock:
+        return {
+            name: {
+                "count": stats.count,
+                "errors": dict(stats.errors),
+                "total_seconds": stats.total_seconds,
+                "max_seconds": stats.max_seconds,
+                "mean_seconds": stats.total_seconds / stats.count if stats.count else 0.0,
+                "histogram": {
+                    **{str(bound): n for bound, n in zip(LATENCY_BUCKETS, stats.buckets)},
+                    "+Inf": stats.buckets[-1],
+                },
+                "counters": dict(stats.counters),
+            }
+            for name, stats in sorted(_stats.items())
+        }
+
+
+def to_json(include_trace: bool = True) -> str:
+    payload: Dict[str, Any] = {"spans": snapshot()}
+    if include_trace:
+        with _lock:
+            payload["recent"] = list(_recent)
+    return json.dumps(payload, indent=2)
+
+
+def _metric_name(key: str) -> str:
+    return "".join(ch if ch.isalnum() else "_" for ch in key)
+
+
+def to_prometheus(prefix: str = "financial_report") -> str:
+    """Render the snapshot in the Prometheus text exposition format."""
+    lines: List[str] = [
+        f"# TYPE {prefix}_span_seconds histogram",
+    ]
+    counters: Dict[str, List[str]] = {}
+    errors: List[str] = []
+    for name, stats in snapshot().items():
+        label = f'span="{name}"'
+        if stats["count"]:
+            # Names that only ever received count() calls have no timings.
+            cumulative = 0
+            for bound, n in stats["histogram"].items():
+                cumulative += n
+                lines.append(f'{prefix}_span_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{prefix}_span_seconds_sum{{{label}}} {stats['total_seconds']}")
+            lines.append(f"{prefix}_span_seconds_count{{{label}}} {stats['count']}")
+        for error, n in stats["errors"].items():
+            errors.append(f'{prefix}_span_errors_total{{{label},error="{error}"}} {n}')
+        for key, value in stats["counters"].items():
+            counters.setdefault(_metric_name(key), []).append(f"{prefix}_{_metric_name(key)}_total{{{label}}} {value}")
+    if errors:
+        lines.append(f"# TYPE {prefix}_span_errors_total counter")
+        lines.extend(errors)
+    for key, samples in sorted(counters.items()):
+        lines.append(f"# TYPE {prefix}_{key}_total counter")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path: str) -> None:
+    """Write metrics to path: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = to_prometheus() if path.endswith((".prom", ".txt")) else to_json()
+    with open(path, "w", encoding="utf-8") as out:
+        out.write(text)
+
+
+@contextmanager
+def profile(path: str | None = None, top: int = 25) -> Iterator[cProfile.Profile | None]:
+    """Run the block under cProfile; dump stats to `path`, or print the top entries to stderr for "-".
+
+    A no-op when path is None and PERF_PROFILE is unset, so callers can wrap
+    unconditionally.
+    """
+    path = path or os.getenv("PERF_PROFILE") or None
+    if path is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path == "-":
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats("cumulative").print_stats(top)
+        else:
+            profiler.dump_stats(path)
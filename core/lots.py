@@ -0,0 +1,231 @@
+from __future__ import annotations
+from collections import deque
+from decimal import Decimal
+from typing import Callable, Deque, Dict, Iterable, List, Literal, Tuple
+
+from core.analysis import InflationIndex
+from core.dto import PurchaseLotRow, SaleRow
+from core.instrumentation import traced
+from core.models import LotGains
+
+CostBasisMethod = Literal["fifo", "lifo", "specific", "average"]
+COST_BASIS_METHODS = ("fifo", "lifo", "specific", "average")
+
+_ZERO = Decimal("0")
+_ONE = Decimal("1")
+
+# Called with a purchase lot row and the quantity a sale took from it.
+_OnTake = Callable[[PurchaseLotRow, Decimal], None]
+
+
+class _Lot:
+    __slots__ = ("row", "purchase_id", "quantity", "unit_cost", "unit_real_cost")
+
+    def __init__(self, row: PurchaseLotRow, quantity: Decimal, unit_cost: Decimal, unit_real_cost: Decimal) -> None:
+        self.row = row
+        self.purchase_id = row.get("purchase_id")
+        self.quantity = quantity
+        self.unit_cost = unit_cost
+        self.unit_real_cost = unit_real_cost
+
+
+class _Position:
+    """Open lots and running totals for one symbol."""
+
+    __slots__ = ("lots", "by_id", "quantity", "cost", "real_cost", "realized", "realized_real")
+
+    def __init__(self) -> None:
+        self.lots: Deque[_Lot] = deque()
+        self.by_id: Dict[int, _Lot] = {}
+        self.quantity = _ZERO
+        self.cost = _ZERO
+        self.real_cost = _ZERO
+        self.realized = _ZERO
+        self.realized_real = _ZERO
+
+    def add(self, lot: _Lot) -> None:
+        self.lots.append(lot)
+        if lot.purchase_id is not None:
+            self.by_id[lot.purchase_id] = lot
+        self.quantity += lot.quantity
+        self.cost += lot.quantity * lot.unit_cost
+        self.real_cost += lot.quantity * lot.unit_real_cost
+
+    def _take(self, lot: _Lot, wanted: Decimal, on_take: _OnTake | None) -> tuple[Decimal, Decimal, Decimal]:
+        taken = min(lot.quantity, wanted)
+        lot.quantity -= taken
+        if on_take is not None and taken:
+            on_take(lot.row, taken)
+        return taken, taken * lot.unit_cost, taken * lot.unit_real_cost
+
+    def remove(
+        self, quantity: Decimal, method: CostBasisMethod, lot_id: int | None, on_take: _OnTake | None = None
+    ) -> tuple[Decimal, Decimal]:
+        """Take quantity out of the open lots and return its (nominal, real) cost basis.
+
+        on_take is called with each lot row and the quantity taken from it
+        (not for average cost, which takes from no lot in particular).
+        """
+        if method == "average" and quantity == self.quantity:
+            # Closing the position takes the whole basis, leaving no rounding residue.
+            cost, real_cost = self.cost, self.real_cost
+        elif method == "average":
+            cost = self.cost * quantity / self.quantity
+            real_cost = self.real_cost * quantity / self.quantity
+        else:
+            cost = real_cost = _ZERO
+            remaining = quantity
+            if method == "specific" and lot_id is not None:
+                lot = self.by_id.get(lot_id)
+                if lot is None or lot.quantity < remaining:
+                    raise ValueError(f"Lot {lot_id} does not have {remaining} shares left")
+                _, cost, real_cost = self._take(lot, remaining, on_take)
+                remaining = _ZERO
+            # Exhausted lots are dropped lazily from the end being consumed, so each lot is popped at most once.
+            pop = self.lots.pop if method == "lifo" else self.lots.popleft
+            peek = -1 if method == "lifo" else 0
+            while remaining > 0:
+                lot = self.lots[peek]
+                if lot.quantity == 0:
+                    pop()
+                    continue
+                taken, lot_cost, lot_real_cost = self._take(lot, remaining, on_take)
+                remaining -= taken
+                cost += lot_cost
+                real_cost += lot_real_cost
+        self.quantity -= quantity
+        self.cost -= cost
+        self.real_cost -= real_cost
+        return cost, real_cost
+
+
+def _replay(
+    purchases: Iterable[PurchaseLotRow],
+    sales: Iterable[SaleRow],
+    method: CostBasisMethod,
+    factor_for: Callable[[str], Decimal],
+    on_sold: Callable[[PurchaseLotRow, Decimal, str], None] | None = None,
+) -> Dict[str, _Position]:
+    """Replay purchases and sales in date order and return each symbol's position.
+
+    on_sold, if given, is called with each lot row, the quantity a sale took
+    from it and the sale date.
+    """
+    if method not in COST_BASIS_METHODS:
+        raise ValueError(f"Unknown cost basis method: {method}")
+
+    # (date, 0 for purchases / 1 for sales, sequence, row): stable, purchases first on the same day.
+    events = [(p["purchase_date"], 0, i, p) for i, p in enumerate(purchases)]
+    events.extend((s["sale_date"], 1, i, s) for i, s in enumerate(sales))
+    events.sort(key=lambda event: event[:3])
+
+    positions: Dict[str, _Position] = {}
+    for day, kind, _, row in events:
+        symbol = row["symbol"]
+        quantity = Decimal(row["quantity"])
+        factor = factor_for(day)
+        if kind == 0:
+            position = positions.get(symbol)
+            if position is None:
+                position = positions[symbol] = _Position()
+            position.add(_Lot(row, quantity, row["cost"], row["cost"] * factor))
+            continue
+
+        position = positions.get(symbol)
+        held = position.quantity if position else _ZERO
+        if quantity <= 0:
+            raise ValueError(f"Sale of {quantity} {symbol} on {day} must be for a positive quantity")
+        if quantity > held:
+            raise ValueError(f"Sale of {quantity} {symbol} on {day} exceeds the {held} held")
+        on_take = None if on_sold is None else lambda lot_row, taken: on_sold(lot_row, taken, day)
+        cost, real_cost = position.remove(quantity, method, row.get("lot_id"), on_take)
+        proceeds = quantity * row["price"]
+        position.realized += proceeds - cost
+        position.realized_real += proceeds * factor - real_cost
+
+    return positions
+
+
+@traced("analysis.match_lots", count_rows=True)
+def match_lots(
+    purchases: Iterable[PurchaseLotRow],
+    sales: Iterable[SaleRow],
+    inflation_index: InflationIndex,
+    current_prices: Dict[str, Decimal],
+    method: CostBasisMethod = "fifo",
+) -> List[LotGains]:
+    """Match sales to purchase lots and return realized and unrealized gains per symbol.
+
+    Purchases and sales are replayed in date order, purchases first on a shared
+    date. Each symbol keeps a deque of open lots: FIFO consumes from the front,
+    LIFO from the back, and specific-lot takes the sale's lot_id (falling back
+    to FIFO when a sale names no lot). Average cost keeps running totals only.
+    After the initial sort the work is O(purchases + sales).
+
+    Real cost is restated to latest-CPI money at the purchase month's factor and
+    real proceeds at the sale month's factor, so realized real gain is the
+    purchasing-power gain. A symbol without a current price is valued at 0.
+    Raises ValueError when a sale is not positive or exceeds the shares held
+    at that date.
+    """
+    positions = _replay(purchases, sales, method, inflation_index.factor_for_iso_date)
+
+    results: List[LotGains] = []
+    for symbol, position in positions.items():
+        price = current_prices.get(symbol) or _ZERO
+        current_value = position.quantity * price
+        results.append(
+            LotGains(
+                name=symbol,
+                held_quantity=position.quantity,
+                remaining_cost=position.cost,
+                remaining_real_cost=position.real_cost,
+                current_value=current_value,
+                realized_nominal_gain=position.realized,
+                realized_real_gain=position.realized_real,
+                unrealized_nominal_gain=current_value - position.cost,
+                unrealized_real_gain=current_value - position.real_cost,
+            )
+        )
+    return results
+
+
+def held_quantities(purchases: Iterable[PurchaseLotRow], sales: Iterable[SaleRow]) -> Dict[str, Decimal]:
+    """Net quantity per symbol after all sales, without matching lots."""
+    held: Dict[str, Decimal] = {}
+    for p in purchases:
+        held[p["symbol"]] = held.get(p["symbol"], _ZERO) + Decimal(p["quantity"])
+    for s in sales:
+        held[s["symbol"]] = held.get(s["symbol"], _ZERO) - Decimal(s["quantity"])
+    return held
+
+
+@traced("analysis.remaining_lots", count_rows=True)
+def remaining_lots(purchases: Iterable[PurchaseLotRow], sales: Iterable[SaleRow]) -> List[PurchaseLotRow]:
+    """Purchase lots still held after the sales, each with its remaining quantity, in purchase_date order.
+
+    A sale comes out of the lot it names and otherwise FIFO, as match_lots'
+    "specific" method matches it. Fully sold lots are dropped. Raises
+    ValueError like match_lots.
+    """
+    positions = _replay(purchases, sales, "specific", lambda day: _ONE)
+    held: List[PurchaseLotRow] = []
+    for position in positions.values():
+        for lot in position.lots:
+            if lot.quantity == lot.row["quantity"]:
+                held.append(lot.row)
+            elif lot.quantity > 0:
+                held.append({**lot.row, "quantity": lot.quantity})
+    held.sort(key=lambda row: row["purchase_date"])
+    return held
+
+
+def sold_from_lots(purchases: Iterable[PurchaseLotRow], sales: Iterable[SaleRow]) -> List[Tuple[PurchaseLotRow, Decimal, str]]:
+    """(lot row, quantity sold from it, sale_date) for every part of a lot a sale took, in sale order.
+
+    Sales are matched like remaining_lots, so these and the remaining lots
+    add up to the purchases. Raises ValueError like match_lots.
+    """
+    sold: List[Tuple[PurchaseLotRow, Decimal, str]] = []
+    _replay(purchases, sales, "specific", lambda day: _ONE, lambda row, taken, day: sold.append((row, taken, day)))
+    return sold
@@ -21,3 +21,28 @@ class PortfolioTotals:
     total_real_profit: Decimal
 
 
+@dataclass(frozen=True)
+class ReturnMetrics:
+    """Cumulative time-weighted and annualized money-weighted returns; NaN when undefined."""
+    name: str
+    nominal_twr: float
+    real_twr: float
+    nominal_xirr: float
+    real_xirr: float
+
+
+@dataclass(frozen=True)
+class LotGains:
+    """Realized and unrealized gains for one symbol after matching sales to lots.
+
+    Real amounts are restated in latest-CPI money, like total_real_invested.
+    """
+    name: str
+    held_quantity: Decimal
+    remaining_cost: Decimal
+    remaining_real_cost: Decimal
+    current_value: Decimal
+    realized_nominal_gain: Decimal
+    realized_real_gain: Decimal
+    unrealized_nominal_gain: Decimal
+    unrealized_real_gain: Decimal
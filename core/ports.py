@@ -1,14 +1,47 @@
 from __future__ import annotations
-from typing import Dict, Iterable, Protocol
+from typing import Dict, Iterable, List, Protocol
+from datetime import date
 from decimal import Decimal
 
+from core.dto import ShareAndMarket, ShareWithPrice
+
 
 class PriceProvider(Protocol):
-    def get_prices(self, names: Iterable[str]) -> Dict[str, Decimal]:
-        """Return mapping of symbol/name -> current price as Decimals."""
+    def get_prices(self, shares_and_markets: Iterable[ShareAndMarket]) -> Iterable[ShareWithPrice]:
+        """Yield current quotes for the pairs that could be priced, in any order; failures are left out."""
         ...
 
 class CpiDataProvider(Protocol):
     def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
         """Return mapping of YYYY-MM -> CPI on that date as Decimals."""
         ...
+
+class CpiSeriesSource(Protocol):
+    def get_cpi_series(self, names: Iterable[str], initial_year: str) -> Dict[str, Dict[str, Decimal]]:
+        """Return mapping of source name -> YYYY-MM -> CPI for several CPI sources at once."""
+        ...
+
+class PriceHistoryProvider(Protocol):
+    def get_price_history(self, symbol: str, market: str, start: date, end: date) -> Dict[date, Decimal]:
+        """Return mapping of trading day -> closing price for start..end inclusive."""
+        ...
+
+class FxRateProvider(Protocol):
+    def get_rates(self, currency: str, base: str, start: date, end: date) -> Dict[date, Decimal]:
+        """Return mapping of day -> units of `base` per unit of `currency` for start..end inclusive."""
+        ...
+
+class AsyncPriceProvider(Protocol):
+    async def get_prices(self, shares_and_markets: Iterable[ShareAndMarket]) -> List[ShareWithPrice]:
+        """Return current quotes for the pairs that could be priced; failures are left out."""
+        ...
+
+class AsyncCpiDataProvider(Protocol):
+    async def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
+        """Async CpiDataProvider.get_cpi_from_initial_date."""
+        ...
+
+class AsyncFxRateProvider(Protocol):
+    async def get_rates(self, currency: str, base: str, start: date, end: date) -> Dict[date, Decimal]:
+        """Async FxRateProvider.get_rates."""
+        ...
@@ -0,0 +1,205 @@
+from __future__ import annotations
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from core.analysis import InflationIndex
+from core.dto import PurchaseRow, SaleRow
+from core.models import ReturnMetrics
+
+XIRR_MAX_ITERATIONS = 100
+XIRR_TOLERANCE = 1e-10
+# Bracket on log(1 + rate): roughly -99.995% .. +4.8e8% a year.
+_LOG_RATE_LOW = -10.0
+_LOG_RATE_HIGH = 20.0
+_DAYS_PER_YEAR = 365.0
+
+
+def xirr_batch(amounts: Sequence[Sequence[float]], days: Sequence[Sequence[float]]) -> np.ndarray:
+    """Solve XIRR for many cash-flow series at once.
+
+    amounts[i] and days[i] are the flows of series i and their day offsets from
+    any common origin, of equal length. Series may have different lengths. Each series is solved
+    for x = log(1 + rate) with a safeguarded Newton iteration: a Newton step is
+    taken when it stays inside the current sign-change bracket and a bisection
+    step otherwise. That bounds the work at XIRR_MAX_ITERATIONS vectorized passes
+    for the whole batch. Series without a sign change get NaN.
+    """
+    n = len(amounts)
+    if n == 0:
+        return np.empty(0)
+    # Flows of all series end to end, with the series index of each, so a long
+    # series (e.g. the whole portfolio) doesn't pad every other one to its length.
+    lengths = np.fromiter((len(series) for series in amounts), dtype=np.int64, count=n)
+    segment = np.repeat(np.arange(n), lengths)
+    a = np.fromiter((value for series in amounts for value in series), dtype=np.float64, count=int(lengths.sum()))
+    t = np.fromiter((offset for offsets in days for offset in offsets), dtype=np.float64, count=int(lengths.sum()))
+    # Measure time in years from each series' first flow so exponents stay small.
+    has_flow = a != 0
+    first = np.full(n, np.inf)
+    np.minimum.at(first, segment[has_flow], t[has_flow])
+    first[~np.isfinite(first)] = 0.0
+    t = np.where(has_flow, (t - first[segment]) / _DAYS_PER_YEAR, 0.0)
+
+    def npv(x: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        discount = np.exp(np.clip(-x[segment] * t, -700.0, 700.0))
+        flows = a * discount
+        return np.bincount(segment, flows, minlength=n), np.bincount(segment, -t * flows, minlength=n)
+
+    lo = np.full(n, _LOG_RATE_LOW)
+    hi = np.full(n, _LOG_RATE_HIGH)
+    f_lo, _ = npv(lo)
+    f_hi, _ = npv(hi)
+    solvable = np.sign(f_lo) * np.sign(f_hi) < 0
+
+    x = np.zeros(n)
+    for _ in range(XIRR_MAX_ITERATIONS):
+        f, df = npv(x)
+        # Keep the bracket on the sign change.
+        same_as_lo = np.sign(f) == np.sign(f_lo)
+        lo = np.where(same_as_lo, x, lo)
+        f_lo = np.where(same_as_lo, f, f_lo)
+        hi = np.where(same_as_lo, hi, x)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            newton = x - f / df
+        use_newton = np.isfinite(newton) & (newton > lo) & (newton < hi)
+        x_next = np.where(use_newton, newton, (lo + hi) / 2.0)
+        converged = np.abs(x_next - x) < XIRR_TOLERANCE
+        x = x_next
+        if np.all(converged | ~solvable):
+            break
+
+    return np.where(solvable, np.expm1(x), np.nan)
+
+
+def _time_weighted(events: List[Tuple[int, Dict[str, Tuple[Decimal, Decimal]]]], end_value: Dict[str, float]) -> float:
+    """Chain sub-period returns between purchase and sale days.
+
+    events are (day, {symbol: (quantity, amount)}) in day order, with a sale
+    as negative quantity and proceeds. Holdings are marked at their latest
+    observed price, which is the purchase cost or sale price on that day, and
+    at end_value's price at the end.
+    """
+    quantities: Dict[str, Decimal] = defaultdict(Decimal)
+    marks: Dict[str, float] = {}
+    growth = 1.0
+    value_after = 0.0
+    invested = False
+
+    def value() -> float:
+        return sum(float(quantities[s]) * marks[s] for s in quantities)
+
+    for _, traded in events:
+        for symbol, (quantity, amount) in traded.items():
+            marks[symbol] = float(amount / quantity)
+        value_before = value()
+        if value_after > 0:
+            growth *= value_before / value_after
+        for symbol, (quantity, _) in traded.items():
+            quantities[symbol] += quantity
+        value_after = value()
+        invested = invested or value_after > 0
+    if not invested:
+        return float("nan")
+    if value_after > 0:
+        growth *= sum(float(quantities[s]) * end_value[s] for s in quantities) / value_after
+    return growth - 1.0
+
+
+def compute_returns(
+    purchases: Iterable[PurchaseRow],
+    cpi_index: Dict[str, Decimal] | InflationIndex,
+    current_prices: Dict[str, Decimal],
+    valuation_date: date | None = None,
+    sales: Iterable[SaleRow] = (),
+) -> Tuple[List[ReturnMetrics], ReturnMetrics]:
+    """Per-symbol and portfolio TWR and XIRR, nominal and CPI-deflated.
+
+    Each purchase is an outflow on its date, each sale's proceeds an inflow on
+    its date, and the value of the shares still held the inflow on
+    valuation_date (default today). Real XIRR restates flows in latest-CPI
+    money; real TWR removes CPI growth since the first purchase. Symbols still
+    held without a current price get NaN and are left out of the portfolio.
+    """
+    inflation_index = (
+        cpi_index if isinstance(cpi_index, InflationIndex) else InflationIndex.from_cpi_index(cpi_index)
+    )
+    valuation_day = (valuation_date or date.today()).toordinal()
+
+    # symbol -> (day, 0 for purchases / 1 for sales) -> (quantity, amount) with same-day trades merged;
+    # sales carry negative quantity and proceeds.
+    trades: Dict[str, Dict[Tuple[int, int], List[Decimal]]] = defaultdict(dict)
+    held: Dict[str, Decimal] = defaultdict(Decimal)
+    first_months: Dict[str, str] = {}
+    for p in purchases:
+        quantity = Decimal(p["quantity"])
+        key = (date.fromisoformat(p["purchase_date"]).toordinal(), 0)
+        entry = trades[p["symbol"]].setdefault(key, [Decimal("0"), Decimal("0")])
+        entry[0] += quantity
+        entry[1] += quantity * p["cost"]
+        held[p["symbol"]] += quantity
+        month = p["purchase_date"][:7]
+        if p["symbol"] not in first_months or month < first_months[p["symbol"]]:
+            first_months[p["symbol"]] = month
+    for s in sales:
+        quantity = Decimal(s["quantity"])
+        key = (date.fromisoformat(s["sale_date"]).toordinal(), 1)
+        entry = trades[s["symbol"]].setdefault(key, [Decimal("0"), Decimal("0")])
+        entry[0] -= quantity
+        entry[1] -= quantity * s["price"]
+        held[s["symbol"]] -= quantity
+
+    names = list(first_months)
+    # A symbol sold out needs no current price.
+    priced = [name for name in names if current_prices.get(name) is not None or held[name] == 0]
+    end_price = {name: float(current_prices.get(name) or 0) for name in priced}
+
+    def flows_for(symbols: List[str], real: bool) -> Tuple[List[float], List[float]]:
+        amounts: List[float] = []
+        days: List[float] = []
+        end_value = 0.0
+        for symbol in symbols:
+            for (day, _), (_, amount) in trades[symbol].items():
+                factor = inflation_index.factor_for_iso_date(date.fromordinal(day).isoformat()) if real else 1
+                amounts.append(-float(amount * factor))
+                days.append(float(day))
+            end_value += float(held[symbol]) * end_price[symbol]
+        amounts.append(end_value)
+        days.append(float(valuation_day))
+        return amounts, days
+
+    series = [[name] for name in priced] + [priced]
+    nominal = [flows_for(symbols, real=False) for symbols in series]
+    real = [flows_for(symbols, real=True) for symbols in series]
+    nominal_xirr = xirr_batch([a for a, _ in nominal], [d for _, d in nominal])
+    real_xirr = xirr_batch([a for a, _ in real], [d for _, d in real])
+
+    def twr(symbols: List[str]) -> Tuple[float, float]:
+        by_day: Dict[Tuple[int, int], Dict[str, Tuple[Decimal, Decimal]]] = defaultdict(dict)
+        for symbol in symbols:
+            for key, (quantity, amount) in trades[symbol].items():
+                by_day[key][symbol] = (quantity, amount)
+        nominal_twr = _time_weighted(sorted(by_day.items()), end_price) if symbols else float("nan")
+        first_month = min(first_months[s] for s in symbols) if symbols else ""
+        real_twr = (1.0 + nominal_twr) / float(inflation_index.factor_for_month(first_month)) - 1.0
+        return nominal_twr, real_twr
+
+    index_of = {name: i for i, name in enumerate(priced)}
+    results: List[ReturnMetrics] = []
+    for name in names:
+        if name not in index_of:
+            results.append(ReturnMetrics(name, float("nan"), float("nan"), float("nan"), float("nan")))
+            continue
+        i = index_of[name]
+        nominal_twr, real_twr = twr([name])
+        results.append(ReturnMetrics(name, nominal_twr, real_twr, float(nominal_xirr[i]), float(real_xirr[i])))
+
+    portfolio_twr, portfolio_real_twr = twr(priced)
+    portfolio = ReturnMetrics(
+        "PORTFOLIO", portfolio_twr, portfolio_real_twr, float(nominal_xirr[-1]), float(real_xirr[-1])
+    )
+    return results, portfolio
@@ -0,0 +1,158 @@
+from __future__ import annotations
+from dataclasses import dataclass
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+from core.dto import PurchaseRow, SaleRow
+from core.instrumentation import traced
+from core.lots import sold_from_lots
+
+
+@dataclass(frozen=True)
+class ValueTimeline:
+    """Month-by-month portfolio series, one array element per entry in `months`.
+
+    nominal_invested is the cost of the shares held at each month end, and
+    real_invested restates each of those lots' cost in that month's money
+    using CPI. market_value marks holdings at the month's close when known,
+    otherwise at the last known price (purchase cost, sale price or an earlier
+    close), and at the current price in the final month.
+    """
+
+    months: List[str]
+    nominal_invested: np.ndarray
+    real_invested: np.ndarray
+    market_value: np.ndarray
+
+
+def _month_ordinal(month_key: str) -> int:
+    return int(month_key[:4]) * 12 + int(month_key[5:7]) - 1
+
+
+def _month_key(ordinal: int) -> str:
+    return f"{ordinal // 12:04d}-{ordinal % 12 + 1:02d}"
+
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """Replace NaNs along the last axis with the most recent non-NaN value."""
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(values.shape[-1]), 0)
+    np.maximum.accumulate(index, axis=-1, out=index)
+    filled = np.take_along_axis(values, index, axis=-1)
+    return filled
+
+
+@traced("analysis.build_value_timeline")
+def build_value_timeline(
+    purchases: Iterable[PurchaseRow],
+    cpi_index: Dict[str, Decimal],
+    current_prices: Dict[str, Decimal],
+    monthly_closes: Dict[str, Dict[str, Decimal]] | None = None,
+    end_month: str | None = None,
+    sales: Iterable[SaleRow] = (),
+) -> ValueTimeline:
+    """Compute the timeline in one pass with per-symbol prefix sums.
+
+    Quantities and costs are bucketed into a (symbol, month) grid and
+    cumulatively summed along months. Real cost uses a prefix sum of cost/CPI,
+    scaled by each month's CPI. The work is O(purchases + symbols x months)
+    rather than one full analysis per month. CPI months that are missing carry
+    the previous value forward.
+
+    With sales, pass individual lots: each sale is matched to lots like
+    core.lots.remaining_lots, and the shares it took leave the grid in the
+    sale month at their lot's cost. Raises ValueError like match_lots.
+    """
+    rows = list(purchases)
+    sales = list(sales)
+    last = _month_ordinal(end_month or date.today().strftime("%Y-%m"))
+    if not rows:
+        empty = np.zeros(0)
+        return ValueTimeline([], empty, empty, empty)
+
+    first = min(_month_ordinal(p["purchase_date"]) for p in rows)
+    last = max(last, max(_month_ordinal(p["purchase_date"]) for p in rows))
+    if sales:
+        last = max(last, max(_month_ordinal(s["sale_date"]) for s in sales))
+    n_months = last - first + 1
+    months = [_month_key(first + i) for i in range(n_months)]
+
+    cpi = np.full(n_months, np.nan)
+    for month, value in cpi_index.items():
+        offset = _month_ordinal(month) - first
+        if 0 <= offset < n_months:
+            cpi[offset] = float(value)
+    cpi = _forward_fill(cpi)
+    # Months before the first CPI observation borrow the first one.
+    if np.isnan(cpi).all():
+        cpi[:] = 1.0
+    else:
+        cpi[np.isnan(cpi)] = cpi[~np.isnan(cpi)][0]
+
+    symbol_codes: Dict[str, int] = {}
+    codes: List[int] = []
+    offsets: List[int] = []
+    quantities: List[float] = []
+    costs: List[float] = []
+    for p in rows:
+        codes.append(symbol_codes.setdefault(p["symbol"], len(symbol_codes)))
+        offsets.append(_month_ordinal(p["purchase_date"]) - first)
+        quantities.append(float(p["quantity"]))
+        costs.append(float(p["quantity"] * p["cost"]))
+    code_arr = np.asarray(codes)
+    offset_arr = np.asarray(offsets)
+    qty_arr = np.asarray(quantities)
+    cost_arr = np.asarray(costs)
+
+    n_symbols = len(symbol_codes)
+    qty_grid = np.zeros((n_symbols, n_months))
+    cost_grid = np.zeros((n_symbols, n_months))
+    np.add.at(qty_grid, (code_arr, offset_arr), qty_arr)
+    np.add.at(cost_grid, (code_arr, offset_arr), cost_arr)
+
+    deflated_cost = cost_grid.sum(axis=0) / cpi
+    with np.errstate(divide="ignore", invalid="ignore"):
+        purchase_price = cost_grid / qty_grid
+    bought = qty_grid > 0
+
+    # Shares sold leave at their lot's cost, deflated by the lot's purchase month CPI.
+    sold = sold_from_lots(rows, sales) if sales else []
+    if sold:
+        sold_codes = np.asarray([symbol_codes[lot["symbol"]] for lot, _, _ in sold])
+        sold_offsets = np.asarray([_month_ordinal(day) - first for _, _, day in sold])
+        bought_offsets = np.asarray([_month_ordinal(lot["purchase_date"]) - first for lot, _, _ in sold])
+        sold_qty = np.asarray([float(taken) for _, taken, _ in sold])
+        sold_cost = np.asarray([float(taken * lot["cost"]) for lot, taken, _ in sold])
+        np.add.at(qty_grid, (sold_codes, sold_offsets), -sold_qty)
+        np.add.at(cost_grid, (sold_codes, sold_offsets), -sold_cost)
+        np.add.at(deflated_cost, sold_offsets, -sold_cost / cpi[bought_offsets])
+
+    nominal_invested = np.cumsum(cost_grid.sum(axis=0))
+    real_invested = np.cumsum(deflated_cost) * cpi
+
+    # Price grid: purchase-month average cost, overridden by sale prices, month-end closes, then the current quote.
+    price_grid = np.full((n_symbols, n_months), np.nan)
+    price_grid[bought] = purchase_price[bought]
+    for sale in sales:
+        offset = _month_ordinal(sale["sale_date"]) - first
+        price_grid[symbol_codes[sale["symbol"]], offset] = float(sale["price"])
+    for symbol, closes in (monthly_closes or {}).items():
+        code = symbol_codes.get(symbol)
+        if code is None:
+            continue
+        for month, close in closes.items():
+            offset = _month_ordinal(month) - first
+            if 0 <= offset < n_months:
+                price_grid[code, offset] = float(close)
+    for symbol, code in symbol_codes.items():
+        price = current_prices.get(symbol)
+        if price is not None:
+            price_grid[code, -1] = float(price)
+    price_grid = np.nan_to_num(_forward_fill(price_grid))
+
+    market_value = (np.cumsum(qty_grid, axis=1) * price_grid).sum(axis=0)
+
+    return ValueTimeline(months, nominal_invested, real_invested, market_value)
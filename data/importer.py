@@ -0,0 +1,136 @@
+"""Bulk import of share purchases from CSV.
+
+The file needs a header with: symbol, market, quantity, cost, purchase_date
+(YYYY-MM-DD). Extra columns are ignored.
+
+Usage:
+    python -m data.importer purchases.csv [--chunk-size 10000]
+"""
+from __future__ import annotations
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import csv
+import sys
+import time
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import Iterable, Iterator, List, Tuple, TextIO
+
+from core.dto import BulkImportResult
+from data.models import init_db
+from data.repositories import bulk_add_share_purchases
+
+REQUIRED_COLUMNS = ("symbol", "market", "quantity", "cost", "purchase_date")
+DEFAULT_CHUNK_SIZE = 10_000
+MAX_REPORTED_ERRORS = 100
+
+ValidPurchase = Tuple[str, str, Decimal, Decimal, date]
+
+
+def _validate_row(row: dict) -> ValidPurchase:
+    symbol = (row.get("symbol") or "").strip().upper()
+    market = (row.get("market") or "").strip()
+    if not symbol:
+        raise ValueError("symbol is empty")
+    if not market:
+        raise ValueError("market is empty")
+    try:
+        quantity = Decimal((row.get("quantity") or "").strip())
+        cost = Decimal((row.get("cost") or "").strip())
+    except InvalidOperation:
+        raise ValueError("quantity and cost must be decimal numbers") from None
+    if not quantity.is_finite() or quantity <= 0:
+        raise ValueError("quantity must be greater than 0")
+    if not cost.is_finite() or cost <= 0:
+        raise ValueError("cost must be greater than 0")
+    purchase_date = date.fromisoformat((row.get("purchase_date") or "").strip())
+    return symbol, market, quantity, cost, purchase_date
+
+
+def _validate_chunk(rows: Iterable[Tuple[int, dict]]) -> Tuple[List[ValidPurchase], List[str]]:
+    valid: List[ValidPurchase] = []
+    errors: List[str] = []
+    for line_number, row in rows:
+        try:
+            valid.append(_validate_row(row))
+        except ValueError as exc:
+            errors.append(f"line {line_number}: {exc}")
+    return valid, errors
+
+
+def import_purchases_csv(source: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> BulkImportResult:
+    """Stream purchases from an open CSV file into the database.
+
+    Rows are read and validated `chunk_size` at a time, so memory stays flat
+    regardless of file size; each valid chunk is written in one transaction.
+    Invalid rows are skipped and reported. Raises ValueError if chunk_size
+    is below 1 or a required column is missing.
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    reader = csv.DictReader(source)
+    missing = [column for column in REQUIRED_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+
+    # Header is line 1, so data rows start at line 2.
+    numbered: Iterator[Tuple[int, dict]] = enumerate(reader, start=2)
+    rows_read = rows_imported = rows_rejected = 0
+    errors: List[str] = []
+    started = time.perf_counter()
+
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        rows_read += len(chunk)
+        valid, chunk_errors = _validate_chunk(chunk)
+        rows_rejected += len(chunk_errors)
+        errors.extend(chunk_errors[: MAX_REPORTED_ERRORS - len(errors)])
+        rows_imported += bulk_add_share_purchases(valid)
+
+    seconds = time.perf_counter() - started
+    return {
+        "rows_read": rows_read,
+        "rows_imported": rows_imported,
+        "rows_rejected": rows_rejected,
+        "errors": errors,
+        "seconds": seconds,
+        "rows_per_second": rows_imported / seconds if seconds > 0 else 0.0,
+    }
+
+
+def _chunk_size(value: str) -> int:
+    size = int(value)
+    if size < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {size}")
+    return size
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m data.importer")
+    parser.add_argument("csv_path")
+    parser.add_argument("--chunk-size", type=_chunk_size, default=DEFAULT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    init_db()
+    with open(args.csv_path, newline="", encoding="utf-8-sig") as source:
+        result = import_purchases_csv(source, chunk_size=args.chunk_size)
+
+    for error in result["errors"]:
+        print(error)
+    if result["rows_rejected"] > len(result["errors"]):
+        print(f"... and {result['rows_rejected'] - len(result['errors'])} more rejected rows")
+    print(
+        f"Imported {result['rows_imported']} of {result['rows_read']} rows "
+        f"({result['rows_rejected']} rejected) in {result['seconds']:.2f}s "
+        f"({result['rows_per_second']:,.0f} rows/s)"
+    )
+    return 0 if result["rows_rejected"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
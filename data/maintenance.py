@@ -0,0 +1,40 @@
+"""Maintenance commands for the materialized purchase summaries.
+
+Usage:
+    python -m data.maintenance rebuild
+    python -m data.maintenance verify
+"""
+from __future__ import annotations
+from dotenv import load_dotenv
+load_dotenv()
+
+import argparse
+import sys
+
+from data.models import init_db
+from data.repositories import rebuild_purchase_summaries, verify_purchase_summaries
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m data.maintenance")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args(argv)
+
+    init_db()
+    if args.command == "rebuild":
+        count = rebuild_purchase_summaries()
+        print(f"Rebuilt {count} summary rows.")
+        return 0
+
+    mismatches = verify_purchase_summaries()
+    for mismatch in mismatches:
+        print(mismatch)
+    if mismatches:
+        print(f"{len(mismatches)} summary rows differ from a full recompute. Run 'rebuild' to fix.")
+        return 1
+    print("Summary table matches a full recompute.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,10 @@
 from peewee import (
+    CompositeKey,
     DateField,
+    DateTimeField,
     DecimalField,
+    ForeignKeyField,
+    IntegerField,
     TextField,
 )
 
@@ -12,12 +16,98 @@ class SharePurchase(BaseModel):
     quantity = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
     cost = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
     purchase_date = DateField(index=True)
+class ShareSale(BaseModel):
+    symbol = TextField(index=True)
+    quantity = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
+    price = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
+    sale_date = DateField(index=True)
+    # Only used by specific-lot matching; other methods ignore it
+    lot = ForeignKeyField(SharePurchase, null=True, backref="sales")
 class ShareMarketMap(BaseModel):
     symbol = TextField(unique=True, index=True)
     market = TextField()
 
+class PurchaseMonthSummary(BaseModel):
+    """Per (symbol, month) totals of SharePurchase, kept in step on every insert."""
+    symbol = TextField()
+    month = TextField()  # YYYY-MM
+    total_quantity = DecimalField(max_digits=24, decimal_places=6, auto_round=True)
+    total_cost = DecimalField(max_digits=24, decimal_places=6, auto_round=True)
+    lot_count = IntegerField(default=0)
+
+    class Meta:
+        indexes = ((("symbol", "month"), True),)
+
+class CpiObservation(BaseModel):
+    series_id = TextField()
+    month = TextField()  # YYYY-MM
+    value = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
+
+    class Meta:
+        indexes = ((("series_id", "month"), True),)
+
+class CpiSeriesState(BaseModel):
+    series_id = TextField(unique=True)
+    last_checked_at = DateTimeField()
+    # Earliest month (YYYY-MM) requested from upstream, so months it had no data for aren't asked for again.
+    covered_from = TextField(null=True)
+
+class QuoteSnapshot(BaseModel):
+    symbol = TextField()
+    market = TextField()
+    price = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
+    currency = TextField(null=True)
+    fetched_at = DateTimeField()
+
+    class Meta:
+        indexes = ((("symbol", "market"), True),)
+
+class PriceHistory(BaseModel):
+    """Daily closes. The (symbol, date) primary key on a WITHOUT ROWID table keeps rows
+    clustered by symbol and date, so a symbol's range query is a single index scan."""
+    symbol = TextField()
+    date = DateField()
+    close = DecimalField(max_digits=18, decimal_places=6, auto_round=True)
+
+    class Meta:
+        primary_key = CompositeKey("symbol", "date")
+        without_rowid = True
+
+class PriceHistoryState(BaseModel):
+    """Earliest day requested per symbol, so non-trading days before the first close aren't asked for again."""
+    symbol = TextField(unique=True)
+    covered_from = DateField()
+
+class FxRate(BaseModel):
+    """Daily FX closes, units of base per unit of currency; clustered like PriceHistory."""
+    base = TextField()
+    currency = TextField()
+    date = DateField()
+    rate = DecimalField(max_digits=18, decimal_places=8, auto_round=True)
+
+    class Meta:
+        primary_key = CompositeKey("base", "currency", "date")
+        without_rowid = True
+
+# Columns added after a table first shipped; create_tables won't add them to existing databases.
+ADDED_COLUMNS = (
+    (QuoteSnapshot, "currency"),
+    (CpiSeriesState, "covered_from"),
+)
+
+def _add_missing_columns():
+    from playhouse.migrate import SqliteMigrator, migrate
+
+    migrator = SqliteMigrator(db)
+    for model, field_name in ADDED_COLUMNS:
+        existing = {column.name for column in db.get_columns(model._meta.table_name)}
+        field = model._meta.fields[field_name]
+        if field.column_name not in existing:
+            migrate(migrator.add_column(model._meta.table_name, field.column_name, field))
+
 def init_db():
     db.connect(reuse_if_open=True)
-    db.create_tables([SharePurchase, ShareMarketMap])
+    db.create_tables([SharePurchase, ShareSale, ShareMarketMap, PurchaseMonthSummary, CpiObservation, CpiSeriesState, QuoteSnapshot, PriceHistory, PriceHistoryState, FxRate])
+    _add_missing_columns()
 
 
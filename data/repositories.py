@@ -1,35 +1,361 @@
 from __future__ import annotations
-from typing import List
+import heapq
+from typing import Dict, Iterable, Iterator, List, Sequence, Tuple
 from decimal import Decimal
-from datetime import date
+from datetime import date, datetime
 
-from data.models import SharePurchase, ShareMarketMap
+from peewee import EXCLUDED, JOIN, chunked, fn
+
+from data.models import (
+    SharePurchase,
+    ShareSale,
+    ShareMarketMap,
+    PurchaseMonthSummary,
+    CpiObservation,
+    CpiSeriesState,
+    QuoteSnapshot,
+    PriceHistory,
+    PriceHistoryState,
+    FxRate,
+)
 from data.db import db
-from core.dto import PurchaseRow, AddPurchaseResult
+from core.batch import SCALE, BatchOverflowError, PurchaseBatch, fits_scaled
+from core.currency import cost_currency_for_market
+from core.instrumentation import traced
+from core.lots import remaining_lots
+from core.dto import PurchaseRow, PurchaseLotRow, SaleRow, AddPurchaseResult, AddSaleResult
 
 def get_market_for_symbol(symbol: str) -> str | None:
     record = ShareMarketMap.get_or_none(ShareMarketMap.symbol == symbol)
     return record.market if record else None
 
+def iter_share_purchases_as_rows() -> Iterator[PurchaseRow]:
+    """Stream share purchases in purchase_date order without materializing the whole table.
+
+    Markets are resolved with a single LEFT JOIN on ShareMarketMap and rows are
+    read as tuples, so no Model instance is built per purchase.
+    """
+    query = (
+        SharePurchase.select(
+            SharePurchase.symbol,
+            ShareMarketMap.market,
+            SharePurchase.quantity,
+            SharePurchase.cost,
+            SharePurchase.purchase_date,
+        )
+        .join(ShareMarketMap, JOIN.LEFT_OUTER, on=(SharePurchase.symbol == ShareMarketMap.symbol))
+        .order_by(SharePurchase.purchase_date.asc())
+        .tuples()
+    )
+    for symbol, market, quantity, cost, purchase_date in query.iterator():
+        yield {
+            "symbol": symbol,
+            "market": market,
+            "quantity": quantity,
+            "cost": cost,  # Decimal from DecimalField
+            "purchase_date": purchase_date.isoformat(),
+        }
+
+@traced("db.load_share_purchases_as_rows", count_rows=True)
 def load_share_purchases_as_rows() -> List[PurchaseRow]:
     """Return share purchases as simple dict rows for the service layer.
 
-    Keys: symbol (str), quantity (int), cost (Decimal), purchase_date (YYYY-MM-DD)
+    Keys: symbol (str), market (str | None), quantity (Decimal), cost (Decimal), purchase_date (YYYY-MM-DD)
+    """
+    return list(iter_share_purchases_as_rows())
+
+def iter_share_lots_as_rows() -> Iterator[PurchaseLotRow]:
+    """Like iter_share_purchases_as_rows, but each row also carries its purchase_id.
+
+    Rows for the same date come out in insertion order, which is the order
+    FIFO and LIFO matching use to break ties.
+    """
+    query = (
+        SharePurchase.select(
+            SharePurchase.id,
+            SharePurchase.symbol,
+            ShareMarketMap.market,
+            SharePurchase.quantity,
+            SharePurchase.cost,
+            SharePurchase.purchase_date,
+        )
+        .join(ShareMarketMap, JOIN.LEFT_OUTER, on=(SharePurchase.symbol == ShareMarketMap.symbol))
+        .order_by(SharePurchase.purchase_date.asc(), SharePurchase.id.asc())
+        .tuples()
+    )
+    for purchase_id, symbol, market, quantity, cost, purchase_date in query.iterator():
+        yield {
+            "purchase_id": purchase_id,
+            "symbol": symbol,
+            "market": market,
+            "quantity": quantity,
+            "cost": cost,
+            "purchase_date": purchase_date.isoformat(),
+        }
+
+def iter_share_sales_as_rows() -> Iterator[SaleRow]:
+    """Stream share sales in sale_date order, ties in insertion order."""
+    query = (
+        ShareSale.select(ShareSale.symbol, ShareSale.quantity, ShareSale.price, ShareSale.sale_date, ShareSale.lot)
+        .order_by(ShareSale.sale_date.asc(), ShareSale.id.asc())
+        .tuples()
+    )
+    for symbol, quantity, price, sale_date, lot_id in query.iterator():
+        yield {
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": price,
+            "sale_date": sale_date.isoformat(),
+            "lot_id": lot_id,
+        }
+
+@traced("db.load_share_sales_as_rows", count_rows=True)
+def load_share_sales_as_rows() -> List[SaleRow]:
+    return list(iter_share_sales_as_rows())
+
+@traced("db.load_purchase_summaries_as_rows", count_rows=True)
+def load_purchase_summaries_as_rows() -> List[PurchaseRow]:
+    """Return one PurchaseRow per (symbol, month) from the materialized summary table.
+
+    quantity is the month's total quantity and cost the quantity-weighted average
+    cost, so quantity * cost reproduces the month's nominal spend. purchase_date is
+    the first of the month, which is all the CPI adjustment looks at.
     """
-    purchases = SharePurchase.select().order_by(SharePurchase.purchase_date.asc())
-    rows: List[PurchaseRow] = []
-    for p in purchases:
-        rows.append(
-            {
-                "symbol": p.symbol,
-                "market": get_market_for_symbol(p.symbol),
-                "quantity": p.quantity,
-                "cost": p.cost,  # Decimal from DecimalField
-                "purchase_date": p.purchase_date.isoformat(),
-            }
+    query = (
+        PurchaseMonthSummary.select(
+            PurchaseMonthSummary.symbol,
+            ShareMarketMap.market,
+            PurchaseMonthSummary.month,
+            PurchaseMonthSummary.total_quantity,
+            PurchaseMonthSummary.total_cost,
         )
+        .join(ShareMarketMap, JOIN.LEFT_OUTER, on=(PurchaseMonthSummary.symbol == ShareMarketMap.symbol))
+        .where(PurchaseMonthSummary.total_quantity > 0)
+        .order_by(PurchaseMonthSummary.month.asc())
+        .tuples()
+    )
+    return [
+        {
+            "symbol": symbol,
+            "market": market,
+            "quantity": total_quantity,
+            "cost": total_cost / total_quantity,
+            "purchase_date": f"{month}-01",
+        }
+        for symbol, market, month, total_quantity, total_cost in query
+    ]
+
+@traced("db.load_held_purchases_as_rows", count_rows=True)
+def load_held_purchases_as_rows(base_currency: str) -> List[PurchaseRow]:
+    """Return purchase rows for the shares still held, for the analysis table.
+
+    Until anything is sold these are the month summaries, except for symbols
+    whose market quotes in another currency than base_currency: summaries are
+    dated the 1st, so those come back as individual lots and their costs are
+    converted at each purchase date's rate. After a sale, the lots left open
+    by core.lots.remaining_lots are returned instead (each sale taken from the
+    lot it names, otherwise FIFO), so sold shares are neither valued nor
+    counted as invested. Raises ValueError if a sale exceeds the shares held
+    at its date.
+    """
+    sales = load_share_sales_as_rows()
+    if sales:
+        return remaining_lots(iter_share_lots_as_rows(), sales)
+    summaries = load_purchase_summaries_as_rows()
+    foreign = {p["symbol"] for p in summaries if cost_currency_for_market(p["market"], base_currency) != base_currency}
+    if not foreign:
+        return summaries
+    rows = [p for p in summaries if p["symbol"] not in foreign]
+    rows.extend(p for p in iter_share_purchases_as_rows() if p["symbol"] in foreign)
+    rows.sort(key=lambda p: p["purchase_date"])
     return rows
 
+# julianday() - _JULIAN_DAY_ORDINAL == date.toordinal() for a YYYY-MM-DD column.
+_JULIAN_DAY_ORDINAL = 1721424.5
+
+def _scaled(column):
+    return fn.ROUND(column * SCALE).cast("INTEGER")
+
+def _day_ordinal(iso_date):
+    return (fn.julianday(iso_date) - _JULIAN_DAY_ORDINAL).cast("INTEGER")
+
+def _lot_batch_query():
+    return (
+        SharePurchase.select(
+            SharePurchase.symbol,
+            ShareMarketMap.market,
+            _scaled(SharePurchase.quantity),
+            _scaled(SharePurchase.cost),
+            _day_ordinal(SharePurchase.purchase_date),
+        )
+        .join(ShareMarketMap, JOIN.LEFT_OUTER, on=(SharePurchase.symbol == ShareMarketMap.symbol))
+        .order_by(SharePurchase.purchase_date.asc())
+        .tuples()
+    )
+
+def _summary_batch_query():
+    return (
+        PurchaseMonthSummary.select(
+            PurchaseMonthSummary.symbol,
+            ShareMarketMap.market,
+            _scaled(PurchaseMonthSummary.total_quantity),
+            _scaled(PurchaseMonthSummary.total_cost),
+            _day_ordinal(PurchaseMonthSummary.month.concat("-01")),
+        )
+        .join(ShareMarketMap, JOIN.LEFT_OUTER, on=(PurchaseMonthSummary.symbol == ShareMarketMap.symbol))
+        .where(PurchaseMonthSummary.total_quantity > 0)
+        .order_by(PurchaseMonthSummary.month.asc())
+        .tuples()
+    )
+
+def _lot_batch_rows(query) -> Iterator[Tuple[str, str | None, int, int, int]]:
+    """(symbol, market, scaled quantity, scaled total cost, day) per lot of a _lot_batch_query."""
+    half = SCALE // 2
+    for symbol, market, quantity, cost, day in query.iterator():
+        if not fits_scaled(cost):
+            raise BatchOverflowError(f"{symbol} cost is beyond the range of a PurchaseBatch")
+        yield symbol, market, quantity, (quantity * cost + half) // SCALE, day
+
+def _fill_batch(rows: Iterable[Tuple[str, str | None, int, int, int]]) -> PurchaseBatch:
+    batch = PurchaseBatch()
+    for symbol, market, quantity, amount, day in rows:
+        batch.append(symbol, market, quantity, amount, day)
+    return batch
+
+@traced("db.load_share_purchases_as_batch", count_rows=True)
+def load_share_purchases_as_batch() -> PurchaseBatch | List[PurchaseRow]:
+    """load_share_purchases_as_rows as a PurchaseBatch.
+
+    SQLite scales quantities and costs to integers and turns dates into day
+    ordinals, so no Decimal or date object is created per purchase. If any
+    quantity or cost is too large for the batch's int64 columns (see
+    core.batch.MAX_BATCH_VALUE), the Decimal rows are returned instead.
+    """
+    try:
+        return _fill_batch(_lot_batch_rows(_lot_batch_query()))
+    except BatchOverflowError:
+        return load_share_purchases_as_rows()
+
+@traced("db.load_purchase_summaries_as_batch", count_rows=True)
+def load_purchase_summaries_as_batch() -> PurchaseBatch | List[PurchaseRow]:
+    """load_purchase_summaries_as_rows as a PurchaseBatch, one row per (symbol, month) with its total cost.
+
+    Falls back to the Decimal rows like load_share_purchases_as_batch.
+    """
+    try:
+        return _fill_batch(_summary_batch_query().iterator())
+    except BatchOverflowError:
+        return load_purchase_summaries_as_rows()
+
+@traced("db.load_held_purchases_as_batch", count_rows=True)
+def load_held_purchases_as_batch(base_currency: str) -> PurchaseBatch | List[PurchaseRow]:
+    """load_held_purchases_as_rows as a PurchaseBatch, for the report.
+
+    Month summaries and the lots of markets quoting in another currency are
+    read as scaled integers and merged in date order, the same rows in the
+    same order as load_held_purchases_as_rows. Once anything is sold, or if a
+    value doesn't fit the batch, that function's rows are returned instead.
+    """
+    if ShareSale.select().exists():
+        return load_held_purchases_as_rows(base_currency)
+    markets = [market for (market,) in ShareMarketMap.select(ShareMarketMap.market).distinct().tuples()]
+    foreign = [market for market in markets if cost_currency_for_market(market, base_currency) != base_currency]
+    summaries = _summary_batch_query()
+    lots: Iterable[Tuple[str, str | None, int, int, int]] = ()
+    if foreign:
+        summaries = summaries.where(ShareMarketMap.market.not_in(foreign) | ShareMarketMap.market.is_null())
+        lots = _lot_batch_rows(_lot_batch_query().where(ShareMarketMap.market.in_(foreign)))
+    try:
+        # On a shared day summaries come first, as in load_held_purchases_as_rows' stable sort.
+        return _fill_batch(heapq.merge(summaries.iterator(), lots, key=lambda row: row[4]))
+    except BatchOverflowError:
+        return load_held_purchases_as_rows(base_currency)
+
+def _add_to_month_summary(symbol: str, purchase_date: date, quantity: Decimal, cost: Decimal) -> None:
+    month = purchase_date.strftime("%Y-%m")
+    batch_cost = quantity * cost
+    PurchaseMonthSummary.insert(
+        symbol=symbol, month=month, total_quantity=quantity, total_cost=batch_cost, lot_count=1
+    ).on_conflict(
+        conflict_target=[PurchaseMonthSummary.symbol, PurchaseMonthSummary.month],
+        update={
+            PurchaseMonthSummary.total_quantity: PurchaseMonthSummary.total_quantity + quantity,
+            PurchaseMonthSummary.total_cost: PurchaseMonthSummary.total_cost + batch_cost,
+            PurchaseMonthSummary.lot_count: PurchaseMonthSummary.lot_count + 1,
+        },
+    ).execute()
+
+def _recompute_month_summaries():
+    month = fn.substr(SharePurchase.purchase_date, 1, 7)
+    return SharePurchase.select(
+        SharePurchase.symbol,
+        month,
+        fn.SUM(SharePurchase.quantity),
+        fn.SUM(SharePurchase.quantity * SharePurchase.cost),
+        fn.COUNT(SharePurchase.id),
+    ).group_by(SharePurchase.symbol, month)
+
+@traced("db.rebuild_purchase_summaries", count_rows=True)
+def rebuild_purchase_summaries() -> int:
+    """Recompute PurchaseMonthSummary from SharePurchase. Returns the number of summary rows."""
+    with db.atomic():
+        PurchaseMonthSummary.delete().execute()
+        PurchaseMonthSummary.insert_from(
+            _recompute_month_summaries(),
+            fields=[
+                PurchaseMonthSummary.symbol,
+                PurchaseMonthSummary.month,
+                PurchaseMonthSummary.total_quantity,
+                PurchaseMonthSummary.total_cost,
+                PurchaseMonthSummary.lot_count,
+            ],
+        ).execute()
+    return PurchaseMonthSummary.select().count()
+
+def ensure_purchase_summaries() -> bool:
+    """Build the summary table for databases that predate it. Returns True if a rebuild ran."""
+    if PurchaseMonthSummary.select().exists() or not SharePurchase.select().exists():
+        return False
+    rebuild_purchase_summaries()
+    return True
+
+@traced("db.verify_purchase_summaries")
+def verify_purchase_summaries(tolerance: Decimal = Decimal("0.0001")) -> List[str]:
+    """Compare PurchaseMonthSummary with a full recompute. Returns a description per mismatch."""
+    expected: Dict[Tuple[str, str], Tuple[Decimal, Decimal, int]] = {
+        (symbol, month): (Decimal(str(quantity)), Decimal(str(cost)), count)
+        for symbol, month, quantity, cost, count in _recompute_month_summaries().tuples()
+    }
+    actual: Dict[Tuple[str, str], Tuple[Decimal, Decimal, int]] = {
+        (symbol, month): (quantity, cost, count)
+        for symbol, month, quantity, cost, count in PurchaseMonthSummary.select(
+            PurchaseMonthSummary.symbol,
+            PurchaseMonthSummary.month,
+            PurchaseMonthSummary.total_quantity,
+            PurchaseMonthSummary.total_cost,
+            PurchaseMonthSummary.lot_count,
+        ).tuples()
+    }
+
+    mismatches: List[str] = []
+    for key in sorted(expected.keys() | actual.keys()):
+        symbol, month = key
+        if key not in actual:
+            mismatches.append(f"{symbol} {month}: missing from summary")
+            continue
+        if key not in expected:
+            mismatches.append(f"{symbol} {month}: summary has no matching purchases")
+            continue
+        exp_qty, exp_cost, exp_count = expected[key]
+        act_qty, act_cost, act_count = actual[key]
+        if abs(exp_qty - act_qty) > tolerance or abs(exp_cost - act_cost) > tolerance or exp_count != act_count:
+            mismatches.append(
+                f"{symbol} {month}: summary qty={act_qty} cost={act_cost} lots={act_count}, "
+                f"expected qty={exp_qty} cost={exp_cost} lots={exp_count}"
+            )
+    return mismatches
+
+@traced("db.add_share_purchase")
 def add_share_purchase(
     symbol: str,
     market: str,
@@ -43,6 +369,7 @@ def add_share_purchase(
             purchase = SharePurchase.create(
                 symbol=symbol, quantity=quantity, cost=cost, purchase_date=purchase_date
             )
+            _add_to_month_summary(symbol, purchase_date, quantity, cost)
             mapping, created = ShareMarketMap.get_or_create(
                 symbol=symbol, defaults={"market": market}
             )
@@ -76,3 +403,315 @@ def add_share_purchase(
             "market_action": "unchanged",
             "error": str(exc),
         }
+
+@traced("db.add_share_sale")
+def add_share_sale(
+    symbol: str,
+    quantity: Decimal,
+    price: Decimal,
+    sale_date: date,
+    lot_id: int | None = None,
+) -> AddSaleResult:
+    """Record a sale if the shares it sells were held at its date.
+
+    The symbol's purchases and recorded sales are replayed with the new sale
+    through core.lots.remaining_lots, so a sale that oversells, predates its
+    purchases or names a lot without enough shares left is refused instead of
+    breaking every later analysis.
+    """
+    try:
+        if lot_id is not None:
+            lot = SharePurchase.get_or_none(SharePurchase.id == lot_id)
+            if lot is None or lot.symbol != symbol:
+                raise ValueError(f"Purchase {lot_id} is not a {symbol} lot")
+        new_sale: SaleRow = {
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": price,
+            "sale_date": sale_date.isoformat(),
+            "lot_id": lot_id,
+        }
+        with db.atomic():
+            remaining_lots(
+                (p for p in iter_share_lots_as_rows() if p["symbol"] == symbol),
+                [*(s for s in iter_share_sales_as_rows() if s["symbol"] == symbol), new_sale],
+            )
+            sale = ShareSale.create(symbol=symbol, quantity=quantity, price=price, sale_date=sale_date, lot=lot_id)
+        return {
+            "success": True,
+            "sale_id": sale.id,
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": price,
+            "sale_date": sale_date.isoformat(),
+            "lot_id": lot_id,
+            "error": None,
+        }
+    except Exception as exc:
+        return {
+            "success": False,
+            "sale_id": None,
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": price,
+            "sale_date": sale_date.isoformat(),
+            "lot_id": lot_id,
+            "error": str(exc),
+        }
+
+# Rows per INSERT statement; keeps bound parameters under SQLite's limit.
+INSERT_BATCH_SIZE = 200
+
+@traced("db.bulk_add_share_purchases", count_rows=True)
+def bulk_add_share_purchases(
+    purchases: Sequence[Tuple[str, str, Decimal, Decimal, date]],
+) -> int:
+    """Insert validated (symbol, market, quantity, cost, purchase_date) tuples in one transaction.
+
+    Purchases go in with multi-row INSERTs, market mappings are upserted with one
+    statement per batch (last market wins), and PurchaseMonthSummary is updated
+    once per (symbol, month). Returns the number of purchases written.
+    """
+    if not purchases:
+        return 0
+
+    markets: Dict[str, str] = {}
+    month_totals: Dict[Tuple[str, str], List] = {}
+    for symbol, market, quantity, cost, purchase_date in purchases:
+        markets[symbol] = market
+        totals = month_totals.setdefault((symbol, purchase_date.strftime("%Y-%m")), [Decimal("0"), Decimal("0"), 0])
+        totals[0] += quantity
+        totals[1] += quantity * cost
+        totals[2] += 1
+
+    with db.atomic():
+        for batch in chunked(purchases, INSERT_BATCH_SIZE):
+            SharePurchase.insert_many(
+                [(symbol, quantity, cost, purchase_date) for symbol, _, quantity, cost, purchase_date in batch],
+                fields=[SharePurchase.symbol, SharePurchase.quantity, SharePurchase.cost, SharePurchase.purchase_date],
+            ).execute()
+
+        for batch in chunked(markets.items(), INSERT_BATCH_SIZE):
+            ShareMarketMap.insert_many(
+                batch, fields=[ShareMarketMap.symbol, ShareMarketMap.market]
+            ).on_conflict(
+                conflict_target=[ShareMarketMap.symbol],
+                update={ShareMarketMap.market: EXCLUDED.market},
+            ).execute()
+
+        for batch in chunked(month_totals.items(), INSERT_BATCH_SIZE):
+            PurchaseMonthSummary.insert_many(
+                [(symbol, month, qty, cost, count) for (symbol, month), (qty, cost, count) in batch],
+                fields=[
+                    PurchaseMonthSummary.symbol,
+                    PurchaseMonthSummary.month,
+                    PurchaseMonthSummary.total_quantity,
+                    PurchaseMonthSummary.total_cost,
+                    PurchaseMonthSummary.lot_count,
+                ],
+            ).on_conflict(
+                conflict_target=[PurchaseMonthSummary.symbol, PurchaseMonthSummary.month],
+                update={
+                    PurchaseMonthSummary.total_quantity: PurchaseMonthSummary.total_quantity + EXCLUDED.total_quantity,
+                    PurchaseMonthSummary.total_cost: PurchaseMonthSummary.total_cost + EXCLUDED.total_cost,
+                    PurchaseMonthSummary.lot_count: PurchaseMonthSummary.lot_count + EXCLUDED.lot_count,
+                },
+            ).execute()
+
+    return len(purchases)
+
+@traced("db.load_cpi_index", count_rows=True)
+def load_cpi_index(series_id: str, from_month: str | None = None) -> Dict[str, Decimal]:
+    """Return cached CPI observations for a series as YYYY-MM -> Decimal."""
+    query = (
+        CpiObservation.select(CpiObservation.month, CpiObservation.value)
+        .where(CpiObservation.series_id == series_id)
+        .order_by(CpiObservation.month.asc())
+    )
+    if from_month:
+        query = query.where(CpiObservation.month >= from_month)
+    return {month: value for month, value in query.tuples()}
+
+@traced("db.save_cpi_observations", count_rows=True)
+def save_cpi_observations(series_id: str, month_to_cpi: Dict[str, Decimal]) -> int:
+    """Insert or replace CPI observations for a series. Returns the number of rows written."""
+    rows = [
+        {"series_id": series_id, "month": month, "value": value}
+        for month, value in month_to_cpi.items()
+    ]
+    if not rows:
+        return 0
+    with db.atomic():
+        # SQLite caps bound parameters per statement; 3 columns per row.
+        for start in range(0, len(rows), 300):
+            CpiObservation.insert_many(rows[start:start + 300]).on_conflict_replace().execute()
+    return len(rows)
+
+def get_cpi_last_checked(series_id: str) -> datetime | None:
+    record = CpiSeriesState.get_or_none(CpiSeriesState.series_id == series_id)
+    return record.last_checked_at if record else None
+
+def get_cpi_covered_from(series_id: str) -> str | None:
+    record = CpiSeriesState.get_or_none(CpiSeriesState.series_id == series_id)
+    return record.covered_from if record else None
+
+def mark_cpi_checked(series_id: str, checked_at: datetime, covered_from: str | None = None) -> None:
+    """Record an upstream check; covered_from (YYYY-MM) extends the requested range back if earlier."""
+    update = {CpiSeriesState.last_checked_at: checked_at}
+    if covered_from is not None:
+        update[CpiSeriesState.covered_from] = fn.MIN(fn.COALESCE(CpiSeriesState.covered_from, covered_from), covered_from)
+    CpiSeriesState.insert(series_id=series_id, last_checked_at=checked_at, covered_from=covered_from).on_conflict(
+        conflict_target=[CpiSeriesState.series_id],
+        update=update,
+    ).execute()
+
+@traced("db.load_quote_snapshots", count_rows=True)
+def load_quote_snapshots(pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[Decimal, str | None, datetime]]:
+    """Return stored quotes for (symbol, market) pairs as (price, currency, fetched_at).
+
+    currency is None for quotes stored before currencies were recorded.
+    """
+    wanted = set(pairs)
+    if not wanted:
+        return {}
+    symbols = sorted({symbol for symbol, _ in wanted})
+    snapshots: Dict[Tuple[str, str], Tuple[Decimal, str | None, datetime]] = {}
+    for batch in chunked(symbols, INSERT_BATCH_SIZE):
+        query = QuoteSnapshot.select(
+            QuoteSnapshot.symbol, QuoteSnapshot.market, QuoteSnapshot.price, QuoteSnapshot.currency, QuoteSnapshot.fetched_at
+        ).where(QuoteSnapshot.symbol.in_(batch))
+        for symbol, market, price, currency, fetched_at in query.tuples():
+            if (symbol, market) in wanted:
+                snapshots[(symbol, market)] = (price, currency, fetched_at)
+    return snapshots
+
+@traced("db.save_quote_snapshots")
+def save_quote_snapshots(snapshots: Iterable[Tuple[str, str, Decimal, str, datetime]]) -> None:
+    with db.atomic():
+        for batch in chunked(snapshots, INSERT_BATCH_SIZE):
+            QuoteSnapshot.insert_many(
+                batch,
+                fields=[
+                    QuoteSnapshot.symbol,
+                    QuoteSnapshot.market,
+                    QuoteSnapshot.price,
+                    QuoteSnapshot.currency,
+                    QuoteSnapshot.fetched_at,
+                ],
+            ).on_conflict_replace().execute()
+
+@traced("db.load_first_purchase_dates", count_rows=True)
+def load_first_purchase_dates() -> List[Tuple[str, str, date]]:
+    """Return (symbol, market, earliest purchase_date) for every symbol with a market."""
+    query = (
+        SharePurchase.select(SharePurchase.symbol, ShareMarketMap.market, fn.MIN(SharePurchase.purchase_date))
+        .join(ShareMarketMap, on=(SharePurchase.symbol == ShareMarketMap.symbol))
+        .group_by(SharePurchase.symbol, ShareMarketMap.market)
+    )
+    return [
+        (symbol, market, first if isinstance(first, date) else date.fromisoformat(first))
+        for symbol, market, first in query.tuples()
+    ]
+
+def get_price_history_bounds(symbol: str) -> Tuple[date, date] | None:
+    """Return the covered span for a symbol, or None if no closes are stored.
+
+    The span starts at the earlier of the first stored trading day and the
+    earliest day already requested (see mark_price_history_covered), and ends
+    at the last stored trading day.
+    """
+    first, last = (
+        PriceHistory.select(fn.MIN(PriceHistory.date), fn.MAX(PriceHistory.date))
+        .where(PriceHistory.symbol == symbol)
+        .scalar(as_tuple=True)
+    )
+    if first is None:
+        return None
+    first = date.fromisoformat(str(first))
+    state = PriceHistoryState.get_or_none(PriceHistoryState.symbol == symbol)
+    if state is not None:
+        first = min(first, date.fromisoformat(str(state.covered_from)))
+    return first, date.fromisoformat(str(last))
+
+def mark_price_history_covered(symbol: str, start: date) -> None:
+    """Record that closes from `start` on were requested, whether or not it was a trading day."""
+    PriceHistoryState.insert(symbol=symbol, covered_from=start).on_conflict(
+        conflict_target=[PriceHistoryState.symbol],
+        update={PriceHistoryState.covered_from: fn.MIN(PriceHistoryState.covered_from, start)},
+    ).execute()
+
+@traced("db.load_price_history", count_rows=True)
+def load_price_history(symbol: str, start: date, end: date) -> List[Tuple[date, Decimal]]:
+    """Return (date, close) for a symbol between start and end inclusive, in date order."""
+    query = (
+        PriceHistory.select(PriceHistory.date, PriceHistory.close)
+        .where((PriceHistory.symbol == symbol) & (PriceHistory.date.between(start, end)))
+        .order_by(PriceHistory.date.asc())
+        .tuples()
+    )
+    return list(query)
+
+@traced("db.save_price_history", count_rows=True)
+def save_price_history(symbol: str, closes: Dict[date, Decimal]) -> int:
+    """Store daily closes for a symbol, keeping rows that already exist. Returns rows inserted."""
+    rows = [(symbol, day, close) for day, close in sorted(closes.items())]
+    inserted = 0
+    with db.atomic():
+        for batch in chunked(rows, INSERT_BATCH_SIZE):
+            PriceHistory.insert_many(
+                batch, fields=[PriceHistory.symbol, PriceHistory.date, PriceHistory.close]
+            ).on_conflict_ignore().execute()
+            # changes() counts rows this statement inserted, not ones skipped as duplicates.
+            inserted += db.execute_sql("SELECT changes()").fetchone()[0]
+    return inserted
+
+
+@traced("db.load_month_end_closes", count_rows=True)
+def load_month_end_closes(symbols: Iterable[str]) -> Dict[str, Dict[str, Decimal]]:
+    """Return symbol -> YYYY-MM -> last stored close of that month."""
+    month = fn.substr(PriceHistory.date, 1, 7)
+    closes: Dict[str, Dict[str, Decimal]] = {}
+    for batch in chunked(sorted(set(symbols)), INSERT_BATCH_SIZE):
+        # SQLite returns the bare `close` column from the row that holds MAX(date).
+        query = (
+            PriceHistory.select(PriceHistory.symbol, month, PriceHistory.close, fn.MAX(PriceHistory.date))
+            .where(PriceHistory.symbol.in_(batch))
+            .group_by(PriceHistory.symbol, month)
+            .tuples()
+        )
+        for symbol, month_key, close, _ in query:
+            closes.setdefault(symbol, {})[month_key] = close
+    return closes
+
+def get_fx_rate_bounds(base: str, currency: str) -> Tuple[date, date] | None:
+    """Return the first and last stored rate day for a currency pair, or None if there are none."""
+    first, last = (
+        FxRate.select(fn.MIN(FxRate.date), fn.MAX(FxRate.date))
+        .where((FxRate.base == base) & (FxRate.currency == currency))
+        .scalar(as_tuple=True)
+    )
+    if first is None:
+        return None
+    return date.fromisoformat(str(first)), date.fromisoformat(str(last))
+
+@traced("db.load_fx_rates", count_rows=True)
+def load_fx_rates(base: str, currency: str, start: date, end: date) -> Dict[date, Decimal]:
+    """Return day -> rate for a currency pair between start and end inclusive."""
+    query = (
+        FxRate.select(FxRate.date, FxRate.rate)
+        .where((FxRate.base == base) & (FxRate.currency == currency) & FxRate.date.between(start, end))
+        .order_by(FxRate.date.asc())
+        .tuples()
+    )
+    return {day: rate for day, rate in query}
+
+@traced("db.save_fx_rates", count_rows=True)
+def save_fx_rates(base: str, currency: str, rates: Dict[date, Decimal]) -> int:
+    """Store daily rates for a currency pair, keeping rows that already exist. Returns rows offered."""
+    rows = [(base, currency, day, rate) for day, rate in sorted(rates.items())]
+    with db.atomic():
+        for batch in chunked(rows, INSERT_BATCH_SIZE):
+            FxRate.insert_many(
+                batch, fields=[FxRate.base, FxRate.currency, FxRate.date, FxRate.rate]
+            ).on_conflict_ignore().execute()
+    return len(rows)
@@ -0,0 +1,43 @@
+"""Async provider ports backed by the synchronous providers.
+
+Each call runs the wrapped provider on the event loop's default thread pool,
+so several fetches overlap on one loop while still going through the shared
+HTTP client's timeouts, retries and per-host limits.
+"""
+from __future__ import annotations
+import asyncio
+from datetime import date
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List
+
+from core.dto import ShareAndMarket, ShareWithPrice
+from core.ports import AsyncCpiDataProvider, AsyncFxRateProvider, AsyncPriceProvider, CpiDataProvider, FxRateProvider
+
+PriceFetcher = Callable[[Iterable[ShareAndMarket]], Iterable[ShareWithPrice]]
+
+
+class ThreadedPriceProvider(AsyncPriceProvider):
+    """Run a get_prices-style fetcher (e.g. infra.quote_cache.get_prices) on a worker thread."""
+
+    def __init__(self, fetcher: PriceFetcher) -> None:
+        self._fetcher = fetcher
+
+    async def get_prices(self, shares_and_markets: Iterable[ShareAndMarket]) -> List[ShareWithPrice]:
+        pairs = list(shares_and_markets)
+        return await asyncio.to_thread(lambda: list(self._fetcher(pairs)))
+
+
+class ThreadedCpiDataProvider(AsyncCpiDataProvider):
+    def __init__(self, provider: CpiDataProvider) -> None:
+        self._provider = provider
+
+    async def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
+        return await asyncio.to_thread(self._provider.get_cpi_from_initial_date, initial_year)
+
+
+class ThreadedFxRateProvider(AsyncFxRateProvider):
+    def __init__(self, provider: FxRateProvider) -> None:
+        self._provider = provider
+
+    async def get_rates(self, currency: str, base: str, start: date, end: date) -> Dict[date, Decimal]:
+        return await asyncio.to_thread(self._provider.get_rates, currency, base, start, end)
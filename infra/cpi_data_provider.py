@@ -1,62 +1,240 @@
 import os
 import datetime
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import Dict
-
-import requests
+from typing import Dict, Iterable, List, Tuple
 
+from core.instrumentation import span
 from core.ports import CpiDataProvider as CpiDataProviderProtocol
+from infra.http_client import default_http_client
+from data.repositories import (
+    get_cpi_covered_from,
+    get_cpi_last_checked,
+    load_cpi_index,
+    mark_cpi_checked,
+    save_cpi_observations,
+)
 
+BLS_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
+# Maximum years per BLS v2 request, with and without a registration key.
+BLS_MAX_YEARS_WITH_KEY = 20
+BLS_MAX_YEARS_WITHOUT_KEY = 10
+
+# BLS publishes CPI for a month around the middle of the following month.
+CPI_RELEASE_DAY = 15
+# Once a release is due, don't ask BLS more often than this while it is late.
+CPI_RECHECK_INTERVAL = datetime.timedelta(hours=12)
+
+
+def _parse_start_year(initial_year: str) -> str:
+    start_year = (initial_year or "").strip()[:4]
+    if not start_year.isdigit() or len(start_year) != 4:
+        raise ValueError("initial_year must be a 4-digit year, e.g. '2020' or '2020-01')")
+    return start_year
+
+
+def split_year_windows(start_year: int, end_year: int, max_years: int) -> List[Tuple[int, int]]:
+    """Split an inclusive year range into consecutive windows of at most `max_years` years."""
+    if max_years < 1:
+        raise ValueError("max_years must be at least 1")
+    return [
+        (window_start, min(window_start + max_years - 1, end_year))
+        for window_start in range(start_year, end_year + 1, max_years)
+    ]
+
+
+def find_missing_months(months: Iterable[str], first_month: str, last_month: str) -> List[str]:
+    """Return YYYY-MM keys between first_month and last_month (inclusive) absent from `months`."""
+    present = set(months)
+    year, month = (int(part) for part in first_month.split("-"))
+    missing: List[str] = []
+    key = first_month
+    while key <= last_month:
+        if key not in present:
+            missing.append(key)
+        month += 1
+        if month > 12:
+            year, month = year + 1, 1
+        key = f"{year:04d}-{month:02d}"
+    return missing
 
-class BlsCpiDataProvider(CpiDataProviderProtocol):
-    def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
-        """Return mapping of YYYY-MM -> CPI (Decimal) from BLS starting at initial year."""
 
-        start_year = (initial_year or "").strip()[:4]
-        if not start_year.isdigit() or len(start_year) != 4:
-            raise ValueError("initial_year must be a 4-digit year, e.g. '2020' or '2020-01')")
+def next_cpi_release(latest_month: str) -> datetime.date:
+    """Return the date the month after `latest_month` (YYYY-MM) is expected to be published."""
+    year, month = (int(part) for part in latest_month.split("-"))
+    # Month after latest is released in the month after that.
+    month += 2
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return datetime.date(year, month, CPI_RELEASE_DAY)
 
-        end_year = str(datetime.datetime.now().year)
 
-        body: Dict[str, object] = {
-            "seriesid": ["CUSR0000SA0"],
-            "startyear": start_year,
-            "endyear": end_year,
-        }
+# Series per BLS v2 request.
+BLS_MAX_SERIES_PER_REQUEST = 50
 
-        api_key = os.getenv("BLS_API_KEY")
-        if api_key:
-            body["registrationkey"] = api_key
 
-        resp = requests.post(
-            "https://api.bls.gov/publicAPI/v2/timeseries/data/",
-            json=body,
-            timeout=30,
-        )
+def _parse_bls_series(series: Dict[str, object]) -> Dict[str, Decimal]:
+    month_to_cpi: Dict[str, Decimal] = {}
+    for entry in series.get("data") or []:
+        if not isinstance(entry, dict):
+            continue
+        year = entry.get("year")
+        period = entry.get("period")
+        value = entry.get("value")
+        # Only monthly periods M01..M12; skip M13 (annual avg)
+        if not (isinstance(year, str) and isinstance(period, str) and period.startswith("M") and period != "M13"):
+            continue
+        try:
+            month_index = int(period[1:])
+            key = f"{int(year):04d}-{month_index:02d}"
+            month_to_cpi[key] = Decimal(str(value))
+        except Exception:
+            continue
+    return month_to_cpi
+
+
+def _fetch_bls_window(
+    series_ids: List[str], start_year: int, end_year: int, api_key: str | None
+) -> Dict[str, Dict[str, Decimal]]:
+    body: Dict[str, object] = {
+        "seriesid": series_ids,
+        "startyear": str(start_year),
+        "endyear": str(end_year),
+    }
+    if api_key:
+        body["registrationkey"] = api_key
+
+    with span("http.bls.window") as s:
+        resp = default_http_client.post(BLS_URL, json=body)
         resp.raise_for_status()
         payload = resp.json()
+        s.add("bytes", len(resp.content))
+        s.add("series", len(series_ids))
+
+    results = payload.get("Results") or payload.get("results") or {}
+    by_series: Dict[str, Dict[str, Decimal]] = {}
+    for series in results.get("series") or []:
+        if isinstance(series, dict) and series.get("seriesID"):
+            by_series[series["seriesID"]] = _parse_bls_series(series)
+    return by_series
+
+
+def fetch_bls_series(series_ids: Iterable[str], initial_year: str) -> Dict[str, Dict[str, Decimal]]:
+    """Fetch several BLS series from initial_year to now, batched into as few requests as BLS allows.
+
+    Every (year window, group of up to BLS_MAX_SERIES_PER_REQUEST series) is one
+    request, and the requests run in parallel. Returns series id -> YYYY-MM -> CPI.
+    """
+    ids = list(dict.fromkeys(series_ids))
+    start_year = int(_parse_start_year(initial_year))
+    end_year = datetime.datetime.now().year
+
+    api_key = os.getenv("BLS_API_KEY")
+    windows = split_year_windows(
+        start_year, end_year, BLS_MAX_YEARS_WITH_KEY if api_key else BLS_MAX_YEARS_WITHOUT_KEY
+    )
+    groups = [ids[i:i + BLS_MAX_SERIES_PER_REQUEST] for i in range(0, len(ids), BLS_MAX_SERIES_PER_REQUEST)]
+    requests_to_make = [(group, window) for group in groups for window in windows]
+
+    by_series: Dict[str, Dict[str, Decimal]] = {series_id: {} for series_id in ids}
+    if not requests_to_make:
+        return by_series
+    with ThreadPoolExecutor(max_workers=len(requests_to_make)) as executor:
+        for chunk in executor.map(lambda job: _fetch_bls_window(job[0], *job[1], api_key), requests_to_make):
+            for series_id, points in chunk.items():
+                by_series.setdefault(series_id, {}).update(points)
+
+    for series_id, month_to_cpi in by_series.items():
+        if month_to_cpi:
+            missing = find_missing_months(month_to_cpi, f"{start_year:04d}-01", max(month_to_cpi))
+            if missing:
+                print(f"CPI series {series_id} is missing {len(missing)} month(s): {', '.join(missing)}")
+        by_series[series_id] = dict(sorted(month_to_cpi.items()))
+    return by_series
+
+
+class BlsCpiDataProvider(CpiDataProviderProtocol):
+    # CPI-U, all items, seasonally adjusted
+    SERIES_ID = "CUSR0000SA0"
+
+    def __init__(self, series_id: str | None = None) -> None:
+        self.series_id = series_id or self.SERIES_ID
+
+    def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
+        """Return mapping of YYYY-MM -> CPI (Decimal) from BLS starting at initial year.
+
+        BLS caps the number of years per request, so long ranges are split into
+        windows that are fetched in parallel and merged. Months missing inside
+        the returned range are reported rather than silently dropped.
+        """
+        return fetch_bls_series([self.series_id], initial_year)[self.series_id]
+
+
+class CachedCpiDataProvider(CpiDataProviderProtocol):
+    """Serve CPI from the SQLite cache and only ask upstream for newly released months.
+
+    Upstream is consulted in two cases: the requested year hasn't been asked
+    for before, or the next monthly release is due and hasn't been checked
+    for recently. Months upstream had no data for are not asked for again. If
+    upstream fails, whatever is cached is returned.
+    """
+
+    def __init__(self, upstream: CpiDataProviderProtocol, series_id: str | None = None) -> None:
+        self._upstream = upstream
+        self.series_id = series_id or getattr(upstream, "series_id", None) or getattr(upstream, "SERIES_ID", "default")
+
+    @property
+    def upstream(self) -> CpiDataProviderProtocol:
+        return self._upstream
+
+    def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
+        cached, fetch_from = self.plan(initial_year)
+        if fetch_from is None:
+            return cached
+        try:
+            fresh = self._upstream.get_cpi_from_initial_date(fetch_from)
+        except Exception:
+            if cached:
+                return cached
+            raise
+        return self.merge(initial_year, cached, fetch_from, fresh)
+
+    def plan(self, initial_year: str) -> Tuple[Dict[str, Decimal], str | None]:
+        """Return (cached observations, year to fetch upstream from or None if the cache is current).
+
+        plan/merge let a caller fetch several series in one batched request;
+        get_cpi_from_initial_date is plan, a single fetch, then merge.
+        """
+        start_year = _parse_start_year(initial_year)
+        from_month = f"{start_year}-01"
+        cached = load_cpi_index(self.series_id, from_month)
+
+        if not cached or (min(cached) > from_month and not self._covers(from_month)):
+            return cached, start_year
+        if self._is_stale(max(cached)):
+            return cached, max(cached)[:4]
+        return cached, None
+
+    def merge(
+        self, initial_year: str, cached: Dict[str, Decimal], fetch_from: str, fresh: Dict[str, Decimal]
+    ) -> Dict[str, Decimal]:
+        """Store the months in `fresh` that extend `cached` and return the combined series."""
+        full_fetch = fetch_from == _parse_start_year(initial_year)
+        mark_cpi_checked(self.series_id, datetime.datetime.now(), f"{fetch_from}-01" if full_fetch else None)
+        latest = max(cached) if cached and not full_fetch else ""
+        new_points = {month: value for month, value in fresh.items() if month > latest}
+        if new_points:
+            save_cpi_observations(self.series_id, new_points)
+            cached.update(new_points)
+        return dict(sorted(cached.items()))
+
+    def _covers(self, from_month: str) -> bool:
+        covered_from = get_cpi_covered_from(self.series_id)
+        return covered_from is not None and covered_from <= from_month
 
-        results = payload.get("Results") or payload.get("results") or {}
-        series_list = results.get("series") or []
-        if not series_list:
-            return {}
-
-        data_points = series_list[0].get("data") or []
-        month_to_cpi: Dict[str, Decimal] = {}
-        for entry in data_points:
-            if not isinstance(entry, dict):
-                continue
-            year = entry.get("year")
-            period = entry.get("period")
-            value = entry.get("value")
-            # Only monthly periods M01..M12; skip M13 (annual avg)
-            if not (isinstance(year, str) and isinstance(period, str) and period.startswith("M") and period != "M13"):
-                continue
-            try:
-                month_index = int(period[1:])
-                key = f"{int(year):04d}-{month_index:02d}"
-                month_to_cpi[key] = Decimal(str(value))
-            except Exception:
-                continue
-
-        return month_to_cpi
\ No newline at end of file
+    def _is_stale(self, latest_month: str) -> bool:
+        now = datetime.datetime.now()
+        if now.date() < next_cpi_release(latest_month):
+            return False
+        last_checked = get_cpi_last_checked(self.series_id)
+        return last_checked is None or now - last_checked >= CPI_RECHECK_INTERVAL
@@ -0,0 +1,121 @@
+from __future__ import annotations
+import threading
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from core.ports import CpiDataProvider, CpiSeriesSource
+from infra.cpi_data_provider import BlsCpiDataProvider, CachedCpiDataProvider, fetch_bls_series
+
+DEFAULT_CPI_SOURCE = "us-cpi-u-sa"
+
+# Named BLS series; any other series can be used as "bls:<series id>".
+BLS_SERIES: Dict[str, str] = {
+    "us-cpi-u-sa": "CUSR0000SA0",
+    "us-cpi-u-nsa": "CUUR0000SA0",
+    "us-core-sa": "CUSR0000SA0L1E",
+    "us-core-nsa": "CUUR0000SA0L1E",
+    "us-northeast": "CUUR0100SA0",
+    "us-midwest": "CUUR0200SA0",
+    "us-south": "CUUR0300SA0",
+    "us-west": "CUUR0400SA0",
+}
+
+CpiSourceFactory = Callable[[], CpiDataProvider]
+
+
+class CpiRegistry(CpiSeriesSource):
+    """Named CPI sources behind the CpiDataProvider port.
+
+    A source name is one of the registered names (the BLS_SERIES above by
+    default), "bls:<series id>" for any other BLS series, or "file:<path>" /
+    "file:<path>#<series id>" for a local CSV or Parquet index. Providers are
+    built once per name and reused.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._factories: Dict[str, CpiSourceFactory] = {}
+        self._providers: Dict[str, CpiDataProvider] = {}
+        for name, series_id in BLS_SERIES.items():
+            self.register(name, lambda series_id=series_id: CachedCpiDataProvider(BlsCpiDataProvider(series_id)))
+
+    def register(self, name: str, factory: CpiSourceFactory) -> None:
+        with self._lock:
+            self._factories[name] = factory
+            self._providers.pop(name, None)
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._factories)
+
+    def provider(self, name: str) -> CpiDataProvider:
+        with self._lock:
+            provider = self._providers.get(name)
+            if provider is None:
+                provider = self._providers[name] = self._build(name)
+            return provider
+
+    def _build(self, name: str) -> CpiDataProvider:
+        factory = self._factories.get(name)
+        if factory is not None:
+            return factory()
+        if name.startswith("bls:") and len(name) > 4:
+            return CachedCpiDataProvider(BlsCpiDataProvider(name[4:]))
+        if name.startswith("file:") and len(name) > 5:
+            from infra.file_cpi_data_provider import FileCpiDataProvider
+
+            path, _, series_id = name[5:].partition("#")
+            return FileCpiDataProvider(path, series_id or None)
+        raise ValueError(f"Unknown CPI source '{name}'. Known: {', '.join(sorted(self._factories))}, bls:<id>, file:<path>")
+
+    def get_cpi_series(self, names: Iterable[str], initial_year: str) -> Dict[str, Dict[str, Decimal]]:
+        """Return name -> YYYY-MM -> CPI for several sources.
+
+        Cached BLS series that need new months are fetched together in one
+        batched BLS request instead of one request per series. Other sources
+        are read directly.
+        """
+        wanted = list(dict.fromkeys(names))
+        providers = {name: self.provider(name) for name in wanted}
+
+        series: Dict[str, Dict[str, Decimal]] = {}
+        pending: Dict[str, Tuple[CachedCpiDataProvider, Dict[str, Decimal], str]] = {}
+        for name, provider in providers.items():
+            if isinstance(provider, CachedCpiDataProvider) and isinstance(provider.upstream, BlsCpiDataProvider):
+                cached, fetch_from = provider.plan(initial_year)
+                if fetch_from is None:
+                    series[name] = cached
+                else:
+                    pending[name] = (provider, cached, fetch_from)
+            else:
+                series[name] = provider.get_cpi_from_initial_date(initial_year)
+
+        if pending:
+            earliest = min(fetch_from for _, _, fetch_from in pending.values())
+            series_ids = [provider.upstream.series_id for provider, _, _ in pending.values()]
+            try:
+                fresh = fetch_bls_series(series_ids, earliest)
+            except Exception:
+                if not all(cached for _, cached, _ in pending.values()):
+                    raise
+                fresh = None
+            for name, (provider, cached, fetch_from) in pending.items():
+                if fresh is None:
+                    series[name] = cached
+                else:
+                    points = fresh.get(provider.upstream.series_id, {})
+                    series[name] = provider.merge(initial_year, cached, fetch_from, points)
+
+        return {name: series[name] for name in wanted}
+
+    def providers_by_currency(self, spec: str) -> Dict[str, CpiDataProvider]:
+        """Parse "GBP=file:uk_cpi.csv,EUR=file:hicp.csv" into currency -> provider."""
+        providers: Dict[str, CpiDataProvider] = {}
+        for entry in spec.split(","):
+            currency, _, name = entry.strip().partition("=")
+            if currency and name:
+                providers[currency.strip().upper()] = self.provider(name.strip())
+        return providers
+
+
+default_cpi_registry = CpiRegistry()
@@ -0,0 +1,59 @@
+import csv
+import os
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Tuple
+
+from core.ports import CpiDataProvider as CpiDataProviderProtocol
+from infra.cpi_data_provider import _parse_start_year
+
+
+class FileCpiDataProvider(CpiDataProviderProtocol):
+    """CPI from a local CSV or Parquet file, for offline use or indexes BLS doesn't publish.
+
+    The file needs a `month` column (YYYY-MM, or a date whose first 7
+    characters are YYYY-MM) and a `value` column. A file holding several
+    series adds a `series_id` column; pass series_id to pick one. Parquet files
+    are read with pandas, which needs pyarrow or fastparquet installed. The file
+    is read once and re-read only when its modification time changes.
+    """
+
+    def __init__(self, path: str, series_id: str | None = None) -> None:
+        self.path = path
+        self.series_id = series_id or f"file:{os.path.basename(path)}"
+        self._filter = series_id
+        self._loaded: Tuple[float, Dict[str, Decimal]] | None = None
+
+    def get_cpi_from_initial_date(self, initial_year: str) -> Dict[str, Decimal]:
+        from_month = f"{_parse_start_year(initial_year)}-01"
+        return {month: value for month, value in self._series().items() if month >= from_month}
+
+    def _series(self) -> Dict[str, Decimal]:
+        mtime = os.path.getmtime(self.path)
+        if self._loaded is None or self._loaded[0] != mtime:
+            self._loaded = (mtime, dict(sorted(self._read_rows())))
+        return self._loaded[1]
+
+    def _read_records(self) -> List[Dict[str, object]]:
+        if self.path.lower().endswith((".parquet", ".pq")):
+            import pandas
+
+            return pandas.read_parquet(self.path).to_dict("records")
+        with open(self.path, newline="", encoding="utf-8-sig") as handle:
+            return list(csv.DictReader(handle))
+
+    def _read_rows(self) -> Iterable[Tuple[str, Decimal]]:
+        for record in self._read_records():
+            if self._filter is not None and str(record.get("series_id", "")) != self._filter:
+                continue
+            month = str(record.get("month", "")).strip()[:7]
+            try:
+                value = Decimal(str(record.get("value", "")).strip())
+            except InvalidOperation:
+                value = None
+            if value is None or not value.is_finite():
+                print(f"Skipping CPI row with invalid value in {self.path}: {record}")
+                continue
+            if len(month) != 7 or month[4] != "-":
+                print(f"Skipping CPI row with invalid month in {self.path}: {record}")
+                continue
+            yield month, value
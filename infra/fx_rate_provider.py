@@ -0,0 +1,98 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Set, Tuple
+
+from core.instrumentation import span
+from core.ports import FxRateProvider as FxRateProviderProtocol
+from infra.http_client import default_http_client
+from data.repositories import get_fx_rate_bounds, load_fx_rates, save_fx_rates
+
+FRANKFURTER_URL = "https://api.frankfurter.app/"
+# Days per request; long ranges are split so each response stays daily rather than sampled.
+FX_WINDOW_DAYS = 365
+MAX_WORKERS = 4
+
+
+def split_day_windows(start: datetime.date, end: datetime.date, max_days: int) -> List[Tuple[datetime.date, datetime.date]]:
+    """Split an inclusive date range into consecutive windows of at most `max_days` days."""
+    windows: List[Tuple[datetime.date, datetime.date]] = []
+    window_start = start
+    while window_start <= end:
+        window_end = min(window_start + datetime.timedelta(days=max_days - 1), end)
+        windows.append((window_start, window_end))
+        window_start = window_end + datetime.timedelta(days=1)
+    return windows
+
+
+class FrankfurterFxRateProvider(FxRateProviderProtocol):
+    """Daily ECB reference rates from the Frankfurter API (no key required)."""
+
+    def get_rates(self, currency: str, base: str, start: datetime.date, end: datetime.date) -> Dict[datetime.date, Decimal]:
+        windows = split_day_windows(start, end, FX_WINDOW_DAYS)
+        rates: Dict[datetime.date, Decimal] = {}
+        if not windows:
+            return rates
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(windows))) as executor:
+            for chunk in executor.map(lambda window: self._fetch_window(currency, base, *window), windows):
+                rates.update(chunk)
+        return dict(sorted(rates.items()))
+
+    def _fetch_window(
+        self, currency: str, base: str, start: datetime.date, end: datetime.date
+    ) -> Dict[datetime.date, Decimal]:
+        with span("http.frankfurter.window") as s:
+            resp = default_http_client.get(
+                f"{FRANKFURTER_URL}{start.isoformat()}..{end.isoformat()}",
+                params={"from": currency, "to": base},
+            )
+            resp.raise_for_status()
+            s.add("bytes", len(resp.content))
+        rates: Dict[datetime.date, Decimal] = {}
+        for day, quotes in (resp.json().get("rates") or {}).items():
+            try:
+                rates[datetime.date.fromisoformat(day)] = Decimal(str(quotes[base]))
+            except (KeyError, TypeError, ValueError, InvalidOperation):
+                continue
+        return rates
+
+
+class CachedFxRateProvider(FxRateProviderProtocol):
+    """Serve daily rates from the FxRate table and only fetch days outside the cached range.
+
+    The newest days are asked for at most once per process per day, since
+    weekends and holidays have no rate and would otherwise always look missing.
+    If upstream fails, whatever is cached is returned.
+    """
+
+    def __init__(self, upstream: FxRateProviderProtocol) -> None:
+        self._upstream = upstream
+        self._lock = threading.Lock()
+        self._refreshed: Set[Tuple[str, str, datetime.date]] = set()
+
+    def get_rates(self, currency: str, base: str, start: datetime.date, end: datetime.date) -> Dict[datetime.date, Decimal]:
+        bounds = get_fx_rate_bounds(base, currency)
+        today = datetime.date.today()
+        missing: List[Tuple[datetime.date, datetime.date]] = []
+        if bounds is None:
+            missing.append((start, end))
+        else:
+            first, last = bounds
+            if start < first:
+                missing.append((start, first - datetime.timedelta(days=1)))
+            with self._lock:
+                refresh_key = (base, currency, today)
+                if last < end and refresh_key not in self._refreshed:
+                    self._refreshed.add(refresh_key)
+                    missing.append((last + datetime.timedelta(days=1), end))
+
+        for gap_start, gap_end in missing:
+            try:
+                fresh = self._upstream.get_rates(currency, base, gap_start, gap_end)
+            except Exception as exc:
+                print(f"Could not fetch {currency}/{base} rates for {gap_start}..{gap_end}. Using cached rates. {exc}")
+                continue
+            save_fx_rates(base, currency, fresh)
+
+        return load_fx_rates(base, currency, start, end)
@@ -1,34 +1,113 @@
+import html
 import re
-import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from bs4 import BeautifulSoup
 from decimal import Decimal, InvalidOperation
-from typing import Dict, Iterable
+from typing import Iterable, Tuple
+from core.currency import currency_for_market, parse_price_currency, to_major_unit
 from core.dto import ShareAndMarket, ShareWithPrice
+from core.instrumentation import span
+from infra.http_client import default_http_client
 
 URL = "https://www.google.com/finance/quote/"
 
+# Concurrency per host is capped by the www.google.com policy in infra.http_client.
+MAX_WORKERS = 16
+
+_CHUNK_SIZE = 16 * 1024
+_PRICE_NODE = re.compile(rb'<div[^>]*\bclass="YMlKec fxKbKc"[^>]*>([^<]*)<')
+# Longest plausible price node, so a match split across two chunks is found.
+_SCAN_OVERLAP = 512
+
+
+def scan_price_text(chunks: Iterable[bytes]) -> Tuple[str | None, bytes]:
+    """Scan HTML chunks for the price node and stop reading as soon as it is found.
+
+    Returns (price text or None, bytes read so far). Only the unscanned tail of
+    the buffer is searched on each chunk, with a small overlap so a node split
+    across chunks is still matched.
+    """
+    buffer = bytearray()
+    scanned = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer.extend(chunk)
+        match = _PRICE_NODE.search(buffer, max(0, scanned - _SCAN_OVERLAP))
+        if match:
+            return html.unescape(match.group(1).decode("utf-8", "replace")).strip(), bytes(buffer)
+        scanned = len(buffer)
+    return None, bytes(buffer)
+
+
+def _soup_price_text(page: bytes) -> str | None:
+    soup = BeautifulSoup(page, "html.parser")
+    price = soup.find("div", class_="YMlKec fxKbKc")
+    return price.get_text(strip=True) if price else None
+
+
 def get_price(symbol: str, market: str) -> Decimal:
+    return get_quote(symbol, market)[0]
+
+
+def get_quote(symbol: str, market: str) -> Tuple[Decimal, str]:
+    """Return (price, currency) with minor-unit quotes such as GBX converted to the major unit.
+
+    The currency comes from the quote text; when the text has no marker the
+    market's usual currency is assumed.
+    """
     url = f"{URL}{symbol}:{market}"
-    response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-    soup = BeautifulSoup(response.text, "html.parser")
-    price = soup.find_all("div", class_="YMlKec fxKbKc")
-    if not price or len(price) == 0:
+    with span("http.google_finance.quote") as s:
+        with default_http_client.stream("GET", url) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size=_CHUNK_SIZE)
+            raw_text, page = scan_price_text(chunks)
+            # Drain unparsed bytes so the keep-alive connection goes back to the pool.
+            for _ in chunks:
+                pass
+        s.add("bytes", len(page))
+    if not raw_text:
+        # Markup differs from what the fast scan expects; fall back to a full parse.
+        raw_text = _soup_price_text(page)
+    if not raw_text:
         raise ValueError(f"No price found for {symbol} on {market}")
-    raw_text = price[0].get_text(strip=True)
-    # Remove currency symbols, commas, and any non-numeric characters except sign and decimal point
+    # Remove currency markers, commas, and any non-numeric characters except sign and decimal point
     cleaned = re.sub(r"[^0-9+\-.]", "", raw_text)
     if cleaned == "" or cleaned in {"+", "-", ".", "+.", "-."}:
         raise ValueError(f"Invalid price text: '{raw_text}' for {symbol} on {market}")
     try:
-        return Decimal(cleaned)
+        price = Decimal(cleaned)
     except InvalidOperation as exc:
         raise ValueError(
             f"Could not parse price '{raw_text}' (cleaned '{cleaned}') for {symbol} on {market}"
         ) from exc
+    currency = parse_price_currency(raw_text) or currency_for_market(market, "USD")
+    return to_major_unit(price, currency)
 
 def get_prices(shares_and_markets: Iterable[ShareAndMarket]) -> Iterable[ShareWithPrice]:
-    for share_and_market in shares_and_markets:
-        yield ShareWithPrice(
-            symbol=share_and_market["symbol"],
-            price=get_price(share_and_market["symbol"], share_and_market["market"]),
-        )
\ No newline at end of file
+    """Fetch quotes concurrently and yield them in completion order.
+
+    A symbol that fails to fetch or parse is reported and skipped; it does not
+    stop the remaining quotes from being returned. Closing the generator early
+    cancels quotes that have not started yet.
+    """
+    pairs = list(shares_and_markets)
+    if not pairs:
+        return
+    executor = ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(pairs)))
+    try:
+        futures = {
+            executor.submit(get_quote, pair["symbol"], pair["market"]): pair for pair in pairs
+        }
+        for future in as_completed(futures):
+            pair = futures[future]
+            try:
+                price, currency = future.result()
+            except Exception as exc:
+                print(f"Could not fetch price for {pair['symbol']}:{pair['market']}. Skipping. {exc}")
+                continue
+            yield ShareWithPrice(symbol=pair["symbol"], price=price, currency=currency)
+    finally:
+        # If the consumer stops early, drop quotes that haven't started instead of waiting for them.
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,321 @@
+"""Shared HTTP client for the infra providers: timeouts, retries, circuit breaking and rate limits.
+
+Every provider goes through default_http_client, so a slow or failing
+upstream costs a bounded amount of time:
+
+- connect and read timeouts on every attempt;
+- retries with jittered exponential backoff for connection errors, timeouts,
+  429 and 5xx, honouring Retry-After, until max_attempts or total_timeout;
+- total_timeout also bounds reading the body, so a server that drip-feeds
+  bytes can't hold a request open indefinitely;
+- a per-host circuit breaker that fails fast after failure_threshold
+  consecutive failures and lets one trial request through after reset_timeout;
+- a per-host concurrency cap and an optional token-bucket rate limit.
+
+Limits are set per host name with HostPolicy; unknown hosts use DEFAULT_POLICY.
+"""
+from __future__ import annotations
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
+from typing import Dict, Iterator
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ChunkedEncodingError, ContentDecodingError
+from requests.utils import iter_slices, stream_decode_response_unicode
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
+
+from core.instrumentation import count
+
+# Statuses worth retrying: throttling and transient server errors.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Connections kept per host; matches the widest provider thread pool.
+POOL_MAXSIZE = 16
+USER_AGENT = "Mozilla/5.0"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without contacting the host while its circuit breaker is open."""
+
+
+class TotalTimeoutError(requests.Timeout):
+    """Raised when a response body is still arriving after the request's total_timeout."""
+
+
+@dataclass(frozen=True)
+class HostPolicy:
+    connect_timeout: float = 5.0
+    read_timeout: float = 20.0
+    max_attempts: int = 3
+    backoff_base: float = 0.5
+    backoff_cap: float = 8.0
+    # Wall-clock budget for all attempts, backoff sleeps and reading the body of one request.
+    total_timeout: float = 60.0
+    max_concurrency: int = 8
+    # Sustained requests per second and burst size; None means unlimited.
+    rate_per_second: float | None = None
+    burst: int = 1
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+DEFAULT_POLICY = HostPolicy()
+
+HOST_POLICIES: Dict[str, HostPolicy] = {
+    "www.google.com": HostPolicy(read_timeout=10.0, max_concurrency=8, rate_per_second=20.0, burst=16),
+    "api.bls.gov": HostPolicy(read_timeout=30.0, max_concurrency=4, total_timeout=120.0),
+    "api.frankfurter.app": HostPolicy(max_concurrency=4),
+    # Free Twelve Data plans allow 8 requests a minute.
+    "api.twelvedata.com": HostPolicy(max_concurrency=2, rate_per_second=8 / 60, burst=8, total_timeout=180.0),
+}
+
+
+class _CircuitBreaker:
+    __slots__ = ("_threshold", "_reset_timeout", "_failures", "_opened_at", "_trial_running")
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        self._threshold = threshold
+        self._reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._trial_running = False
+
+    def allow(self, now: float) -> bool:
+        """Closed: always. Open: never until reset_timeout passes, then one trial at a time."""
+        if self._opened_at is None:
+            return True
+        if now - self._opened_at < self._reset_timeout or self._trial_running:
+            return False
+        self._trial_running = True
+        return True
+
+    def record(self, ok: bool, now: float) -> bool:
+        """Record an attempt's outcome; returns True when this failure opened the circuit."""
+        self._trial_running = False
+        if ok:
+            self._failures = 0
+            self._opened_at = None
+            return False
+        self._failures += 1
+        was_open = self._opened_at is not None
+        if was_open or self._failures >= self._threshold:
+            self._opened_at = now
+        return not was_open and self._opened_at is not None
+
+
+class _RateLimiter:
+    __slots__ = ("_rate", "_capacity", "_tokens", "_updated")
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self._rate = rate
+        self._capacity = float(max(1, burst))
+        self._tokens = self._capacity
+        self._updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long to wait before using it."""
+        self._tokens = min(self._capacity, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self._rate
+
+
+class _Host:
+    __slots__ = ("policy", "slots", "breaker", "limiter")
+
+    def __init__(self, policy: HostPolicy) -> None:
+        self.policy = policy
+        self.slots = threading.BoundedSemaphore(policy.max_concurrency)
+        self.breaker = _CircuitBreaker(policy.failure_threshold, policy.reset_timeout)
+        self.limiter = _RateLimiter(policy.rate_per_second, policy.burst) if policy.rate_per_second else None
+
+
+class HttpClient:
+    """A pooled requests.Session with per-host timeouts, retries, breaker and limits."""
+
+    def __init__(self, policies: Dict[str, HostPolicy] | None = None, default_policy: HostPolicy = DEFAULT_POLICY) -> None:
+        self._policies = dict(HOST_POLICIES if policies is None else policies)
+        self._default_policy = default_policy
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _Host] = {}
+        self._session: requests.Session | None = None
+
+    def set_policy(self, host: str, policy: HostPolicy | None = None, **overrides: object) -> None:
+        """Replace a host's policy, or adjust fields of its current one; resets its breaker and limits."""
+        with self._lock:
+            base = policy or self._policies.get(host, self._default_policy)
+            self._policies[host] = replace(base, **overrides) if overrides else base
+            self._hosts.pop(host, None)
+
+    def policy_for(self, host: str) -> HostPolicy:
+        with self._lock:
+            return self._policies.get(host, self._default_policy)
+
+    def get(self, url: str, **kwargs: object) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: object) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs: object) -> requests.Response:
+        """Send a request and read its body, retrying transient failures.
+
+        Returns the last response even if its status is an error; callers
+        decide with raise_for_status(). Raises CircuitOpenError without
+        sending when the host's breaker is open, the last exception once
+        attempts or the total_timeout are used up, or TotalTimeoutError if
+        the body is still arriving at the total_timeout.
+        """
+        with self.stream(method, url, **kwargs) as response:
+            response.content  # read while holding the host slot
+            return response
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs: object) -> Iterator[requests.Response]:
+        """Like request(), but the body is left unread and the host slot is held until the block exits.
+
+        The response's iter_content() raises TotalTimeoutError once the
+        total_timeout has passed. It returns each chunk as soon as a socket
+        read delivers it, so the deadline is overshot by at most one read
+        timeout, and that is capped at the time left when the attempt starts.
+        """
+        hostname = urlsplit(url).hostname or ""
+        host = self._host(hostname)
+        policy = host.policy
+        metric = f"http.client.{hostname}"
+        deadline = time.monotonic() + policy.total_timeout
+        timeout = kwargs.pop("timeout", None)
+        kwargs["stream"] = True
+
+        attempt = 0
+        while True:
+            attempt += 1
+            self._admit(host, hostname, metric)
+            host.slots.acquire()
+            response: requests.Response | None = None
+            try:
+                error: Exception | None = None
+                left = max(deadline - time.monotonic(), 0.001)
+                try:
+                    response = self._get_session().request(
+                        method,
+                        url,
+                        timeout=timeout or (min(policy.connect_timeout, left), min(policy.read_timeout, left)),
+                        **kwargs,
+                    )
+                except (requests.ConnectionError, requests.Timeout) as exc:
+                    error = exc
+                except Exception:
+                    self._record(host, False, metric)
+                    raise
+                failed = error is not None or response.status_code in RETRY_STATUSES
+                # A 429 means the host is up, so only errors and 5xx count towards the breaker.
+                self._record(host, not (error is not None or response.status_code >= 500), metric)
+
+                wait = self._backoff(policy, attempt, response)
+                if not failed or attempt >= policy.max_attempts or time.monotonic() + wait > deadline:
+                    if error is not None:
+                        raise error
+                    response.iter_content = _ContentBeforeDeadline(response, deadline, metric)
+                    yield response
+                    return
+            finally:
+                if response is not None:
+                    response.close()
+                host.slots.release()
+            count(metric, "retries")
+            time.sleep(wait)
+
+    def _admit(self, host: _Host, hostname: str, metric: str) -> None:
+        with self._lock:
+            allowed = host.breaker.allow(time.monotonic())
+            wait = host.limiter.reserve(time.monotonic()) if allowed and host.limiter else 0.0
+        if not allowed:
+            count(metric, "circuit_rejections")
+            raise CircuitOpenError(f"Circuit open for {hostname} after repeated failures; not sending request")
+        if wait > 0:
+            count(metric, "rate_limited_seconds", wait)
+            time.sleep(wait)
+
+    def _record(self, host: _Host, ok: bool, metric: str) -> None:
+        with self._lock:
+            opened = host.breaker.record(ok, time.monotonic())
+        if not ok:
+            count(metric, "failures")
+        if opened:
+            count(metric, "circuit_opened")
+
+    @staticmethod
+    def _backoff(policy: HostPolicy, attempt: int, response: requests.Response | None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it gives one (capped)."""
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), policy.backoff_cap)
+        return random.uniform(0, min(policy.backoff_cap, policy.backoff_base * 2 ** (attempt - 1)))
+
+    def _host(self, hostname: str) -> _Host:
+        with self._lock:
+            host = self._hosts.get(hostname)
+            if host is None:
+                host = self._hosts[hostname] = _Host(self._policies.get(hostname, self._default_policy))
+            return host
+
+    def _get_session(self) -> requests.Session:
+        with self._lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=len(self._policies) + 1, pool_maxsize=POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"User-Agent": USER_AGENT})
+                self._session = session
+            return self._session
+
+
+class _ContentBeforeDeadline:
+    """Stands in for a streamed response's iter_content, giving up at the request's deadline.
+
+    requests' own iter_content blocks until a whole chunk_size has arrived, so
+    a server sending a byte at a time never trips a per-read timeout. This
+    reads with read1, which returns whatever one socket read delivered, and
+    checks the deadline between reads. Errors are translated the way requests
+    translates them.
+    """
+
+    def __init__(self, response: requests.Response, deadline: float, metric: str) -> None:
+        self._response = response
+        self._deadline = deadline
+        self._metric = metric
+
+    def __call__(self, chunk_size: int | None = 1, decode_unicode: bool = False) -> Iterator[bytes]:
+        if self._response._content_consumed and isinstance(self._response._content, bytes):
+            chunks = iter_slices(self._response._content, chunk_size)
+        else:
+            chunks = self._chunks(chunk_size)
+        return stream_decode_response_unicode(chunks, self._response) if decode_unicode else chunks
+
+    def _chunks(self, chunk_size: int | None) -> Iterator[bytes]:
+        raw = self._response.raw
+        try:
+            while True:
+                if time.monotonic() > self._deadline:
+                    count(self._metric, "total_timeouts")
+                    raise TotalTimeoutError(f"Body of {self._response.url} still arriving after the total timeout")
+                chunk = raw.read1(chunk_size, decode_content=True)
+                if not chunk:
+                    break
+                yield chunk
+        except ProtocolError as exc:
+            raise ChunkedEncodingError(exc)
+        except DecodeError as exc:
+            raise ContentDecodingError(exc)
+        except ReadTimeoutError as exc:
+            raise requests.ConnectionError(exc)
+        self._response._content_consumed = True
+
+
+default_http_client = HttpClient()
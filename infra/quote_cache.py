@@ -0,0 +1,229 @@
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from core.currency import currency_for_market, to_major_unit
+from core.dto import ShareAndMarket, ShareWithPrice
+from core.instrumentation import count
+from core.ports import PriceProvider
+from infra import google_finance_price_provider
+
+DEFAULT_TTL_SECONDS = 300.0
+# Per-market overrides, e.g. {"IST": 900.0}; markets not listed use DEFAULT_TTL_SECONDS.
+MARKET_TTL_SECONDS: Dict[str, float] = {}
+DEFAULT_MAX_ENTRIES = 4096
+# Stale quotes are served while refreshing only up to this many TTLs old; older ones count as misses.
+DEFAULT_MAX_STALE_TTLS = 4.0
+
+PriceFetcher = Callable[[Iterable[ShareAndMarket]], Iterable[ShareWithPrice]]
+QuoteKey = Tuple[str, str]
+
+
+class QuoteCache(PriceProvider):
+    """LRU quote cache with per-market TTL and stale-while-revalidate.
+
+    Fresh quotes are served from memory. Stale quotes are served immediately
+    and refreshed in the background, until they are max_stale_ttls TTLs old;
+    past that they are dropped and fetched inline like misses, so a quote
+    loaded from an old snapshot is never served. Only misses block on the
+    fetcher. With persist=True, quotes are also kept in the QuoteSnapshot
+    table so they survive restarts.
+
+    A background refresh dies with a short-lived process, so one-shot callers
+    such as the CLI set revalidate_inline: stale quotes are then fetched
+    before they are returned, and served stale only if that fetch fails.
+    """
+
+    def __init__(
+        self,
+        fetcher: PriceFetcher | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        default_ttl: float = DEFAULT_TTL_SECONDS,
+        market_ttl: Dict[str, float] | None = None,
+        persist: bool = False,
+        max_stale_ttls: float = DEFAULT_MAX_STALE_TTLS,
+        revalidate_inline: bool = False,
+    ) -> None:
+        self._fetcher = fetcher or google_finance_price_provider.get_prices
+        self._max_entries = max_entries
+        self._default_ttl = default_ttl
+        self._market_ttl = dict(MARKET_TTL_SECONDS if market_ttl is None else market_ttl)
+        self.persist = persist
+        self._max_stale_ttls = max_stale_ttls
+        self.revalidate_inline = revalidate_inline
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[QuoteKey, Tuple[Decimal, str, float]] = OrderedDict()
+        self._refreshing: set[QuoteKey] = set()
+        self._refresher: ThreadPoolExecutor | None = None
+        self._hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._refreshes = 0
+        self._refresh_errors = 0
+
+    def ttl_for(self, market: str) -> float:
+        return self._market_ttl.get(market, self._default_ttl)
+
+    def max_stale_for(self, market: str) -> float:
+        """Age in seconds past which a quote is no longer served, even while it is refreshed."""
+        return self.ttl_for(market) * self._max_stale_ttls
+
+    def get_prices(self, shares_and_markets: Iterable[ShareAndMarket]) -> Iterable[ShareWithPrice]:
+        """Yield cached quotes first, then fetch and yield the misses."""
+        pairs = list(shares_and_markets)
+        if self.persist:
+            self._load_persisted([(p["symbol"], p["market"]) for p in pairs])
+
+        now = time.time()
+        stale: List[ShareAndMarket] = []
+        missing: List[ShareAndMarket] = []
+        cached: List[ShareWithPrice] = []
+        # Stale quotes being revalidated inline, served only if the fetch doesn't return them.
+        fallback: Dict[str, ShareWithPrice] = {}
+        inline = self.revalidate_inline
+        hits = stale_hits = expired = 0
+        with self._lock:
+            for pair in pairs:
+                key = (pair["symbol"], pair["market"])
+                entry = self._entries.get(key)
+                if entry is not None and now - entry[2] > self.max_stale_for(pair["market"]):
+                    del self._entries[key]
+                    entry = None
+                    expired += 1
+                if entry is None:
+                    self._misses += 1
+                    missing.append(pair)
+                    continue
+                self._entries.move_to_end(key)
+                price, currency, fetched_at = entry
+                quote = ShareWithPrice(symbol=pair["symbol"], price=price, currency=currency)
+                if now - fetched_at <= self.ttl_for(pair["market"]):
+                    hits += 1
+                    cached.append(quote)
+                    continue
+                stale_hits += 1
+                if inline:
+                    fallback[pair["symbol"]] = quote
+                    stale.append(pair)
+                    continue
+                cached.append(quote)
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    stale.append(pair)
+            self._hits += hits
+            self._stale_hits += stale_hits
+            self._expired += expired
+
+        # Every lookup is exactly one of a hit, a stale hit or a miss, whether or not
+        # its refresh was already in flight.
+        count("cache.quotes", "hits", hits)
+        count("cache.quotes", "stale", stale_hits)
+        count("cache.quotes", "misses", len(missing))
+        count("cache.quotes", "expired", expired)
+        if stale and not inline:
+            self._schedule_refresh(stale)
+
+        yield from cached
+        to_fetch = missing + stale if inline else missing
+        if to_fetch:
+            for quote in self._fetch_and_store(to_fetch):
+                fallback.pop(quote["symbol"], None)
+                yield quote
+        yield from fallback.values()
+
+    def stats(self) -> Dict[str, object]:
+        """Return hit/miss counters and the age in seconds of every cached quote."""
+        now = time.time()
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "stale_hits": self._stale_hits,
+                "misses": self._misses,
+                "expired": self._expired,
+                "refreshes": self._refreshes,
+                "refresh_errors": self._refresh_errors,
+                "entries": len(self._entries),
+                "ages": {f"{symbol}:{market}": now - fetched_at for (symbol, market), (_, _, fetched_at) in self._entries.items()},
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _store(self, items: List[Tuple[QuoteKey, Decimal, str]], fetched_at: float) -> None:
+        with self._lock:
+            for key, price, currency in items:
+                self._entries[key] = (price, currency, fetched_at)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        if self.persist and items:
+            from data.repositories import save_quote_snapshots
+
+            stamp = datetime.fromtimestamp(fetched_at)
+            save_quote_snapshots([(symbol, market, price, currency, stamp) for (symbol, market), price, currency in items])
+
+    def _fetch_and_store(self, pairs: List[ShareAndMarket]) -> Iterable[ShareWithPrice]:
+        markets = {pair["symbol"]: pair["market"] for pair in pairs}
+        fetched: List[Tuple[QuoteKey, Decimal, str]] = []
+        quotes = self._fetcher(pairs)
+        try:
+            for quote in quotes:
+                fetched.append(((quote["symbol"], markets[quote["symbol"]]), quote["price"], quote["currency"]))
+                yield quote
+        finally:
+            close = getattr(quotes, "close", None)
+            if close:
+                close()
+            self._store(fetched, time.time())
+
+    def _schedule_refresh(self, pairs: List[ShareAndMarket]) -> None:
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="quote-refresh")
+            refresher = self._refresher
+        refresher.submit(self._refresh, pairs)
+
+    def _refresh(self, pairs: List[ShareAndMarket]) -> None:
+        try:
+            refreshed = sum(1 for _ in self._fetch_and_store(pairs))
+            with self._lock:
+                self._refreshes += refreshed
+                self._refresh_errors += len(pairs) - refreshed
+        except Exception:
+            with self._lock:
+                self._refresh_errors += len(pairs)
+        finally:
+            with self._lock:
+                for pair in pairs:
+                    self._refreshing.discard((pair["symbol"], pair["market"]))
+
+    def _load_persisted(self, keys: List[QuoteKey]) -> None:
+        with self._lock:
+            unknown = [key for key in keys if key not in self._entries]
+        if not unknown:
+            return
+        from data.repositories import load_quote_snapshots
+
+        snapshots = load_quote_snapshots(unknown)
+        with self._lock:
+            for key, (price, currency, fetched_at) in snapshots.items():
+                if currency is None:
+                    # Stored before quotes carried a currency: prices were in the market's quote unit.
+                    price, currency = to_major_unit(price, currency_for_market(key[1], "USD"))
+                self._entries.setdefault(key, (price, currency, fetched_at.timestamp()))
+
+
+default_quote_cache = QuoteCache()
+
+
+def get_prices(shares_and_markets: Iterable[ShareAndMarket]) -> Iterable[ShareWithPrice]:
+    """Drop-in replacement for google_finance_price_provider.get_prices backed by the default cache."""
+    return default_quote_cache.get_prices(shares_and_markets)
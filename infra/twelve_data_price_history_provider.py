@@ -0,0 +1,58 @@
+import os
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from typing import Dict
+
+from core.instrumentation import span
+from core.ports import PriceHistoryProvider as PriceHistoryProviderProtocol
+from infra.http_client import default_http_client
+
+TWELVE_DATA_URL = "https://api.twelvedata.com/time_series"
+# Twelve Data returns at most this many points per request.
+MAX_OUTPUTSIZE = 5000
+
+
+class TwelveDataPriceHistoryProvider(PriceHistoryProviderProtocol):
+    def get_price_history(self, symbol: str, market: str, start: date, end: date) -> Dict[date, Decimal]:
+        """Return mapping of trading day -> close (Decimal) from Twelve Data for start..end."""
+        api_key = os.getenv("TWELVE_DATA_API_KEY")
+        if not api_key:
+            raise ValueError("TWELVE_DATA_API_KEY is not set")
+
+        closes: Dict[date, Decimal] = {}
+        window_end = end
+        while window_end >= start:
+            with span("http.twelve_data.page") as s:
+                resp = default_http_client.get(
+                    TWELVE_DATA_URL,
+                    params={
+                        "symbol": symbol,
+                        "exchange": market,
+                        "interval": "1day",
+                        "start_date": start.isoformat(),
+                        "end_date": window_end.isoformat(),
+                        "outputsize": MAX_OUTPUTSIZE,
+                        "order": "desc",
+                        "apikey": api_key,
+                    },
+                )
+                resp.raise_for_status()
+                payload = resp.json()
+                s.add("bytes", len(resp.content))
+            if payload.get("status") == "error":
+                raise ValueError(f"Twelve Data error for {symbol}:{market}: {payload.get('message')}")
+
+            values = payload.get("values") or []
+            for entry in values:
+                try:
+                    day = date.fromisoformat(str(entry["datetime"])[:10])
+                    closes[day] = Decimal(str(entry["close"]))
+                except (KeyError, ValueError, InvalidOperation):
+                    continue
+
+            # Newest-first pages: keep paging back until a short page or we pass start.
+            if len(values) < MAX_OUTPUTSIZE or not closes:
+                break
+            window_end = date.fromordinal(min(closes).toordinal() - 1)
+
+        return closes
@@ -2,11 +2,27 @@ from __future__ import annotations
 from dotenv import load_dotenv
 load_dotenv()
 
+import os
 import sys
+import threading
+import traceback
 from decimal import Decimal
 from datetime import date
-
-from PySide6.QtCore import Qt, QCoreApplication, QObject, Signal, Slot, QThread, QDate
+from typing import Dict
+
+from PySide6.QtCore import (
+    Qt,
+    QAbstractTableModel,
+    QCoreApplication,
+    QModelIndex,
+    QObject,
+    QSortFilterProxyModel,
+    Signal,
+    Slot,
+    QThread,
+    QTimer,
+    QDate,
+)
 from PySide6.QtWidgets import (
     QApplication,
     QWidget,
@@ -14,8 +30,8 @@ from PySide6.QtWidgets import (
     QHBoxLayout,
     QPushButton,
     QLabel,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
+    QAbstractItemView,
     QMessageBox,
     QLineEdit,
     QFormLayout,
@@ -27,17 +43,28 @@ from PySide6.QtWidgets import (
 )
 from PySide6.QtGui import QIcon
 
+from core.analysis import totals_from_aggregates
+from core import instrumentation
+from core.currency import cost_currency_for_market, currency_symbol
+from core.formatting import format_currency
+from core.ports import CpiDataProvider
 from data.models import init_db
-from data.repositories import load_share_purchases_as_rows, add_share_purchase
-from infra.cpi_data_provider import BlsCpiDataProvider
-from services.investment_service import run_investment_analysis
-
+from data.repositories import add_share_purchase, ensure_purchase_summaries, load_held_purchases_as_rows
+from infra.cpi_registry import default_cpi_registry
+from infra.fx_rate_provider import CachedFxRateProvider, FrankfurterFxRateProvider
+from infra.quote_cache import default_quote_cache
+from services.investment_service import run_investment_analysis, stream_investment_analysis
+
+# Clicks on Refresh within this window are merged into a single request
+REFRESH_DEBOUNCE_MS = 250
+# Currency every amount is shown in; foreign holdings are converted with cached daily FX rates
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "USD")
+# CPI source to deflate with (see infra.cpi_registry), and optional per-currency sources
+CPI_SERIES = os.getenv("CPI_SERIES", "us-cpi-u-sa")
+CPI_SERIES_BY_CURRENCY = os.getenv("CPI_SERIES_BY_CURRENCY", "")
+# With PERF_TRACE=1, span metrics are written here on exit (.prom for Prometheus text, JSON otherwise)
+PERF_METRICS_PATH = os.getenv("PERF_METRICS_PATH")
 
-def format_currency(value: Decimal) -> str:
-    try:
-        return f"${Decimal(value):,.2f}"
-    except Exception:
-        return str(value)
 
 class InitialWindow(QWidget):
     def __init__(self) -> None:
@@ -92,33 +119,140 @@ class InitialWindow(QWidget):
         self._add_shares_window.show()
         self.hide()
 
+class AnalysisTableModel(QAbstractTableModel):
+    """Read-only model over CompanyAggregate rows; cells are formatted on demand in data()."""
+
+    HEADERS = [
+        "Symbol",
+        "Invested (Nominal)",
+        "Invested (Real)",
+        "Current Value",
+        "Profit (Nominal)",
+        "Profit (Real)",
+    ]
+    FIELDS = [
+        "name",
+        "total_nominal_invested",
+        "total_real_invested",
+        "total_current_value",
+        "total_nominal_profit",
+        "total_real_profit",
+    ]
+    SORT_ROLE = Qt.ItemDataRole.UserRole
+
+    def __init__(self, parent: QObject | None = None) -> None:
+        super().__init__(parent)
+        self._rows: list = []
+        self._row_by_name: dict[str, int] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        value = getattr(self._rows[index.row()], self.FIELDS[index.column()])
+        if role == Qt.ItemDataRole.DisplayRole:
+            return value if index.column() == 0 else format_currency(value, BASE_CURRENCY)
+        if role == self.SORT_ROLE:
+            return value if index.column() == 0 else float(value)
+        if role == Qt.ItemDataRole.TextAlignmentRole and index.column() > 0:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._rows = []
+        self._row_by_name = {}
+        self.endResetModel()
+
+    def set_results(self, company_results: list) -> None:
+        """Update rows in place: changed rows emit dataChanged, new rows are appended, missing rows removed."""
+        incoming = {company.name: company for company in company_results}
+
+        for row in sorted((r for name, r in self._row_by_name.items() if name not in incoming), reverse=True):
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._rows[row]
+            self.endRemoveRows()
+        self._row_by_name = {company.name: row for row, company in enumerate(self._rows)}
+
+        first_changed, last_changed = len(self._rows), -1
+        for name, company in incoming.items():
+            row = self._row_by_name.get(name)
+            if row is not None and self._rows[row] != company:
+                self._rows[row] = company
+                first_changed, last_changed = min(first_changed, row), max(last_changed, row)
+        if last_changed >= 0:
+            self.dataChanged.emit(
+                self.index(first_changed, 0), self.index(last_changed, len(self.HEADERS) - 1)
+            )
+
+        new_rows = [company for name, company in incoming.items() if name not in self._row_by_name]
+        if new_rows:
+            start = len(self._rows)
+            self.beginInsertRows(QModelIndex(), start, start + len(new_rows) - 1)
+            for company in new_rows:
+                self._row_by_name[company.name] = len(self._rows)
+                self._rows.append(company)
+            self.endInsertRows()
+
+    def upsert_row(self, company) -> None:
+        """Insert or update a single row, e.g. as partial results stream in."""
+        row = self._row_by_name.get(company.name)
+        if row is None:
+            row = len(self._rows)
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._row_by_name[company.name] = row
+            self._rows.append(company)
+            self.endInsertRows()
+        elif self._rows[row] != company:
+            self._rows[row] = company
+            self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+
+
 class AnalysisWindow(QWidget):
     def __init__(self) -> None:
         super().__init__()
         self.setWindowTitle("Investment Analysis")
         self.resize(900, 600)
 
-        self.table = QTableWidget(self)
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels([
-            "Symbol",
-            "Invested (Nominal)",
-            "Invested (Real)",
-            "Current Value",
-            "Profit (Nominal)",
-            "Profit (Real)",
-        ])
+        self.table_model = AnalysisTableModel(self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.table_model)
+        self.proxy_model.setSortRole(AnalysisTableModel.SORT_ROLE)
+        self.proxy_model.setFilterKeyColumn(0)
+        self.proxy_model.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+        self.table = QTableView(self)
+        self.table.setModel(self.proxy_model)
+        self.table.setSortingEnabled(True)
         self.table.horizontalHeader().setStretchLastSection(True)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.table.setAlternatingRowColors(True)
 
+        self.filter_edit = QLineEdit(self)
+        self.filter_edit.setPlaceholderText("Filter by symbol")
+        self.filter_edit.textChanged.connect(self.proxy_model.setFilterFixedString)
+
         self.refresh_button = QPushButton("Refresh Analysis", self)
         self.refresh_button.clicked.connect(self.refresh_analysis)
 
         self.back_button = QPushButton("Back to Main Menu", self)
         self.back_button.clicked.connect(self._go_back)
 
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.clicked.connect(self._cancel_refresh)
+        self.cancel_button.hide()
+
         # Loading indicator
         self.loading_label = QLabel("Loading analysis...", self)
         self.loading_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -126,7 +260,8 @@ class AnalysisWindow(QWidget):
         self.loading_label.hide()
 
         self.progress_bar = QProgressBar(self)
-        self.progress_bar.setRange(0, 0)  # Indeterminate progress
+        self.progress_bar.setRange(0, 0)  # Indeterminate until the symbol count is known
+        self.progress_bar.setFormat("%v of %m symbols")
         self.progress_bar.hide()
 
         self.summary_label = QLabel(self)
@@ -135,7 +270,9 @@ class AnalysisWindow(QWidget):
         top_bar = QHBoxLayout()
         top_bar.addWidget(self.refresh_button)
         top_bar.addWidget(self.back_button)
+        top_bar.addWidget(self.cancel_button)
         top_bar.addStretch(1)
+        top_bar.addWidget(self.filter_edit)
 
         layout = QVBoxLayout(self)
         layout.addLayout(top_bar)
@@ -144,11 +281,28 @@ class AnalysisWindow(QWidget):
         layout.addWidget(self.table)
         layout.addWidget(self.summary_label)
 
-        # Track worker/thread to prevent GC
-        self._thread: QThread | None = None
-        self._worker: AnalysisWorker | None = None
+        # One long-lived worker thread keeps providers and HTTP connections warm across refreshes
+        self._thread = QThread(self)
+        self._worker = AnalysisWorker()
+        self._worker.moveToThread(self._thread)
+        self._worker.partial.connect(self._handle_partial)
+        self._worker.progress.connect(self._update_progress)
+        self._worker.success.connect(self._update_ui_from_result)
+        self._worker.empty.connect(self._handle_empty)
+        self._worker.cancelled.connect(self._handle_cancelled)
+        self._worker.error.connect(self._handle_analysis_error)
+        self._thread.start()
+        QCoreApplication.instance().aboutToQuit.connect(self._stop_worker)
+        self._request_id = 0
+        self._awaiting_result = False
         self._parent_window = None
 
+        # Rapid clicks restart the timer, so a burst of refreshes becomes one request
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(REFRESH_DEBOUNCE_MS)
+        self._refresh_timer.timeout.connect(self._submit_refresh)
+
         # Initial load
         self.refresh_analysis()
 
@@ -165,103 +319,211 @@ class AnalysisWindow(QWidget):
         if loading:
             # Show loading indicators
             self.loading_label.show()
+            self.progress_bar.setRange(0, 0)
             self.progress_bar.show()
-            # Disable interactive elements
-            self.refresh_button.setEnabled(False)
+            self.cancel_button.setEnabled(True)
+            self.cancel_button.show()
+            # Refresh stays enabled: a new click supersedes the run in progress
             self.back_button.setEnabled(False)
-            self.table.setEnabled(False)
-            # Clear table and show loading message
-            self.table.setRowCount(0)
+            # Keep the table usable; rows fill in as each symbol's quote arrives
             self.summary_label.setText("Loading analysis... Please wait.")
         else:
             # Hide loading indicators
             self.loading_label.hide()
             self.progress_bar.hide()
+            self.cancel_button.hide()
             # Re-enable interactive elements
-            self.refresh_button.setEnabled(True)
             self.back_button.setEnabled(True)
-            self.table.setEnabled(True)
 
     def refresh_analysis(self) -> None:
-        purchases = load_share_purchases_as_rows()
-        if not purchases:
-            self.table.setRowCount(0)
-            self.summary_label.setText("No purchases found. Add purchases to see analysis.")
-            return
-
-        earliest_date = purchases[0]["purchase_date"]
+        self._set_loading_state(True)
+        self._refresh_timer.start()
 
-        # Set loading state
+    @Slot()
+    def _submit_refresh(self) -> None:
+        # A run for an earlier click may have finished while this one was debounced
         self._set_loading_state(True)
+        self._request_id = self._worker.submit()
+        self._awaiting_result = True
 
-        # Create thread & worker
-        self._thread = QThread(self)
-        self._worker = AnalysisWorker(purchases, earliest_date)
-        self._worker.moveToThread(self._thread)
+    @Slot()
+    def _stop_worker(self) -> None:
+        self._worker.cancel()
+        self._thread.quit()
+        self._thread.wait()
+
+    def _cancel_refresh(self) -> None:
+        self._refresh_timer.stop()
+        self._worker.cancel()
+        if self._awaiting_result:
+            self.cancel_button.setEnabled(False)
+            self.summary_label.setText("Cancelling...")
+        else:
+            # Only a debounced click was pending, so there is no run to wait for
+            self._set_loading_state(False)
+            self.summary_label.setText("Refresh cancelled.")
+
+    @Slot(int, object)
+    def _handle_partial(self, request_id: int, company) -> None:
+        if request_id == self._request_id:
+            self.table_model.upsert_row(company)
+
+    @Slot(int, int, int)
+    def _update_progress(self, request_id: int, done: int, total: int) -> None:
+        if request_id != self._request_id:
+            return
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
 
-        # Wire signals
-        self._thread.started.connect(self._worker.run)
-        self._worker.success.connect(self._update_ui_from_result)
-        self._worker.error.connect(self._handle_analysis_error)
-        self._worker.finished.connect(self._thread.quit)
-        self._worker.finished.connect(self._worker.deleteLater)
-        self._thread.finished.connect(self._thread.deleteLater)
-        self._thread.finished.connect(lambda: self._set_loading_state(False))
+    @Slot(int)
+    def _handle_empty(self, request_id: int) -> None:
+        if request_id != self._request_id:
+            return
+        self._awaiting_result = False
+        self._set_loading_state(False)
+        self.table_model.clear()
+        self.summary_label.setText("No purchases found. Add purchases to see analysis.")
 
-        self._thread.start()
+    @Slot(int, int, int)
+    def _handle_cancelled(self, request_id: int, done: int, total: int) -> None:
+        if request_id != self._request_id:
+            return
+        self._awaiting_result = False
+        self._set_loading_state(False)
+        self.summary_label.setText(f"Refresh cancelled after {done} of {total} symbols.")
 
-    @Slot(str)
-    def _handle_analysis_error(self, error_message: str) -> None:
+    @Slot(int, str)
+    def _handle_analysis_error(self, request_id: int, error_message: str) -> None:
         """Handle analysis errors and reset loading state."""
-        QMessageBox.critical(self, "Analysis Error", error_message)
+        if request_id != self._request_id:
+            return
+        self._awaiting_result = False
         self._set_loading_state(False)
+        QMessageBox.critical(self, "Analysis Error", error_message)
 
-    @Slot(list, object)
-    def _update_ui_from_result(self, company_results, totals) -> None:
-        self.table.setRowCount(len(company_results))
-        for row_index, company in enumerate(company_results):
-            self.table.setItem(row_index, 0, QTableWidgetItem(company.name))
-            self.table.setItem(row_index, 1, QTableWidgetItem(format_currency(company.total_nominal_invested)))
-            self.table.setItem(row_index, 2, QTableWidgetItem(format_currency(company.total_real_invested)))
-            self.table.setItem(row_index, 3, QTableWidgetItem(format_currency(company.total_current_value)))
-            self.table.setItem(row_index, 4, QTableWidgetItem(format_currency(company.total_nominal_profit)))
-            self.table.setItem(row_index, 5, QTableWidgetItem(format_currency(company.total_real_profit)))
+    @Slot(int, list, object)
+    def _update_ui_from_result(self, request_id: int, company_results, totals) -> None:
+        if request_id != self._request_id:
+            return
+        self._awaiting_result = False
+        self._set_loading_state(False)
+        self.table_model.set_results(company_results)
 
         totals_text = (
             f"Portfolio Totals:\n"
-            f"  Invested (Nominal): {format_currency(totals.total_nominal_invested)}\n"
-            f"  Invested (Real):    {format_currency(totals.total_real_invested)}\n"
-            f"  Current Value:      {format_currency(totals.total_current_value)}\n"
-            f"  Profit (Nominal):   {format_currency(totals.total_nominal_profit)}\n"
-            f"  Profit (Real):      {format_currency(totals.total_real_profit)}"
+            f"  Invested (Nominal): {format_currency(totals.total_nominal_invested, BASE_CURRENCY)}\n"
+            f"  Invested (Real):    {format_currency(totals.total_real_invested, BASE_CURRENCY)}\n"
+            f"  Current Value:      {format_currency(totals.total_current_value, BASE_CURRENCY)}\n"
+            f"  Profit (Nominal):   {format_currency(totals.total_nominal_profit, BASE_CURRENCY)}\n"
+            f"  Profit (Real):      {format_currency(totals.total_real_profit, BASE_CURRENCY)}"
         )
         self.summary_label.setText(totals_text)
 
 
 class AnalysisWorker(QObject):
-    finished = Signal()
-    success = Signal(list, object)
-    error = Signal(str)
+    """Long-lived analysis worker; lives on its own QThread for the window's lifetime.
+
+    submit() may be called from the GUI thread at any time. Requests are queued
+    to the worker thread and coalesced: a run stops as soon as a newer request
+    or a cancel arrives, and queued requests that are already superseded are
+    skipped. Every signal carries the request id it belongs to.
+    """
+
+    success = Signal(int, list, object)
+    error = Signal(int, str)
+    partial = Signal(int, object)
+    progress = Signal(int, int, int)
+    cancelled = Signal(int, int, int)
+    empty = Signal(int)
+    _requested = Signal(int)
 
-    def __init__(self, purchases: list, earliest_date: str) -> None:
+    def __init__(self) -> None:
         super().__init__()
-        self._purchases = purchases
-        self._earliest_date = earliest_date
-
-    @Slot()
-    def run(self) -> None:
+        self._lock = threading.Lock()
+        self._latest = 0
+        self._cancelled_upto = 0
+        self._cpi_data_provider: CpiDataProvider | None = None
+        self._local_cpi_providers: Dict[str, CpiDataProvider] = {}
+        self._fx_rate_provider: CachedFxRateProvider | None = None
+        self._requested.connect(self._run)
+
+    def submit(self) -> int:
+        """Queue a refresh and return its request id."""
+        with self._lock:
+            self._latest += 1
+            request_id = self._latest
+        self._requested.emit(request_id)
+        return request_id
+
+    def cancel(self) -> None:
+        """Cancel the current and any queued request; safe to call from the GUI thread."""
+        with self._lock:
+            self._cancelled_upto = self._latest
+
+    def latest_request(self) -> int:
+        with self._lock:
+            return self._latest
+
+    def _is_stopped(self, request_id: int) -> bool:
+        with self._lock:
+            return request_id != self._latest or request_id <= self._cancelled_upto
+
+    @Slot(int)
+    @instrumentation.traced("gui.refresh")
+    def _run(self, request_id: int) -> None:
+        if self._is_stopped(request_id):
+            if request_id == self.latest_request():
+                self.cancelled.emit(request_id, 0, 0)
+            return
         try:
-            cpi_data_provider = BlsCpiDataProvider()
-            company_results, totals = run_investment_analysis(
-                purchase_rows=self._purchases,
-                initial_year=self._earliest_date,
-                cpi_data_provider=cpi_data_provider,
-            )
-            self.success.emit(company_results, totals)
+            # Read purchases here, off the GUI thread
+            purchases = load_held_purchases_as_rows(BASE_CURRENCY)
+            if not purchases:
+                self.empty.emit(request_id)
+                return
+            earliest_date = purchases[0]["purchase_date"]
+
+            if self._cpi_data_provider is None:
+                self._cpi_data_provider = default_cpi_registry.provider(CPI_SERIES)
+                self._local_cpi_providers = default_cpi_registry.providers_by_currency(CPI_SERIES_BY_CURRENCY)
+                self._fx_rate_provider = CachedFxRateProvider(FrankfurterFxRateProvider())
+
+            if os.getenv("ANALYSIS_BACKEND") == "fast":
+                # The vectorized backend needs every price up front, so it reports once at the end.
+                company_results, totals = run_investment_analysis(
+                    purchase_rows=purchases,
+                    initial_year=earliest_date,
+                    cpi_data_provider=self._cpi_data_provider,
+                    backend="fast",
+                    fx_rate_provider=self._fx_rate_provider,
+                    base_currency=BASE_CURRENCY,
+                    local_cpi_providers=self._local_cpi_providers,
+                )
+                self.success.emit(request_id, company_results, totals)
+                return
+
+            company_results = []
+            done, total = 0, 0
+            for company, done, total in stream_investment_analysis(
+                purchase_rows=purchases,
+                initial_year=earliest_date,
+                cpi_data_provider=self._cpi_data_provider,
+                should_cancel=lambda: self._is_stopped(request_id),
+                fx_rate_provider=self._fx_rate_provider,
+                base_currency=BASE_CURRENCY,
+                local_cpi_providers=self._local_cpi_providers,
+            ):
+                company_results.append(company)
+                self.partial.emit(request_id, company)
+                self.progress.emit(request_id, done, total)
+
+            if not self._is_stopped(request_id):
+                self.success.emit(request_id, company_results, totals_from_aggregates(company_results))
+            elif request_id == self.latest_request():
+                self.cancelled.emit(request_id, done, total)
         except Exception as exc:
-            self.error.emit(str(exc))
-        finally:
-            self.finished.emit()
+            traceback.print_exc()
+            self.error.emit(request_id, f"{type(exc).__name__}: {exc}")
 
 
 class AddSharesWindow(QWidget):
@@ -276,6 +538,7 @@ class AddSharesWindow(QWidget):
         
         self.market_edit = QLineEdit(self)
         self.market_edit.setPlaceholderText("e.g., NASDAQ, NYSE, LSE, TSE")
+        self.market_edit.textChanged.connect(self._update_cost_currency)
         
         self.quantity_spin = QDoubleSpinBox(self)
         self.quantity_spin.setDecimals(6)
@@ -286,7 +549,7 @@ class AddSharesWindow(QWidget):
         self.cost_spin.setDecimals(2)
         self.cost_spin.setRange(0.01, 999999.99)
         self.cost_spin.setValue(100.00)
-        self.cost_spin.setPrefix("$")
+        self._update_cost_currency("")
         
         self.date_edit = QDateEdit(self)
         self.date_edit.setDate(QDate.currentDate())
@@ -322,6 +585,11 @@ class AddSharesWindow(QWidget):
     def set_parent_window(self, parent_window):
         self._parent_window = parent_window
 
+    @Slot(str)
+    def _update_cost_currency(self, market: str) -> None:
+        # Costs are analyzed in the market's quote currency, so label the input with it
+        self.cost_spin.setPrefix(currency_symbol(cost_currency_for_market(market.strip(), BASE_CURRENCY)))
+
     def _add_share(self) -> None:
         symbol = self.symbol_edit.text().strip().upper()
         market = self.market_edit.text().strip()
@@ -363,7 +631,7 @@ class AddSharesWindow(QWidget):
                 f"Symbol: {result['symbol']}\n"
                 f"Market: {result['market']}\n"
                 f"Quantity: {result['quantity']}\n"
-                f"Cost: ${result['cost']}\n"
+                f"Cost: {format_currency(result['cost'], cost_currency_for_market(result['market'], BASE_CURRENCY))}\n"
                 f"Date: {result['purchase_date']}\n"
                 f"Market mapping: {result['market_action']}"
             )
@@ -388,9 +656,15 @@ class AddSharesWindow(QWidget):
 
 if __name__ == "__main__":
     init_db()
+    ensure_purchase_summaries()
+    default_quote_cache.persist = True
 
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("assets/icon.png"))
     chooser = InitialWindow()
     chooser.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    with instrumentation.profile():
+        exit_code = app.exec()
+    if PERF_METRICS_PATH and instrumentation.is_enabled():
+        instrumentation.write_metrics(PERF_METRICS_PATH)
+    sys.exit(exit_code)
\ No newline at end of file
@@ -1,34 +1,616 @@
 from __future__ import annotations
-from typing import Iterable, List, Tuple
+import asyncio
+import calendar
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Literal, Set, Tuple
 
-from core.analysis import analyze
+from core.analysis import InflationIndex, analyze, analyze_deflators, group_by_symbol, missing_cpi_months, totals_from_aggregates
+from core.batch import PurchaseBatch
+from core.currency import FxRateTable, analyze_company_in_base, convert_batch, convert_rows, cost_currency_for_market
+from core.instrumentation import count, span, traced
 from core.models import CompanyAggregate, PortfolioTotals
-from core.ports import CpiDataProvider
-from infra.google_finance_price_provider import get_prices
+from core.ports import (
+    AsyncCpiDataProvider,
+    AsyncFxRateProvider,
+    AsyncPriceProvider,
+    CpiDataProvider,
+    CpiSeriesSource,
+    FxRateProvider,
+)
+from infra.quote_cache import get_prices
 
-from core.dto import PurchaseRow, ShareAndMarket
+from core.dto import PurchaseLotRow, PurchaseRow, SaleRow, ShareAndMarket, ShareWithPrice
 
+if TYPE_CHECKING:
+    from core.lots import CostBasisMethod
+    from core.models import LotGains, ReturnMetrics
+    from core.timeline import ValueTimeline
 
+# Days of rate history fetched before the earliest date needed, so a purchase on
+# a weekend or holiday still finds the previous business day's rate.
+FX_LOOKBACK_DAYS = 7
+
+
+def _symbol_markets(purchases: Iterable[PurchaseRow] | PurchaseBatch) -> Iterable[Tuple[str, str | None]]:
+    """(symbol, market) per purchase row, or once per symbol for a PurchaseBatch."""
+    if isinstance(purchases, PurchaseBatch):
+        return purchases.symbol_markets()
+    return ((p["symbol"], p["market"]) for p in purchases)
+
+
+def _purchase_dates(purchases: Iterable[PurchaseRow] | PurchaseBatch) -> Iterable[str]:
+    if isinstance(purchases, PurchaseBatch):
+        return purchases.iso_dates().values()
+    return (p["purchase_date"] for p in purchases)
+
+
+def _shares_and_markets(purchase_rows: Iterable[PurchaseRow] | PurchaseBatch) -> List[ShareAndMarket]:
+    unique_pairs: set[tuple[str, str]] = set()
+    for symbol, market in _symbol_markets(purchase_rows):
+        if market:
+            unique_pairs.add((symbol, market))
+        else:
+            print(f"No market found for {symbol}. Skipping. Please add a market to the share purchase.")
+
+    return [{"symbol": symbol, "market": market} for (symbol, market) in unique_pairs]
+
+
+@traced("service.fetch_quotes", count_rows=True)
+def _fetch_current_quotes(purchase_rows: Iterable[PurchaseRow]) -> Dict[str, ShareWithPrice]:
+    return {q["symbol"]: q for q in get_prices(_shares_and_markets(purchase_rows))}
+
+
+@traced("service.fetch_cpi", count_rows=True)
+def _fetch_cpi(
+    purchase_rows: Iterable[PurchaseRow], initial_year: str, cpi_data_provider: CpiDataProvider
+) -> Dict[str, Decimal]:
+    cpi_index = cpi_data_provider.get_cpi_from_initial_date(initial_year)
+    missing_months = missing_cpi_months(purchase_rows, cpi_index)
+    if missing_months:
+        print(f"No CPI data for purchase month(s) {', '.join(missing_months)}. Those purchases are not inflation-adjusted.")
+    return cpi_index
+
+
+def _symbol_currencies(
+    purchase_rows: Iterable[PurchaseRow] | PurchaseBatch, quotes: Dict[str, ShareWithPrice], base_currency: str
+) -> Dict[str, str]:
+    """Currency of each symbol: its quote's when known, otherwise its market's usual one."""
+    currencies: Dict[str, str] = {}
+    for symbol, market in _symbol_markets(purchase_rows):
+        if symbol in currencies:
+            continue
+        quote = quotes.get(symbol)
+        if quote is not None:
+            currencies[symbol] = quote["currency"]
+        else:
+            currencies[symbol] = cost_currency_for_market(market, base_currency)
+    return currencies
+
+
+class _CurrencyContext:
+    """FX rates and per-currency CPI for reporting mixed-currency holdings in one base currency.
+
+    Rate history is fetched once per currency and turned into an FxRateTable for
+    the dates the analysis needs, so each lot converts with a dict lookup.
+    Holdings in a currency without rates can't be restated in base; callers
+    leave the symbols unconverted() returns out of the analysis.
+    """
+
+    def __init__(
+        self,
+        base_currency: str,
+        fx_rate_provider: FxRateProvider | None,
+        dates: Iterable[str],
+        initial_year: str,
+        local_cpi_providers: Dict[str, CpiDataProvider] | None = None,
+    ) -> None:
+        self.base = base_currency
+        self.valuation_date = date.today().isoformat()
+        self._fx_rate_provider = fx_rate_provider
+        self._dates = set(dates) | {self.valuation_date}
+        self.initial_year = initial_year
+        self._local_cpi_providers = local_cpi_providers or {}
+        self._loaded: Set[str] = set()
+        self._rated: Set[str] = set()
+        self._reported: Set[str] = set()
+        self._local_indexes: Dict[str, InflationIndex] = {}
+        self.fx = FxRateTable(base=base_currency, rates={})
+
+    def prepare(self, currencies: Iterable[str]) -> None:
+        for currency in sorted(set(currencies) - self._loaded - {self.base}):
+            self._loaded.add(currency)
+            self._load_rates(currency)
+            provider = self._local_cpi_providers.get(currency)
+            if provider is not None:
+                self._local_indexes[currency] = InflationIndex.from_cpi_index(
+                    provider.get_cpi_from_initial_date(self.initial_year)
+                )
+
+    @traced("service.load_fx_rates")
+    def _load_rates(self, currency: str) -> None:
+        if self._fx_rate_provider is None:
+            print(f"No FX rate provider configured. {currency} amounts can't be converted to {self.base}.")
+            return
+        start, end = self.rate_window()
+        try:
+            history = self._fx_rate_provider.get_rates(currency, self.base, start, end)
+        except Exception as exc:
+            print(f"Could not fetch {currency}/{self.base} rates. {currency} amounts can't be converted. {exc}")
+            return
+        self.add_rates(currency, history)
+
+    def rate_window(self) -> Tuple[date, date]:
+        """Days of rate history the analysis needs, with FX_LOOKBACK_DAYS of slack before the first."""
+        return date.fromisoformat(min(self._dates)) - timedelta(days=FX_LOOKBACK_DAYS), date.today()
+
+    def add_rates(
+        self, currency: str, history: Dict[date, Decimal] | None, local_cpi_index: Dict[str, Decimal] | None = None
+    ) -> None:
+        """Use history fetched elsewhere for `currency`; None means the fetch failed and was reported."""
+        self._loaded.add(currency)
+        if local_cpi_index is not None:
+            self._local_indexes[currency] = InflationIndex.from_cpi_index(local_cpi_index)
+        if history is None:
+            return
+        if not history:
+            print(f"No {currency}/{self.base} rates available. {currency} amounts can't be converted.")
+            return
+        table = FxRateTable.from_history(self.base, {currency: history}, ((currency, d) for d in self._dates))
+        self.fx.rates.update(table.rates)
+        self._rated.add(currency)
+
+    def is_loaded(self, currency: str) -> bool:
+        return currency == self.base or currency in self._loaded
+
+    def has_rates(self, currency: str) -> bool:
+        return currency == self.base or currency in self._rated
+
+    def unconverted(self, currencies: Dict[str, str]) -> Set[str]:
+        """Symbols whose currency has no rates to base; each is reported once, to be left out of the analysis."""
+        symbols = {symbol for symbol, currency in currencies.items() if not self.has_rates(currency)}
+        unreported = symbols - self._reported
+        if unreported:
+            self._reported |= unreported
+            print(f"Leaving out {', '.join(sorted(unreported))}: no rates to convert them to {self.base}.")
+        return symbols
+
+    def analyze_company(
+        self, name: str, items: List[PurchaseRow], currency: str, price: Decimal | None, base_index: InflationIndex
+    ) -> CompanyAggregate:
+        self.prepare([currency])
+        return analyze_company_in_base(
+            name, items, currency, price, self.fx, self.valuation_date, base_index, self._local_indexes.get(currency)
+        )
+
+    def current_prices(self, quotes: Dict[str, ShareWithPrice]) -> Dict[str, Decimal]:
+        return {
+            symbol: q["price"] * self.fx.rate(q["currency"], self.valuation_date)
+            for symbol, q in quotes.items()
+            if self.has_rates(q["currency"])
+        }
+
+
+def _without(purchase_rows: Iterable[PurchaseRow] | PurchaseBatch, symbols: Set[str]) -> List[PurchaseRow]:
+    """purchase_rows minus the rows of `symbols`; a PurchaseBatch comes back as rows."""
+    rows = purchase_rows.iter_rows() if isinstance(purchase_rows, PurchaseBatch) else purchase_rows
+    return [p for p in rows if p["symbol"] not in symbols]
+
+
+@traced("service.run_investment_analysis")
 def run_investment_analysis(
-    purchase_rows: Iterable[PurchaseRow],
+    purchase_rows: Iterable[PurchaseRow] | PurchaseBatch,
     initial_year: str,
     cpi_data_provider: CpiDataProvider,
+    backend: Literal["exact", "fast"] = "exact",
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+    local_cpi_providers: Dict[str, CpiDataProvider] | None = None,
+) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
+    """Fetch CPI and prices, then analyze.
+
+    backend="exact" uses Decimal arithmetic; backend="fast" uses the numpy
+    columnar implementation, which agrees within core.analysis_vectorized's
+    RELATIVE_TOLERANCE.
+
+    Holdings quoted in another currency are reported in base_currency using
+    fx_rate_provider. Their real cost is deflated with cpi_data_provider (the
+    base currency's CPI) unless local_cpi_providers has a CPI for their own
+    currency, which the exact backend then uses instead. Holdings in a
+    currency with no rates are left out and reported.
+
+    purchase_rows may be a PurchaseBatch (see data.repositories'
+    load_*_as_batch), which both backends aggregate without per-lot rows.
+
+    This is the synchronous entry point to run_investment_analysis_async: the
+    providers run on worker threads of one event loop, so CPI, quotes and FX
+    rates are fetched concurrently. Call it from a thread without a running
+    event loop (the CLI, or the Qt analysis worker).
+    """
+    from infra.async_providers import ThreadedCpiDataProvider, ThreadedFxRateProvider, ThreadedPriceProvider
+
+    return asyncio.run(run_investment_analysis_async(
+        purchase_rows,
+        initial_year,
+        ThreadedCpiDataProvider(cpi_data_provider),
+        ThreadedPriceProvider(get_prices),
+        backend=backend,
+        fx_rate_provider=ThreadedFxRateProvider(fx_rate_provider) if fx_rate_provider else None,
+        base_currency=base_currency,
+        local_cpi_providers={
+            currency: ThreadedCpiDataProvider(provider) for currency, provider in (local_cpi_providers or {}).items()
+        },
+    ))
+
+
+async def _load_currencies_async(
+    context: _CurrencyContext,
+    currencies: Iterable[str],
+    fx_rate_provider: AsyncFxRateProvider | None,
+    local_cpi_providers: Dict[str, AsyncCpiDataProvider],
+) -> None:
+    """Fetch rate history and local CPI for every currency not yet loaded, all at once."""
+    pending = sorted({currency for currency in currencies if not context.is_loaded(currency)})
+    if not pending:
+        return
+    if fx_rate_provider is None:
+        for currency in pending:
+            print(f"No FX rate provider configured. {currency} amounts can't be converted to {context.base}.")
+            context.add_rates(currency, None)
+        return
+    start, end = context.rate_window()
+
+    async def load(currency: str) -> None:
+        local = local_cpi_providers.get(currency)
+        history, local_cpi = await asyncio.gather(
+            fx_rate_provider.get_rates(currency, context.base, start, end),
+            local.get_cpi_from_initial_date(context.initial_year) if local else _none(),
+            return_exceptions=True,
+        )
+        if isinstance(history, Exception):
+            print(f"Could not fetch {currency}/{context.base} rates. {currency} amounts can't be converted. {history}")
+            history = None
+        if isinstance(local_cpi, Exception):
+            print(f"Could not fetch {currency} CPI. {currency} holdings are deflated with the base CPI. {local_cpi}")
+            local_cpi = None
+        context.add_rates(currency, history, local_cpi)
+
+    await asyncio.gather(*(load(currency) for currency in pending))
+
+
+async def _none() -> None:
+    return None
+
+
+async def run_investment_analysis_async(
+    purchase_rows: Iterable[PurchaseRow] | PurchaseBatch,
+    initial_year: str,
+    cpi_data_provider: AsyncCpiDataProvider,
+    price_provider: AsyncPriceProvider,
+    backend: Literal["exact", "fast"] = "exact",
+    fx_rate_provider: AsyncFxRateProvider | None = None,
+    base_currency: str = "USD",
+    local_cpi_providers: Dict[str, AsyncCpiDataProvider] | None = None,
 ) -> Tuple[List[CompanyAggregate], PortfolioTotals]:
+    """run_investment_analysis over async providers.
+
+    CPI, all quotes, and FX rates (plus local CPI) for the markets' usual
+    currencies are requested together, so the fetch phase takes about as long
+    as the slowest of them. A quote in a currency its market didn't suggest
+    costs one more round of rate fetches after the quotes arrive.
+    """
+    if not isinstance(purchase_rows, PurchaseBatch):
+        purchase_rows = list(purchase_rows)
+    local_cpi_providers = local_cpi_providers or {}
+    expected = _symbol_currencies(purchase_rows, {}, base_currency)
+    context = _CurrencyContext(
+        base_currency, None, _purchase_dates(purchase_rows), initial_year
+    ) if any(currency != base_currency for currency in expected.values()) else None
+
+    with span("service.fetch_concurrent"):
+        cpi_index, quote_list, _ = await asyncio.gather(
+            cpi_data_provider.get_cpi_from_initial_date(initial_year),
+            price_provider.get_prices(_shares_and_markets(purchase_rows)),
+            _load_currencies_async(context, expected.values(), fx_rate_provider, local_cpi_providers)
+            if context else _none(),
+        )
+    missing_months = missing_cpi_months(purchase_rows, cpi_index)
+    if missing_months:
+        print(f"No CPI data for purchase month(s) {', '.join(missing_months)}. Those purchases are not inflation-adjusted.")
+    quotes = {q["symbol"]: q for q in quote_list}
+    inflation_index = InflationIndex.from_cpi_index(cpi_index)
+    currencies = _symbol_currencies(purchase_rows, quotes, base_currency)
+    foreign = {currency for currency in currencies.values() if currency != base_currency}
+
+    if not foreign:
+        current_prices = {symbol: q["price"] for symbol, q in quotes.items()}
+        if backend == "fast":
+            from core.analysis_vectorized import analyze_vectorized
+
+            return analyze_vectorized(purchase_rows, inflation_index, current_prices)
+        return analyze(purchase_rows, inflation_index, current_prices)
+
+    if context is None:
+        context = _CurrencyContext(base_currency, None, _purchase_dates(purchase_rows), initial_year)
+    await _load_currencies_async(context, foreign, fx_rate_provider, local_cpi_providers)
+    dropped = context.unconverted(currencies)
+    if dropped:
+        purchase_rows = _without(purchase_rows, dropped)
+    if backend == "fast" and not local_cpi_providers:
+        from core.analysis_vectorized import analyze_vectorized
+
+        convert = convert_batch if isinstance(purchase_rows, PurchaseBatch) else convert_rows
+        return analyze_vectorized(
+            convert(purchase_rows, currencies, context.fx), inflation_index, context.current_prices(quotes)
+        )
+
+    if isinstance(purchase_rows, PurchaseBatch):
+        purchase_rows = purchase_rows.to_rows()
+
+    results = [
+        context.analyze_company(
+            name, items, currencies[name], quotes[name]["price"] if name in quotes else None, inflation_index
+        )
+        for name, items in group_by_symbol(purchase_rows).items()
+    ]
+    return results, totals_from_aggregates(results)
+
+
+def stream_investment_analysis(
+    purchase_rows: Iterable[PurchaseRow],
+    initial_year: str,
+    cpi_data_provider: CpiDataProvider,
+    should_cancel: Callable[[], bool] | None = None,
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+    local_cpi_providers: Dict[str, CpiDataProvider] | None = None,
+) -> Iterator[Tuple[CompanyAggregate, int, int]]:
+    """Yield (company aggregate, symbols done, total symbols) as each quote arrives.
+
+    Symbols whose quote fails or that have no market are yielded last, valued at
+    0 as in run_investment_analysis. Stops early, cancelling outstanding quote
+    fetches, once should_cancel() returns True. Combine the yielded aggregates
+    with core.analysis.totals_from_aggregates. Currency handling is the same as
+    run_investment_analysis; rates for the markets' usual currencies are loaded
+    before the first quote is requested.
+    """
+    purchase_rows = list(purchase_rows)
+    cpi_index = _fetch_cpi(purchase_rows, initial_year, cpi_data_provider)
+    inflation_index = InflationIndex.from_cpi_index(cpi_index)
+
+    expected = _symbol_currencies(purchase_rows, {}, base_currency)
+    context = _CurrencyContext(
+        base_currency, fx_rate_provider, (p["purchase_date"] for p in purchase_rows), initial_year, local_cpi_providers
+    )
+    context.prepare(expected.values())
+    dropped = context.unconverted(expected)
+    if dropped:
+        purchase_rows = _without(purchase_rows, dropped)
+    grouped = group_by_symbol(purchase_rows)
+    total = len(grouped)
+    done = 0
+
+    quotes = get_prices(_shares_and_markets(purchase_rows))
+    try:
+        for quote in quotes:
+            if should_cancel and should_cancel():
+                return
+            items = grouped.pop(quote["symbol"], None)
+            if items is None:
+                continue
+            context.prepare([quote["currency"]])
+            if context.unconverted({quote["symbol"]: quote["currency"]}):
+                total -= 1
+                continue
+            done += 1
+            count("service.stream_investment_analysis", "quoted")
+            yield context.analyze_company(
+                quote["symbol"], items, quote["currency"], quote["price"], inflation_index
+            ), done, total
+    finally:
+        close = getattr(quotes, "close", None)
+        if close:
+            close()
+
+    for name, items in grouped.items():
+        if should_cancel and should_cancel():
+            return
+        done += 1
+        count("service.stream_investment_analysis", "unquoted")
+        yield context.analyze_company(name, items, expected[name], None, inflation_index), done, total
+
+
+@traced("service.run_deflator_analysis")
+def run_deflator_analysis(
+    purchase_rows: Iterable[PurchaseRow],
+    initial_year: str,
+    cpi_series_source: CpiSeriesSource,
+    series_names: Iterable[str],
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+) -> Dict[str, Tuple[List[CompanyAggregate], PortfolioTotals]]:
+    """Fetch several CPI series and prices once, then analyze under every deflator in one pass.
+
+    Returns series name -> (companies, totals). Foreign holdings are converted
+    to base_currency first and deflated like base-currency ones.
+    """
+    purchase_rows = list(purchase_rows)
+    series = cpi_series_source.get_cpi_series(series_names, initial_year)
+    for name, cpi_index in series.items():
+        missing_months = missing_cpi_months(purchase_rows, cpi_index)
+        if missing_months:
+            print(f"No {name} CPI for purchase month(s) {', '.join(missing_months)}. Those purchases are not inflation-adjusted.")
+    indexes = {name: InflationIndex.from_cpi_index(cpi_index) for name, cpi_index in series.items()}
+
+    quotes = _fetch_current_quotes(purchase_rows)
+    currencies = _symbol_currencies(purchase_rows, quotes, base_currency)
+    foreign = {currency for currency in currencies.values() if currency != base_currency}
+    if not foreign:
+        current_prices = {symbol: q["price"] for symbol, q in quotes.items()}
+        return analyze_deflators(purchase_rows, indexes, current_prices)
+
+    context = _CurrencyContext(base_currency, fx_rate_provider, (p["purchase_date"] for p in purchase_rows), initial_year)
+    context.prepare(foreign)
+    purchase_rows = _without(purchase_rows, context.unconverted(currencies))
+    return analyze_deflators(
+        convert_rows(purchase_rows, currencies, context.fx), indexes, context.current_prices(quotes)
+    )
+
+
+@traced("service.run_returns_analysis")
+def run_returns_analysis(
+    purchase_rows: Iterable[PurchaseRow],
+    initial_year: str,
+    cpi_data_provider: CpiDataProvider,
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+    valuation_date: date | None = None,
+    sale_rows: Iterable[SaleRow] = (),
+) -> Tuple[List[ReturnMetrics], ReturnMetrics]:
+    """Fetch CPI and prices for symbols still held, then compute per-symbol and portfolio TWR and XIRR.
+
+    Pass individual lots rather than month summaries: XIRR discounts each cash
+    flow from its actual date. Sale proceeds are inflows on their dates and
+    only the shares still held are valued. Foreign purchases and sales are
+    converted to base_currency at their own date's rate and holdings valued
+    at today's.
+    """
+    from core.lots import held_quantities
+    from core.returns import compute_returns
+
+    purchase_rows = list(purchase_rows)
+    sale_rows = list(sale_rows)
+    cpi_index = _fetch_cpi(purchase_rows, initial_year, cpi_data_provider)
+    held = held_quantities(purchase_rows, sale_rows)
+    quotes = _fetch_current_quotes(p for p in purchase_rows if held.get(p["symbol"], 0) > 0)
+    currencies = _symbol_currencies(purchase_rows, quotes, base_currency)
+    foreign = {currency for currency in currencies.values() if currency != base_currency}
+    if not foreign:
+        current_prices = {symbol: q["price"] for symbol, q in quotes.items()}
+        return compute_returns(purchase_rows, cpi_index, current_prices, valuation_date, sale_rows)
+
+    dates = [p["purchase_date"] for p in purchase_rows] + [s["sale_date"] for s in sale_rows]
+    context = _CurrencyContext(base_currency, fx_rate_provider, dates, initial_year)
+    context.prepare(foreign)
+    dropped = context.unconverted(currencies)
+    return compute_returns(
+        convert_rows(_without(purchase_rows, dropped), currencies, context.fx),
+        cpi_index,
+        context.current_prices(quotes),
+        valuation_date,
+        _convert_sales(sale_rows, currencies, dropped, context, base_currency),
+    )
+
+
+def _month_end(month: str) -> str:
+    year, month_number = int(month[:4]), int(month[5:7])
+    return f"{month}-{calendar.monthrange(year, month_number)[1]:02d}"
+
+
+@traced("service.run_value_timeline")
+def run_value_timeline(
+    purchase_rows: Iterable[PurchaseRow],
+    initial_year: str,
+    cpi_data_provider: CpiDataProvider,
+    monthly_closes: Dict[str, Dict[str, Decimal]] | None = None,
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+    sale_rows: Iterable[SaleRow] = (),
+) -> ValueTimeline:
+    """Fetch CPI and prices for symbols still held, then build the month-by-month invested/real/market value series.
+
+    With sales, pass individual lots; shares sold leave the series in their
+    sale month. Foreign-currency costs and sale prices are converted at their
+    own date's rate and month-end closes at that month's last rate.
+    """
+    from core.lots import held_quantities
+    from core.timeline import build_value_timeline
+
+    purchase_rows = list(purchase_rows)
+    sale_rows = list(sale_rows)
     cpi_index = cpi_data_provider.get_cpi_from_initial_date(initial_year)
+    held = held_quantities(purchase_rows, sale_rows)
+    quotes = _fetch_current_quotes(p for p in purchase_rows if held.get(p["symbol"], 0) > 0)
+    currencies = _symbol_currencies(purchase_rows, quotes, base_currency)
+    foreign = {currency for currency in currencies.values() if currency != base_currency}
+    if not foreign:
+        current_prices = {symbol: q["price"] for symbol, q in quotes.items()}
+        return build_value_timeline(purchase_rows, cpi_index, current_prices, monthly_closes, sales=sale_rows)
+
+    closes = monthly_closes or {}
+    dates = [p["purchase_date"] for p in purchase_rows] + [s["sale_date"] for s in sale_rows]
+    dates.extend(_month_end(month) for series in closes.values() for month in series)
+    context = _CurrencyContext(base_currency, fx_rate_provider, dates, initial_year)
+    context.prepare(foreign)
+    dropped = context.unconverted(currencies)
+    converted_closes = {
+        symbol: {
+            month: close * context.fx.rate(currencies.get(symbol, base_currency), _month_end(month))
+            for month, close in series.items()
+        }
+        for symbol, series in closes.items()
+        if symbol not in dropped
+    }
+    return build_value_timeline(
+        convert_rows(_without(purchase_rows, dropped), currencies, context.fx),
+        cpi_index,
+        context.current_prices(quotes),
+        converted_closes,
+        sales=_convert_sales(sale_rows, currencies, dropped, context, base_currency),
+    )
 
-    unique_pairs: set[tuple[str, str]] = set()
-    for purchase in purchase_rows:
-        market = purchase["market"]
-        if market:
-            unique_pairs.add((purchase["symbol"], market))
-        else:
-            print(f"No market found for {purchase['symbol']}. Skipping. Please add a market to the share purchase.")
 
-    shares_and_markets: list[ShareAndMarket] = [
-        {"symbol": symbol, "market": market} for (symbol, market) in unique_pairs
+def _convert_sales(
+    sale_rows: List[SaleRow],
+    currencies: Dict[str, str],
+    dropped: Set[str],
+    context: _CurrencyContext,
+    base_currency: str,
+) -> List[SaleRow]:
+    """Sales of symbols not in dropped, with prices converted at the sale date's rate."""
+    return [
+        {**s, "price": s["price"] * context.fx.rate(currencies.get(s["symbol"], base_currency), s["sale_date"])}
+        for s in sale_rows
+        if s["symbol"] not in dropped
     ]
 
-    current_prices = {p["symbol"]: p["price"] for p in get_prices(shares_and_markets)}
-    return analyze(purchase_rows, cpi_index, current_prices)
 
+@traced("service.run_gains_analysis")
+def run_gains_analysis(
+    purchase_rows: Iterable[PurchaseLotRow],
+    sale_rows: Iterable[SaleRow],
+    initial_year: str,
+    cpi_data_provider: CpiDataProvider,
+    method: CostBasisMethod = "fifo",
+    fx_rate_provider: FxRateProvider | None = None,
+    base_currency: str = "USD",
+) -> List[LotGains]:
+    """Fetch CPI and prices for symbols still held, then match sales to lots.
+
+    Foreign-currency costs and sale proceeds are converted at their own date's rate.
+    """
+    from core.lots import held_quantities, match_lots
+
+    purchase_rows = list(purchase_rows)
+    sale_rows = list(sale_rows)
+    cpi_index = _fetch_cpi(purchase_rows, initial_year, cpi_data_provider)
+    held = held_quantities(purchase_rows, sale_rows)
+    quotes = _fetch_current_quotes(p for p in purchase_rows if held.get(p["symbol"], 0) > 0)
+    inflation_index = InflationIndex.from_cpi_index(cpi_index)
+    currencies = _symbol_currencies(purchase_rows, quotes, base_currency)
+    foreign = {currency for currency in currencies.values() if currency != base_currency}
+    if not foreign:
+        current_prices = {symbol: q["price"] for symbol, q in quotes.items()}
+        return match_lots(purchase_rows, sale_rows, inflation_index, current_prices, method)
 
+    dates = [p["purchase_date"] for p in purchase_rows] + [s["sale_date"] for s in sale_rows]
+    context = _CurrencyContext(base_currency, fx_rate_provider, dates, initial_year)
+    context.prepare(foreign)
+    dropped = context.unconverted(currencies)
+    return match_lots(
+        convert_rows(_without(purchase_rows, dropped), currencies, context.fx),
+        _convert_sales(sale_rows, currencies, dropped, context, base_currency),
+        inflation_index,
+        context.current_prices(quotes),
+        method,
+    )
@@ -0,0 +1,74 @@
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from core.ports import PriceHistoryProvider
+from data.repositories import get_price_history_bounds, mark_price_history_covered, save_price_history
+
+# (symbol, market, first day wanted)
+BackfillTarget = Tuple[str, str, date]
+
+
+def missing_ranges(wanted_start: date, wanted_end: date, stored: Tuple[date, date] | None) -> List[Tuple[date, date]]:
+    """Return the date ranges outside the stored span that still need fetching.
+
+    `stored` is get_price_history_bounds' covered span, which starts at the
+    earliest day requested so far, so a start that falls on a weekend or
+    holiday is not asked for again on every run.
+    """
+    if wanted_start > wanted_end:
+        return []
+    if stored is None:
+        return [(wanted_start, wanted_end)]
+    first, last = stored
+    ranges: List[Tuple[date, date]] = []
+    if wanted_start < first:
+        ranges.append((wanted_start, min(first - timedelta(days=1), wanted_end)))
+    if wanted_end > last:
+        ranges.append((max(last + timedelta(days=1), wanted_start), wanted_end))
+    return ranges
+
+
+def backfill_price_history(
+    targets: Iterable[BackfillTarget],
+    provider: PriceHistoryProvider,
+    end: date | None = None,
+    max_workers: int = 4,
+) -> Dict[str, int]:
+    """Fetch missing daily closes for each target in parallel and store them.
+
+    Only the ranges before the covered span and after the last stored day are
+    requested, and each fetched range is recorded as covered even if it held
+    no trading days. Fetches run on a thread pool; writes happen on the
+    calling thread so SQLite sees a single writer. Returns rows inserted per
+    symbol, for symbols that gained any. A failing symbol is reported and
+    skipped.
+    """
+    end = end or date.today()
+    jobs: List[Tuple[str, str, date, date]] = []
+    for symbol, market, start in targets:
+        for range_start, range_end in missing_ranges(start, end, get_price_history_bounds(symbol)):
+            jobs.append((symbol, market, range_start, range_end))
+
+    written: Dict[str, int] = {}
+    if not jobs:
+        return written
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(provider.get_price_history, symbol, market, range_start, range_end): (symbol, market, range_start)
+            for symbol, market, range_start, range_end in jobs
+        }
+        for future in as_completed(futures):
+            symbol, market, range_start = futures[future]
+            try:
+                closes = future.result()
+            except Exception as exc:
+                print(f"Could not backfill prices for {symbol}:{market}. Skipping. {exc}")
+                continue
+            inserted = save_price_history(symbol, closes)
+            mark_price_history_covered(symbol, range_start)
+            if inserted:
+                written[symbol] = written.get(symbol, 0) + inserted
+    return written
@@ -0,0 +1,59 @@
+"""Shared fixtures: a scratch SQLite database and the local stub HTTP server.
+
+data.db opens DB_PATH when it is first imported, so it is pointed at a
+throwaway file here before any test module imports the data layer.
+"""
+from __future__ import annotations
+import os
+import tempfile
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="financial-report-tests-"), "test.db")
+os.environ["NO_PROXY"] = ",".join(filter(None, [os.getenv("NO_PROXY"), "127.0.0.1"]))
+
+from typing import Iterator
+
+import pytest
+
+from benchmarks import stub_servers
+
+STUB_HOST = "127.0.0.1"
+
+
+@pytest.fixture
+def database() -> Iterator[None]:
+    """An initialized database, emptied after the test."""
+    from data.db import db
+    from data.models import init_db
+
+    init_db()
+    yield
+    with db.atomic():
+        db.execute_sql("PRAGMA defer_foreign_keys = ON")
+        for table in db.get_tables():
+            db.execute_sql(f'DELETE FROM "{table}"')
+
+
+@pytest.fixture(scope="session")
+def _stub_server() -> Iterator[tuple[str, stub_servers.Faults]]:
+    faults = stub_servers.Faults(seed=1)
+    with stub_servers.serve(faults) as base_url:
+        yield base_url, faults
+
+
+@pytest.fixture
+def stub_server(_stub_server, monkeypatch) -> Iterator[stub_servers.Faults]:
+    """Point the Google Finance and BLS providers at the stub server; yields its Faults, reset afterwards.
+
+    Retries against the stub host are fast and its circuit breaker starts closed.
+    """
+    from infra import cpi_data_provider, google_finance_price_provider
+    from infra.http_client import default_http_client
+
+    base_url, faults = _stub_server
+    monkeypatch.setattr(google_finance_price_provider, "URL", base_url + stub_servers.QUOTE_PATH)
+    monkeypatch.setattr(cpi_data_provider, "BLS_URL", base_url + stub_servers.BLS_PATH)
+    policy = default_http_client.policy_for(STUB_HOST)
+    default_http_client.set_policy(STUB_HOST, backoff_base=0.01, backoff_cap=0.05)
+    yield faults
+    faults.reset()
+    default_http_client.set_policy(STUB_HOST, policy)
@@ -0,0 +1,69 @@
+import asyncio
+import dataclasses
+from decimal import Decimal
+
+import pytest
+
+from benchmarks import synthetic
+from core.analysis import InflationIndex, analyze
+from core.analysis_vectorized import ABSOLUTE_TOLERANCE, RELATIVE_TOLERANCE, analyze_vectorized
+from services.investment_service import run_investment_analysis_async
+
+
+def assert_agree(exact, fast):
+    """Fields agree within the documented tolerance, relative to the size of the amounts involved."""
+    (exact_rows, exact_totals), (fast_rows, fast_totals) = exact, fast
+    assert [row.name for row in fast_rows] == [row.name for row in exact_rows]
+    for expected, actual in zip(exact_rows + [exact_totals], fast_rows + [fast_totals]):
+        values = dataclasses.asdict(expected)
+        values.pop("name", None)
+        scale = max(abs(float(value)) for value in values.values())
+        for field, value in values.items():
+            difference = abs(float(getattr(actual, field)) - float(value))
+            assert difference <= RELATIVE_TOLERANCE * scale + ABSOLUTE_TOLERANCE, (field, value, getattr(actual, field))
+
+
+@pytest.mark.parametrize("lots", [1, 50, 5000])
+def test_fast_backend_matches_exact(lots):
+    rows = synthetic.purchases(lots, seed=lots)
+    index = InflationIndex.from_cpi_index(synthetic.cpi_series())
+    prices = synthetic.current_prices(rows)
+    assert_agree(analyze(rows, index, prices), analyze_vectorized(rows, index, prices))
+
+
+def test_missing_prices_and_cpi_months():
+    # CPI stops in 2019, so later purchases get a factor of 1, and one symbol has no price.
+    rows = synthetic.purchases(2000)
+    index = InflationIndex.from_cpi_index(synthetic.cpi_series(2005, 2019))
+    prices = synthetic.current_prices(rows)
+    prices.pop(rows[0]["symbol"])
+    assert_agree(analyze(rows, index, prices), analyze_vectorized(rows, index, prices))
+
+
+def test_empty_portfolio():
+    results, totals = analyze_vectorized([], {}, {})
+    assert results == []
+    assert totals.total_nominal_invested == Decimal(0)
+
+
+class _Cpi:
+    async def get_cpi_from_initial_date(self, initial_year):
+        return synthetic.cpi_series()
+
+
+class _Prices:
+    async def get_prices(self, pairs):
+        return [{"symbol": p["symbol"], "price": synthetic.price_for(p["symbol"]), "currency": "USD"} for p in pairs]
+
+
+def test_backend_flag_selects_the_implementation():
+    # Every market's quote currency is reported as USD, so no FX is involved.
+    rows = synthetic.purchases(500)
+
+    def run(backend):
+        return asyncio.run(run_investment_analysis_async(rows, "2005", _Cpi(), _Prices(), backend=backend))
+
+    exact, fast = run("exact"), run("fast")
+    assert_agree(exact, fast)
+    # The exact backend keeps every cent.
+    assert exact[1].total_nominal_invested == sum(p["quantity"] * p["cost"] for p in rows)
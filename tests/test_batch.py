@@ -0,0 +1,113 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from core.analysis import InflationIndex, analyze
+from core.batch import MAX_BATCH_VALUE, BatchOverflowError, PurchaseBatch, to_scaled
+from core.currency import FxRateTable, convert_batch, convert_rows
+from data.repositories import (
+    add_share_sale,
+    bulk_add_share_purchases,
+    load_held_purchases_as_batch,
+    load_held_purchases_as_rows,
+    load_purchase_summaries_as_batch,
+    load_purchase_summaries_as_rows,
+    load_share_purchases_as_batch,
+    load_share_purchases_as_rows,
+)
+
+# Total cost 10**14, past the 9.2 trillion a batch amount holds.
+LARGE = ("BIG", "TYO", Decimal(10 ** 9), Decimal(10 ** 5), date(2021, 3, 3))
+SMALL = ("SMALL", "NASDAQ", Decimal(10), Decimal("12.5"), date(2021, 3, 4))
+
+
+def row(quantity, cost):
+    return {"symbol": "BIG", "market": "TYO", "quantity": quantity, "cost": cost, "purchase_date": "2021-03-03"}
+
+
+def test_values_up_to_the_limit_round_trip():
+    largest = MAX_BATCH_VALUE.quantize(Decimal(1)) - 1
+    batch = PurchaseBatch.from_rows([row(Decimal(1), largest), row(largest, Decimal(1))])
+
+    assert [p["quantity"] * p["cost"] for p in batch.to_rows()] == [largest, largest]
+
+
+@pytest.mark.parametrize("quantity, cost", [(Decimal(10 ** 9), Decimal(10 ** 5)), (Decimal(10 ** 13), Decimal(1))])
+def test_overflow_raises_and_leaves_the_batch_unchanged(quantity, cost):
+    batch = PurchaseBatch.from_rows([row(Decimal(1), Decimal(1))])
+
+    with pytest.raises(BatchOverflowError, match="BIG"):
+        batch.append("BIG", "TYO", to_scaled(quantity), to_scaled(quantity * cost), 1)
+    with pytest.raises(OverflowError):
+        PurchaseBatch.from_rows([row(quantity, cost)])
+    assert len(batch) == 1 and batch.symbols == ["BIG"]
+
+
+def test_loaders_fall_back_to_rows(database):
+    bulk_add_share_purchases([SMALL, LARGE])
+
+    assert load_share_purchases_as_batch() == load_share_purchases_as_rows()
+    assert load_purchase_summaries_as_batch() == load_purchase_summaries_as_rows()
+
+
+def test_loaders_fall_back_on_a_saturated_unit_cost(database):
+    # A tiny quantity keeps the total in range, but the scaled unit cost is past int64.
+    bulk_add_share_purchases([SMALL, ("BIG", "TYO", Decimal("0.000001"), Decimal(10 ** 14), date(2021, 3, 3))])
+
+    assert load_share_purchases_as_batch() == load_share_purchases_as_rows()
+
+
+def test_loaders_return_batches_in_range(database):
+    bulk_add_share_purchases([SMALL])
+
+    assert isinstance(load_share_purchases_as_batch(), PurchaseBatch)
+    assert isinstance(load_purchase_summaries_as_batch(), PurchaseBatch)
+
+
+def test_conversion_past_the_limit_falls_back_to_rows():
+    # In range in JPY, past it once restated in a currency worth less per unit.
+    rows = [row(Decimal(10 ** 8), Decimal(10 ** 4))]
+    fx = FxRateTable(base="IDR", rates={("JPY", "2021-03-03"): Decimal("130.5")})
+    currencies = {"BIG": "JPY"}
+
+    converted = convert_batch(PurchaseBatch.from_rows(rows), currencies, fx)
+
+    assert converted == convert_rows(rows, currencies, fx)
+    index = InflationIndex.from_cpi_index({})
+    assert analyze(converted, index, {})[1].total_nominal_invested == Decimal(10 ** 12) * Decimal("130.5")
+
+
+def as_cents(rows):
+    return [
+        (p["symbol"], p["market"], p["quantity"], (p["quantity"] * p["cost"]).quantize(Decimal("0.01")), p["purchase_date"])
+        for p in rows
+    ]
+
+
+def test_held_batch_matches_the_held_rows(database):
+    # NASDAQ summaries and TYO/LON lots, interleaved by date, including the 1st of a month.
+    bulk_add_share_purchases([
+        ("AAA", "NASDAQ", Decimal(2), Decimal("10.10"), date(2021, 3, 9)),
+        ("TTT", "TYO", Decimal(100), Decimal(1500), date(2021, 3, 1)),
+        ("AAA", "NASDAQ", Decimal(3), Decimal("11.30"), date(2021, 3, 20)),
+        ("LLL", "LON", Decimal(5), Decimal("250.5"), date(2021, 2, 14)),
+        ("AAA", "NASDAQ", Decimal(1), Decimal("12"), date(2021, 4, 2)),
+        ("TTT", "TYO", Decimal(50), Decimal(1600), date(2021, 4, 1)),
+    ])
+
+    batch = load_held_purchases_as_batch("USD")
+    rows = load_held_purchases_as_rows("USD")
+
+    assert isinstance(batch, PurchaseBatch)
+    assert as_cents(batch.to_rows()) == as_cents(rows)
+    assert [p["symbol"] for p in load_held_purchases_as_batch("JPY").to_rows()] == [
+        p["symbol"] for p in load_held_purchases_as_rows("JPY")
+    ]
+
+
+def test_held_batch_falls_back_to_rows_after_a_sale(database):
+    bulk_add_share_purchases([SMALL])
+    assert add_share_sale("SMALL", Decimal(4), Decimal(15), date(2021, 5, 3))["success"]
+
+    assert load_held_purchases_as_batch("USD") == load_held_purchases_as_rows("USD")
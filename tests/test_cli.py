@@ -0,0 +1,122 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+import cli
+from benchmarks import synthetic
+from data.repositories import bulk_add_share_purchases, iter_share_lots_as_rows
+from infra.quote_cache import default_quote_cache
+
+# NASDAQ and NYSE symbols only, so no FX is involved.
+SYMBOLS = ["S0000", "S0001", "S0004", "S0005"]
+
+
+@pytest.fixture
+def portfolio(database, stub_server, tmp_path):
+    """Purchases of SYMBOLS in the database, quotes from the stub server, and a CPI file; yields the --cpi value."""
+    rows = [row for row in synthetic.purchases(200) if row["symbol"] in SYMBOLS]
+    bulk_add_share_purchases(
+        [(p["symbol"], p["market"], p["quantity"], p["cost"], date.fromisoformat(p["purchase_date"])) for p in rows]
+    )
+    cpi_path = tmp_path / "cpi.csv"
+    cpi_path.write_text(
+        "month,value\n" + "".join(f"{month},{value}\n" for month, value in synthetic.cpi_series().items()),
+        encoding="utf-8",
+    )
+    default_quote_cache.clear()
+    yield f"file:{cpi_path}"
+    default_quote_cache.clear()
+    default_quote_cache.persist = default_quote_cache.revalidate_inline = False
+
+
+def test_returns_command(portfolio, capsys):
+    assert cli.main(["returns", "--format", "json", "--cpi", portfolio]) == 0
+
+    rows = json.loads(capsys.readouterr().out)
+    assert sorted(row["name"] for row in rows[:-1]) == SYMBOLS
+    assert rows[-1]["name"] == "PORTFOLIO"
+    for row in rows:
+        assert all(isinstance(row[field], float) for field in cli.RETURN_FIELDS)
+
+
+def report_companies(cpi_source, capsys):
+    assert cli.main(["report", "--format", "json", "--cpi", cpi_source]) == 0
+    return {c["name"]: c for c in json.loads(capsys.readouterr().out)["companies"]}
+
+
+def test_report_counts_only_shares_still_held(portfolio, capsys):
+    before = report_companies(portfolio, capsys)
+    lots = [p for p in iter_share_lots_as_rows() if p["symbol"] == "S0000"]
+    first = lots[0]
+
+    assert cli.main(["sell", "S0000", str(first["quantity"]), "1", "2025-01-02"]) == 0
+    capsys.readouterr()
+    after = report_companies(portfolio, capsys)
+
+    sold_cost = first["quantity"] * first["cost"]
+    invested = Decimal(before["S0000"]["total_nominal_invested"]) - Decimal(after["S0000"]["total_nominal_invested"])
+    assert abs(invested - sold_cost) < Decimal("0.01")
+    held = sum(p["quantity"] for p in lots[1:])
+    price = Decimal(before["S0000"]["total_current_value"]) / sum(p["quantity"] for p in lots)
+    assert abs(Decimal(after["S0000"]["total_current_value"]) - held * price) < Decimal("0.01")
+    for name in SYMBOLS[1:]:
+        for field in ("total_nominal_invested", "total_current_value"):
+            assert abs(Decimal(after[name][field]) - Decimal(before[name][field])) < Decimal("0.01")
+
+
+def test_sell_rejects_a_sale_of_shares_not_held(portfolio, capsys):
+    before = report_companies(portfolio, capsys)
+    lots = [p for p in iter_share_lots_as_rows() if p["symbol"] == "S0000"]
+    held = sum(p["quantity"] for p in lots)
+
+    assert cli.main(["sell", "S0000", str(held + 1), "10", "2025-01-02"]) == 1
+    assert cli.main(["sell", "S0000", "1", "10", "2000-01-03"]) == 1
+    assert cli.main(["sell", "S0000", str(lots[0]["quantity"] + 1), "10", "2025-01-02", "--lot", str(lots[0]["purchase_id"])]) == 1
+    assert "exceeds" in capsys.readouterr().err
+
+    assert report_companies(portfolio, capsys) == before
+
+
+def test_returns_count_a_sold_out_symbol(portfolio, capsys):
+    held = sum(p["quantity"] for p in iter_share_lots_as_rows() if p["symbol"] == "S0000")
+    assert cli.main(["sell", "S0000", str(held), "1000", "2025-01-02"]) == 0
+    capsys.readouterr()
+
+    assert cli.main(["returns", "--format", "json", "--cpi", portfolio]) == 0
+
+    rows = {row["name"]: row for row in json.loads(capsys.readouterr().out)}
+    # Sold well above cost, with no current price needed.
+    assert rows["S0000"]["nominal_xirr"] > 0
+    assert rows["S0000"]["nominal_twr"] > 0
+
+
+def test_render_table_aligns_columns_and_rules_off_the_footer():
+    table = cli._render_table(["Symbol", "Value"], [["AAA", "$1.00"], ["BB", "$100.00"]], ["TOTAL", "$101.00"])
+
+    assert table.splitlines() == [
+        "Symbol    Value",
+        "------  -------",
+        "AAA       $1.00",
+        "BB      $100.00",
+        "------  -------",
+        "TOTAL   $101.00",
+    ]
+    assert cli._render_table(["A", "B"], [["x", "y"]]).splitlines() == ["A  B", "-  -", "x  y"]
+
+
+def test_timeline_ends_at_the_report_totals(portfolio, capsys):
+    assert cli.main(["report", "--format", "json", "--cpi", portfolio]) == 0
+    totals = json.loads(capsys.readouterr().out)["totals"]
+
+    assert cli.main(["timeline", "--format", "json", "--cpi", portfolio]) == 0
+    timeline = json.loads(capsys.readouterr().out)
+
+    months = timeline["months"]
+    assert months[-1] == date.today().strftime("%Y-%m")
+    assert all(len(timeline[field]) == len(months) for field in cli.TIMELINE_FIELDS)
+    assert timeline["nominal_invested"][-1] == pytest.approx(float(totals["total_nominal_invested"]), abs=0.01)
+    assert timeline["market_value"][-1] == pytest.approx(float(totals["total_current_value"]), abs=0.01)
+    assert cli.main(["timeline", "--cpi", portfolio]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == len(months) + 2
@@ -0,0 +1,69 @@
+import datetime
+import time
+from decimal import Decimal
+
+from infra.cpi_data_provider import CachedCpiDataProvider
+
+UPSTREAM_DELAY = 0.05
+
+
+class StubUpstream:
+    """CPI from first_month to the current month, counting calls and taking a little time like BLS."""
+
+    series_id = "TEST"
+
+    def __init__(self, first_month: str) -> None:
+        self.first_month = first_month
+        self.requests = []
+
+    def get_cpi_from_initial_date(self, initial_year):
+        self.requests.append(initial_year)
+        time.sleep(UPSTREAM_DELAY)
+        today = datetime.date.today()
+        year, month = (int(part) for part in max(self.first_month, f"{initial_year}-01").split("-"))
+        series = {}
+        while (year, month) <= (today.year, today.month):
+            series[f"{year:04d}-{month:02d}"] = Decimal(100 + len(series))
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return series
+
+
+def test_warm_start_is_served_from_the_cache(database):
+    upstream = StubUpstream("2015-01")
+    provider = CachedCpiDataProvider(upstream)
+
+    started = time.perf_counter()
+    cold = provider.get_cpi_from_initial_date("2015")
+    cold_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    warm = provider.get_cpi_from_initial_date("2015")
+    warm_seconds = time.perf_counter() - started
+
+    assert warm == cold
+    assert upstream.requests == ["2015"]
+    assert warm_seconds < cold_seconds
+
+
+def test_series_starting_after_january_is_not_refetched(database):
+    # Upstream has nothing before March, so the cache never reaches back to January.
+    upstream = StubUpstream("2015-03")
+    provider = CachedCpiDataProvider(upstream)
+
+    first = provider.get_cpi_from_initial_date("2015")
+    second = provider.get_cpi_from_initial_date("2015")
+
+    assert min(first) == "2015-03"
+    assert second == first
+    assert upstream.requests == ["2015"]
+
+
+def test_earlier_start_year_is_fetched_once(database):
+    upstream = StubUpstream("2010-01")
+    provider = CachedCpiDataProvider(upstream)
+
+    provider.get_cpi_from_initial_date("2015")
+    series = provider.get_cpi_from_initial_date("2005")
+    provider.get_cpi_from_initial_date("2005")
+
+    assert min(series) == "2010-01"
+    assert upstream.requests == ["2015", "2005"]
@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+
+from benchmarks import synthetic
+from infra import cpi_data_provider
+from infra.cpi_data_provider import (
+    BLS_MAX_YEARS_WITH_KEY,
+    BLS_MAX_YEARS_WITHOUT_KEY,
+    BlsCpiDataProvider,
+    fetch_bls_series,
+    find_missing_months,
+    split_year_windows,
+)
+
+SERIES = "CUSR0000SA0"
+
+
+def test_split_year_windows_boundaries():
+    assert split_year_windows(2000, 2000, 10) == [(2000, 2000)]
+    assert split_year_windows(2000, 2009, 10) == [(2000, 2009)]
+    assert split_year_windows(2000, 2010, 10) == [(2000, 2009), (2010, 2010)]
+    assert split_year_windows(1990, 2025, 20) == [(1990, 2009), (2010, 2025)]
+    assert split_year_windows(2025, 2024, 10) == []
+
+
+def test_split_year_windows_rejects_empty_windows():
+    with pytest.raises(ValueError):
+        split_year_windows(2000, 2010, 0)
+
+
+def test_find_missing_months():
+    present = ["2023-11", "2024-01", "2024-03"]
+    assert find_missing_months(present, "2023-11", "2024-03") == ["2023-12", "2024-02"]
+    assert find_missing_months(present, "2024-01", "2024-01") == []
+    assert find_missing_months([], "2024-12", "2025-01") == ["2024-12", "2025-01"]
+
+
+@pytest.fixture
+def windows(monkeypatch):
+    """Record each (start, end) window requested from the fake BLS endpoint."""
+    requested = []
+    fetch = cpi_data_provider._fetch_bls_window
+
+    def recording_fetch(series_ids, start_year, end_year, api_key):
+        requested.append((start_year, end_year))
+        return fetch(series_ids, start_year, end_year, api_key)
+
+    monkeypatch.setattr(cpi_data_provider, "_fetch_bls_window", recording_fetch)
+    return requested
+
+
+@pytest.mark.parametrize(
+    "api_key, max_years", [(None, BLS_MAX_YEARS_WITHOUT_KEY), ("key", BLS_MAX_YEARS_WITH_KEY)]
+)
+def test_long_ranges_are_split_by_the_key_dependent_cap(stub_server, windows, monkeypatch, api_key, max_years):
+    if api_key:
+        monkeypatch.setenv("BLS_API_KEY", api_key)
+    else:
+        monkeypatch.delenv("BLS_API_KEY", raising=False)
+    this_year = datetime.date.today().year
+
+    series = fetch_bls_series([SERIES], "1990")[SERIES]
+
+    assert sorted(windows) == split_year_windows(1990, this_year, max_years)
+    assert all(end - start + 1 <= max_years for start, end in windows)
+    expected = synthetic.bls_payload([SERIES], 1990, this_year)["Results"]["series"][0]["data"]
+    assert len(series) == len(expected)
+    assert min(series) == "1990-01"
+    assert list(series) == sorted(series)
+
+
+def test_gaps_are_reported(stub_server, monkeypatch, capsys):
+    payload = synthetic.bls_payload
+
+    def payload_with_gap(series_ids, start_year, end_year):
+        result = payload(series_ids, start_year, end_year)
+        for series in result["Results"]["series"]:
+            series["data"] = [entry for entry in series["data"] if entry["periodName"] not in {"2015-06", "2015-07"}]
+        return result
+
+    monkeypatch.setattr(synthetic, "bls_payload", payload_with_gap)
+
+    series = BlsCpiDataProvider(SERIES).get_cpi_from_initial_date("2010")
+
+    assert "2015-06" not in series and "2015-05" in series
+    assert "missing 2 month(s): 2015-06, 2015-07" in capsys.readouterr().out
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+import pytest
+
+from infra.cpi_data_provider import BlsCpiDataProvider, CachedCpiDataProvider
+from infra.cpi_registry import BLS_SERIES, CpiRegistry
+from infra.file_cpi_data_provider import FileCpiDataProvider
+
+
+class StubProvider:
+    def __init__(self, value):
+        self.value = value
+
+    def get_cpi_from_initial_date(self, initial_year):
+        return {f"{initial_year[:4]}-01": self.value}
+
+
+@pytest.fixture
+def cpi_file(tmp_path):
+    path = tmp_path / "uk_cpi.csv"
+    path.write_text("series_id,month,value\nUK,2021-01,110\n", encoding="utf-8")
+    return str(path)
+
+
+def test_named_sources_are_cached_bls_series_built_once():
+    registry = CpiRegistry()
+
+    provider = registry.provider("us-core-sa")
+
+    assert isinstance(provider, CachedCpiDataProvider)
+    assert isinstance(provider.upstream, BlsCpiDataProvider)
+    assert provider.upstream.series_id == BLS_SERIES["us-core-sa"]
+    assert registry.provider("us-core-sa") is provider
+    assert registry.names() == sorted(BLS_SERIES)
+
+
+def test_bls_prefix_takes_any_series_id():
+    provider = CpiRegistry().provider("bls:CUUR0000SEHA")
+
+    assert isinstance(provider, CachedCpiDataProvider)
+    assert provider.upstream.series_id == "CUUR0000SEHA"
+
+
+def test_file_prefix_takes_a_path_and_optional_series(cpi_file):
+    registry = CpiRegistry()
+
+    whole = registry.provider(f"file:{cpi_file}")
+    one = registry.provider(f"file:{cpi_file}#UK")
+
+    assert isinstance(whole, FileCpiDataProvider) and whole.path == cpi_file and whole._filter is None
+    assert one.path == cpi_file and one.series_id == "UK"
+    assert one.get_cpi_from_initial_date("2021") == {"2021-01": Decimal(110)}
+
+
+@pytest.mark.parametrize("name", ["us-cpi", "bls:", "file:", "ftp:cpi.csv", ""])
+def test_unknown_sources_are_refused_with_the_known_names(name):
+    with pytest.raises(ValueError, match="Unknown CPI source.*us-cpi-u-sa.*bls:<id>, file:<path>"):
+        CpiRegistry().provider(name)
+
+
+def test_register_replaces_a_built_provider():
+    registry = CpiRegistry()
+    registry.register("local", lambda: StubProvider(Decimal(1)))
+    first = registry.provider("local")
+
+    registry.register("local", lambda: StubProvider(Decimal(2)))
+
+    assert registry.provider("local") is not first
+    assert registry.provider("local").value == Decimal(2)
+    assert "local" in registry.names()
+
+
+def test_providers_by_currency_parses_the_spec(cpi_file):
+    registry = CpiRegistry()
+    registry.register("eu-hicp", lambda: StubProvider(Decimal(105)))
+
+    providers = registry.providers_by_currency(f" gbp = file:{cpi_file}#UK ,EUR=eu-hicp,, JPY=, =us-core-sa,CHF")
+
+    assert sorted(providers) == ["EUR", "GBP"]
+    assert providers["GBP"].series_id == "UK"
+    assert providers["EUR"] is registry.provider("eu-hicp")
+    assert registry.providers_by_currency("") == {}
+    with pytest.raises(ValueError, match="Unknown CPI source 'nope'"):
+        registry.providers_by_currency("GBP=nope")
+
+
+def test_get_cpi_series_reads_non_bls_sources_directly(cpi_file):
+    registry = CpiRegistry()
+    registry.register("stub", lambda: StubProvider(Decimal(100)))
+
+    series = registry.get_cpi_series(["stub", f"file:{cpi_file}#UK", "stub"], "2021")
+
+    assert series == {"stub": {"2021-01": Decimal(100)}, f"file:{cpi_file}#UK": {"2021-01": Decimal(110)}}
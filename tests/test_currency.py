@@ -0,0 +1,126 @@
+import asyncio
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from benchmarks import synthetic
+from core.currency import FxRateTable, cost_currency_for_market
+from data.repositories import bulk_add_share_purchases, load_held_purchases_as_rows
+from infra.quote_cache import default_quote_cache
+from services.investment_service import run_investment_analysis_async, stream_investment_analysis
+
+# S0000 trades on NASDAQ and S0002 on LON, whose GBX quotes are analyzed in GBP.
+GBP_RATES = {
+    date(2021, 3, 1): Decimal("1.30"),
+    date(2021, 3, 3): Decimal("1.40"),
+    date(2021, 3, 17): Decimal("1.50"),
+    date(2021, 4, 1): Decimal("1.20"),
+}
+PURCHASES = [
+    ("S0000", "NASDAQ", Decimal(10), Decimal("20.00"), date(2021, 3, 3)),
+    ("S0000", "NASDAQ", Decimal(30), Decimal("40.00"), date(2021, 3, 17)),
+    ("S0002", "LON", Decimal(10), Decimal("20.00"), date(2021, 3, 3)),
+    ("S0002", "LON", Decimal(30), Decimal("40.00"), date(2021, 3, 17)),
+]
+
+
+class _Cpi:
+    async def get_cpi_from_initial_date(self, initial_year):
+        return synthetic.cpi_series()
+
+
+class _Prices:
+    async def get_prices(self, pairs):
+        return [
+            {"symbol": p["symbol"], "price": Decimal(50), "currency": cost_currency_for_market(p["market"], "USD")}
+            for p in pairs
+        ]
+
+
+class _Rates:
+    def __init__(self, rates=None):
+        self.rates = rates
+
+    async def get_rates(self, currency, base, start, end):
+        if self.rates is None:
+            raise ConnectionError("rates unavailable")
+        return self.rates
+
+
+def analyze(rows, fx_rate_provider):
+    return asyncio.run(run_investment_analysis_async(
+        rows, "2021", _Cpi(), _Prices(), fx_rate_provider=fx_rate_provider, base_currency="USD"
+    ))
+
+
+def test_missing_rate_raises():
+    table = FxRateTable.from_history("USD", {"GBP": GBP_RATES}, [("GBP", "2021-03-03")])
+
+    assert table.rate("GBP", "2021-03-03") == Decimal("1.40")
+    assert table.rate("USD", "2021-03-03") == Decimal(1)
+    with pytest.raises(KeyError, match="GBP/USD"):
+        table.rate("GBP", "2021-03-04")
+    with pytest.raises(KeyError, match="JPY/USD"):
+        table.rate("JPY", "2021-03-03")
+
+
+def test_foreign_holdings_are_loaded_as_lots(database):
+    bulk_add_share_purchases(PURCHASES)
+
+    rows = load_held_purchases_as_rows("USD")
+
+    assert [(p["symbol"], p["purchase_date"]) for p in rows] == [
+        ("S0000", "2021-03-01"),
+        ("S0002", "2021-03-03"),
+        ("S0002", "2021-03-17"),
+    ]
+    assert [p["symbol"] for p in load_held_purchases_as_rows("GBP")] == ["S0002", "S0000", "S0000"]
+
+
+def test_foreign_costs_convert_at_each_purchase_date(database):
+    bulk_add_share_purchases(PURCHASES)
+
+    companies, _ = analyze(load_held_purchases_as_rows("USD"), _Rates(GBP_RATES))
+
+    by_name = {c.name: c for c in companies}
+    assert by_name["S0000"].total_nominal_invested == Decimal(1400)
+    assert by_name["S0002"].total_nominal_invested == Decimal(10 * 20) * Decimal("1.40") + Decimal(30 * 40) * Decimal("1.50")
+    assert by_name["S0002"].total_current_value == Decimal(40 * 50) * Decimal("1.20")
+
+
+@pytest.mark.parametrize("backend", ["exact", "fast"])
+def test_holdings_without_rates_are_left_out(database, capsys, backend):
+    bulk_add_share_purchases(PURCHASES)
+    rows = load_held_purchases_as_rows("USD")
+
+    companies, totals = asyncio.run(run_investment_analysis_async(
+        rows, "2021", _Cpi(), _Prices(), backend=backend, fx_rate_provider=_Rates(), base_currency="USD"
+    ))
+
+    assert [c.name for c in companies] == ["S0000"]
+    assert float(totals.total_nominal_invested) == pytest.approx(1400)
+    assert "Leaving out S0002" in capsys.readouterr().out
+
+
+class _FailingRates:
+    def get_rates(self, currency, base, start, end):
+        raise ConnectionError("rates unavailable")
+
+
+class _SyncCpi:
+    def get_cpi_from_initial_date(self, initial_year):
+        return synthetic.cpi_series()
+
+
+def test_streamed_holdings_without_rates_are_left_out(database, stub_server, capsys):
+    bulk_add_share_purchases(PURCHASES)
+    default_quote_cache.clear()
+
+    streamed = list(stream_investment_analysis(
+        load_held_purchases_as_rows("USD"), "2021", _SyncCpi(), fx_rate_provider=_FailingRates(), base_currency="USD"
+    ))
+    default_quote_cache.clear()
+
+    assert [(c.name, done, total) for c, done, total in streamed] == [("S0000", 1, 1)]
+    assert "Leaving out S0002" in capsys.readouterr().out
@@ -0,0 +1,71 @@
+import os
+from decimal import Decimal
+
+import pytest
+
+from infra.file_cpi_data_provider import FileCpiDataProvider
+
+
+def write(path, text):
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_reads_months_from_the_initial_year_on_in_order(tmp_path):
+    path = write(tmp_path / "cpi.csv", "month,value\n2021-02,101.5\n2020-12,99\n2021-01-31,100\n")
+    provider = FileCpiDataProvider(path)
+
+    assert provider.get_cpi_from_initial_date("2021-06") == {"2021-01": Decimal(100), "2021-02": Decimal("101.5")}
+    assert provider.series_id == "file:cpi.csv"
+
+
+def test_malformed_rows_are_skipped_and_reported(tmp_path, capsys):
+    path = write(
+        tmp_path / "cpi.csv",
+        "month,value\n"
+        "2021-01,100\n"
+        "2021-02,\n"
+        "2021-03,n/a\n"
+        "2021-04,NaN\n"
+        "2021-5,104\n"
+        "May 2021,105\n"
+        ",106\n"
+        "2021-06,106\n",
+    )
+
+    assert FileCpiDataProvider(path).get_cpi_from_initial_date("2021") == {
+        "2021-01": Decimal(100),
+        "2021-06": Decimal(106),
+    }
+    out = capsys.readouterr().out
+    assert out.count("invalid value") == 3
+    assert out.count("invalid month") == 3
+
+
+def test_series_id_picks_one_series_of_several(tmp_path):
+    path = write(tmp_path / "cpi.csv", "series_id,month,value\nUK,2021-01,110\nEU,2021-01,105\nUK,2021-02,111\n")
+
+    assert FileCpiDataProvider(path, "UK").get_cpi_from_initial_date("2021") == {
+        "2021-01": Decimal(110),
+        "2021-02": Decimal(111),
+    }
+    assert FileCpiDataProvider(path, "EU").series_id == "EU"
+
+
+def test_file_is_reread_only_when_it_changes(tmp_path):
+    cpi = tmp_path / "cpi.csv"
+    path = write(cpi, "month,value\n2021-01,100\n")
+    provider = FileCpiDataProvider(path)
+    assert provider.get_cpi_from_initial_date("2021") == {"2021-01": Decimal(100)}
+
+    write(cpi, "month,value\n2021-01,200\n")
+    os.utime(path, (0, 0))
+    assert provider.get_cpi_from_initial_date("2021") == {"2021-01": Decimal(200)}
+
+
+def test_invalid_initial_year_and_missing_file(tmp_path):
+    provider = FileCpiDataProvider(write(tmp_path / "cpi.csv", "month,value\n2021-01,100\n"))
+    with pytest.raises(ValueError, match="4-digit year"):
+        provider.get_cpi_from_initial_date("21")
+    with pytest.raises(FileNotFoundError):
+        FileCpiDataProvider(str(tmp_path / "missing.csv")).get_cpi_from_initial_date("2021")
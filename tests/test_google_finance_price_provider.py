@@ -0,0 +1,46 @@
+import time
+
+from benchmarks import synthetic
+from infra import google_finance_price_provider as provider
+
+# Each stub response is delayed by this much, so the run is dominated by
+# waiting on the server, as it is against Google Finance.
+RESPONSE_DELAY = 0.05
+SYMBOL_COUNT = 24
+
+
+def _pairs(count):
+    return [{"symbol": symbol, "market": synthetic.market_for(symbol)} for symbol in synthetic.symbols(count)]
+
+
+def test_get_prices_returns_every_quote(stub_server):
+    pairs = _pairs(8)
+    quotes = {q["symbol"]: q for q in provider.get_prices(pairs)}
+    assert set(quotes) == {p["symbol"] for p in pairs}
+    for symbol, quote in quotes.items():
+        assert quote["price"] == synthetic.price_for(symbol)
+
+
+def test_a_failing_symbol_does_not_stop_the_rest(stub_server, capsys):
+    pairs = _pairs(4) + [{"symbol": "MISSING", "market": "NASDAQ"}]
+    quotes = list(provider.get_prices(pairs))
+    assert sorted(q["symbol"] for q in quotes) == sorted(p["symbol"] for p in pairs[:4])
+    assert "MISSING:NASDAQ" in capsys.readouterr().out
+
+
+def test_concurrent_fetch_is_faster_than_sequential(stub_server):
+    stub_server.delay_seconds = RESPONSE_DELAY
+    pairs = _pairs(SYMBOL_COUNT)
+
+    started = time.perf_counter()
+    for pair in pairs:
+        provider.get_quote(pair["symbol"], pair["market"])
+    sequential = time.perf_counter() - started
+
+    started = time.perf_counter()
+    quotes = list(provider.get_prices(pairs))
+    concurrent = time.perf_counter() - started
+
+    assert len(quotes) == SYMBOL_COUNT
+    # The stub host allows 8 requests at a time; leave room for a busy machine.
+    assert sequential / concurrent > 3, f"sequential {sequential:.2f}s, concurrent {concurrent:.2f}s"
@@ -0,0 +1,100 @@
+"""Headless checks of the analysis window's incremental refresh, on Qt's offscreen platform."""
+from __future__ import annotations
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+import pytest
+
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+import main
+from benchmarks import synthetic
+from data.repositories import bulk_add_share_purchases
+from infra.quote_cache import default_quote_cache
+
+# NASDAQ and NYSE symbols only, so no FX is involved. More than the quote
+# provider's worker pool, so quotes arrive in several waves.
+SYMBOLS = [name for name in synthetic.symbols(64) if synthetic.market_for(name) in ("NASDAQ", "NYSE")]
+QUOTE_DELAY_SECONDS = 0.1
+TIMEOUT_SECONDS = 30.0
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+@pytest.fixture
+def window(app, database, stub_server, tmp_path, monkeypatch):
+    """An AnalysisWindow over purchases of SYMBOLS, with quotes delayed by the stub server."""
+    bulk_add_share_purchases(
+        [(name, synthetic.market_for(name), Decimal(10), Decimal("12.50"), date(2015, 3, 2)) for name in SYMBOLS]
+    )
+    cpi_path = tmp_path / "cpi.csv"
+    cpi_path.write_text(
+        "month,value\n" + "".join(f"{month},{value}\n" for month, value in synthetic.cpi_series().items()),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(main, "CPI_SERIES", f"file:{cpi_path}")
+    errors: list = []
+    monkeypatch.setattr(main.QMessageBox, "critical", lambda parent, title, text: errors.append(text))
+    stub_server.delay_seconds = QUOTE_DELAY_SECONDS
+    default_quote_cache.clear()
+
+    started = time.perf_counter()
+    window = main.AnalysisWindow()
+    window.started = started
+    window.errors = errors
+    yield window
+    window._stop_worker()
+    window.deleteLater()
+    app.processEvents()
+    default_quote_cache.clear()
+
+
+def wait_until(app, condition, timeout: float = TIMEOUT_SECONDS) -> None:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise AssertionError("timed out waiting for the analysis window")
+        app.processEvents()
+        time.sleep(0.001)
+
+
+def is_idle(window) -> bool:
+    return not window._awaiting_result and not window._refresh_timer.isActive()
+
+
+def test_rows_arrive_before_the_refresh_completes(app, window, record_property):
+    model = window.table_model
+    wait_until(app, lambda: model.rowCount() > 0)
+    first_row = time.perf_counter() - window.started
+    rows_at_first_row = model.rowCount()
+    progress_at_first_row = window.progress_bar.maximum()
+
+    wait_until(app, lambda: is_idle(window))
+    completed = time.perf_counter() - window.started
+    record_property("time_to_first_row_seconds", round(first_row, 3))
+    record_property("time_to_complete_seconds", round(completed, 3))
+
+    assert not window.errors
+    assert rows_at_first_row < len(SYMBOLS)
+    assert progress_at_first_row == len(SYMBOLS)
+    assert first_row < completed - QUOTE_DELAY_SECONDS
+    assert model.rowCount() == len(SYMBOLS)
+    assert window.summary_label.text().startswith("Portfolio Totals:")
+
+
+def test_refresh_can_be_cancelled_partway(app, window):
+    model = window.table_model
+    wait_until(app, lambda: model.rowCount() > 0)
+    window._cancel_refresh()
+    wait_until(app, lambda: is_idle(window))
+
+    assert not window.errors
+    assert window.summary_label.text().startswith("Refresh cancelled after")
+    assert model.rowCount() < len(SYMBOLS)
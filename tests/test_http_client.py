@@ -0,0 +1,86 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+import pytest
+import requests
+
+from infra.http_client import HostPolicy, HttpClient, TotalTimeoutError
+
+BODY = b"0123456789" * 10
+# Seconds between bytes on /drip; well under the read timeout, so no single read times out.
+DRIP_INTERVAL = 0.02
+TOTAL_TIMEOUT = 0.3
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        if self.path == "/silent":
+            time.sleep(2.0)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        if self.path == "/drip":
+            for i in range(len(BODY)):
+                self.wfile.write(BODY[i:i + 1])
+                self.wfile.flush()
+                time.sleep(DRIP_INTERVAL)
+        else:
+            self.wfile.write(BODY)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture(scope="module")
+def base_url() -> Iterator[str]:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client() -> HttpClient:
+    policy = HostPolicy(connect_timeout=1.0, read_timeout=1.0, max_attempts=1, total_timeout=TOTAL_TIMEOUT)
+    return HttpClient(policies={"127.0.0.1": policy})
+
+
+def test_body_is_read_whole(client, base_url):
+    assert client.get(base_url + "/fast").content == BODY
+    with client.stream("GET", base_url + "/fast") as response:
+        assert b"".join(response.iter_content(chunk_size=7)) == BODY
+
+
+def test_drip_fed_body_stops_at_the_total_timeout(client, base_url):
+    # Sent in full, the body would take len(BODY) * DRIP_INTERVAL = 2 s.
+    started = time.monotonic()
+    with pytest.raises(TotalTimeoutError):
+        client.get(base_url + "/drip")
+    assert time.monotonic() - started < TOTAL_TIMEOUT + 0.5
+
+
+def test_drip_fed_stream_stops_at_the_total_timeout(client, base_url):
+    started = time.monotonic()
+    received = b""
+    with pytest.raises(TotalTimeoutError):
+        with client.stream("GET", base_url + "/drip") as response:
+            for chunk in response.iter_content(chunk_size=64):
+                received += chunk
+    assert 0 < len(received) < len(BODY)
+    assert time.monotonic() - started < TOTAL_TIMEOUT + 0.5
+
+
+def test_waiting_for_headers_is_capped_by_the_time_left(base_url):
+    client = HttpClient(policies={"127.0.0.1": HostPolicy(read_timeout=10.0, max_attempts=1, total_timeout=TOTAL_TIMEOUT)})
+
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        client.get(base_url + "/silent")
+    assert time.monotonic() - started < TOTAL_TIMEOUT + 0.5
@@ -0,0 +1,92 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from data import importer
+from data.repositories import bulk_add_share_purchases, load_share_purchases_as_rows, verify_purchase_summaries
+
+HEADER = "symbol,market,quantity,cost,purchase_date\n"
+
+
+def csv_source(*lines):
+    return io.StringIO(HEADER + "".join(line + "\n" for line in lines))
+
+
+@pytest.mark.parametrize(("line", "message"), [
+    (",NASDAQ,1,10,2024-01-02", "symbol is empty"),
+    ("AAPL,,1,10,2024-01-02", "market is empty"),
+    ("AAPL,NASDAQ,one,10,2024-01-02", "must be decimal numbers"),
+    ("AAPL,NASDAQ,0,10,2024-01-02", "quantity must be greater than 0"),
+    ("AAPL,NASDAQ,NaN,10,2024-01-02", "quantity must be greater than 0"),
+    ("AAPL,NASDAQ,1,-10,2024-01-02", "cost must be greater than 0"),
+    ("AAPL,NASDAQ,1,10,02/01/2024", "Invalid isoformat"),
+])
+def test_invalid_rows_are_rejected(line, message):
+    with pytest.raises(ValueError, match=message):
+        importer._validate_row(next(iter(csv.DictReader(io.StringIO(HEADER + line)))))
+
+
+def test_valid_row_is_normalized():
+    row = {"symbol": " aapl ", "market": "NASDAQ", "quantity": "1.5", "cost": "190.25", "purchase_date": "2024-06-03"}
+
+    assert importer._validate_row(row) == ("AAPL", "NASDAQ", Decimal("1.5"), Decimal("190.25"), date(2024, 6, 3))
+
+
+def test_rejected_rows_are_reported_by_line_and_the_rest_imported(database):
+    result = importer.import_purchases_csv(csv_source(
+        "AAPL,NASDAQ,1,10,2024-01-02",
+        "AAPL,NASDAQ,0,10,2024-01-03",
+        "MSFT,NASDAQ,2,20,2024-01-04",
+        ",NASDAQ,1,10,2024-01-05",
+    ))
+
+    assert (result["rows_read"], result["rows_imported"], result["rows_rejected"]) == (4, 2, 2)
+    # The header is line 1.
+    assert result["errors"] == ["line 3: quantity must be greater than 0", "line 5: symbol is empty"]
+    assert [p["symbol"] for p in load_share_purchases_as_rows()] == ["AAPL", "MSFT"]
+
+
+def test_reported_errors_are_capped(database, monkeypatch):
+    monkeypatch.setattr(importer, "MAX_REPORTED_ERRORS", 2)
+
+    result = importer.import_purchases_csv(csv_source(*["AAPL,NASDAQ,0,10,2024-01-02"] * 5), chunk_size=2)
+
+    assert result["rows_rejected"] == 5
+    assert result["errors"] == ["line 2: quantity must be greater than 0", "line 3: quantity must be greater than 0"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5, 6, 100])
+def test_every_row_is_imported_whatever_the_chunk_size(database, chunk_size):
+    lines = [f"S{i % 3},NASDAQ,{i + 1},{10 + i},2024-0{1 + i % 2}-1{i}" for i in range(5)]
+
+    result = importer.import_purchases_csv(csv_source(*lines), chunk_size=chunk_size)
+
+    assert (result["rows_read"], result["rows_imported"], result["rows_rejected"]) == (5, 5, 0)
+    assert sorted(p["quantity"] for p in load_share_purchases_as_rows()) == [Decimal(i + 1) for i in range(5)]
+
+
+def test_month_summaries_stay_consistent_across_chunks_and_earlier_purchases(database):
+    bulk_add_share_purchases([("AAPL", "NASDAQ", Decimal(3), Decimal("9.50"), date(2024, 1, 20))])
+    lines = [f"{symbol},NASDAQ,{i + 1},{i + 10}.25,2024-0{1 + i % 3}-0{1 + i % 9}"
+             for i, symbol in enumerate(["AAPL", "MSFT"] * 12)]
+
+    importer.import_purchases_csv(csv_source(*lines), chunk_size=5)
+
+    assert verify_purchase_summaries() == []
+
+
+@pytest.mark.parametrize("chunk_size", [0, -1])
+def test_chunk_size_below_one_is_refused(database, chunk_size, capsys, tmp_path):
+    with pytest.raises(ValueError, match="chunk_size must be at least 1"):
+        importer.import_purchases_csv(csv_source("AAPL,NASDAQ,1,10,2024-01-02"), chunk_size=chunk_size)
+
+    path = tmp_path / "purchases.csv"
+    path.write_text(HEADER + "AAPL,NASDAQ,1,10,2024-01-02\n", encoding="utf-8")
+    with pytest.raises(SystemExit) as exit_info:
+        importer.main([str(path), "--chunk-size", str(chunk_size)])
+    assert exit_info.value.code == 2
+    assert "must be at least 1" in capsys.readouterr().err
+    assert load_share_purchases_as_rows() == []
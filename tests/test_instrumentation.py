@@ -0,0 +1,124 @@
+import json
+import threading
+
+import pytest
+
+from core import instrumentation
+
+
+@pytest.fixture
+def tracing():
+    was_enabled = instrumentation.is_enabled()
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.enable(was_enabled)
+    instrumentation.reset()
+
+
+def test_disabled_span_is_the_shared_noop_and_records_nothing():
+    was_enabled = instrumentation.is_enabled()
+    instrumentation.enable(False)
+    instrumentation.reset()
+    try:
+        first, second = instrumentation.span("a"), instrumentation.span("b")
+        assert first is second is instrumentation._NOOP
+        with first as s:
+            s.add("rows", 3)
+        instrumentation.count("a", "retries")
+        assert instrumentation.snapshot() == {}
+    finally:
+        instrumentation.enable(was_enabled)
+
+
+def test_spans_count_calls_errors_and_counters(tracing):
+    for rows in (2, 3):
+        with instrumentation.span("db.load") as s:
+            s.add("rows", rows)
+    with pytest.raises(KeyError):
+        with instrumentation.span("db.load"):
+            raise KeyError("missing")
+    instrumentation.count("db.load", "retries")
+    instrumentation.count("db.load", "retries", 2)
+
+    stats = instrumentation.snapshot()["db.load"]
+    assert stats["count"] == 3
+    assert stats["errors"] == {"KeyError": 1}
+    assert stats["counters"] == {"rows": 5, "retries": 3}
+    assert sum(stats["histogram"].values()) == 3
+    assert stats["mean_seconds"] == pytest.approx(stats["total_seconds"] / 3)
+
+
+@pytest.mark.parametrize(("seconds", "bucket"), [(0.0, "0.001"), (0.001, "0.001"), (0.0011, "0.005"), (7.5, "10.0"), (31.0, "+Inf")])
+def test_histogram_bucket_is_the_first_upper_bound_not_below_the_duration(tracing, seconds, bucket):
+    instrumentation._record(instrumentation.Span("timed"), seconds, None)
+
+    histogram = instrumentation.snapshot()["timed"]["histogram"]
+    assert histogram[bucket] == 1
+    assert sum(histogram.values()) == 1
+
+
+def test_nested_spans_record_their_parent_per_thread(tracing):
+    def other_thread():
+        with instrumentation.span("other"):
+            pass
+
+    with instrumentation.span("outer"):
+        with instrumentation.span("inner"):
+            pass
+        worker = threading.Thread(target=other_thread)
+        worker.start()
+        worker.join()
+
+    recent = {entry["name"]: entry for entry in json.loads(instrumentation.to_json())["recent"]}
+    assert recent["inner"]["parent"] == "outer"
+    assert recent["outer"]["parent"] is None
+    # Another thread's span doesn't nest under this thread's open span.
+    assert recent["other"]["parent"] is None
+
+
+def test_traced_counts_rows_of_the_result(tracing):
+    @instrumentation.traced("load.list", count_rows=True)
+    def load_list():
+        return [1, 2, 3]
+
+    @instrumentation.traced("load.int", count_rows=True)
+    def load_int():
+        return 7
+
+    @instrumentation.traced("load.plain")
+    def load_plain():
+        return [1]
+
+    for _ in range(2):
+        load_list()
+    load_int()
+    load_plain()
+
+    stats = instrumentation.snapshot()
+    assert stats["load.list"]["counters"] == {"rows": 6}
+    assert stats["load.int"]["counters"] == {"rows": 7}
+    assert stats["load.plain"]["count"] == 1 and stats["load.plain"]["counters"] == {}
+
+
+def test_json_and_prometheus_exports(tracing):
+    instrumentation._record(instrumentation.Span("http.get"), 0.02, None)
+    instrumentation._record(instrumentation.Span("http.get"), 0.2, "Timeout")
+    instrumentation.count("http.get", "bytes.in", 512)
+    instrumentation.count("only.counted", "hits")
+
+    payload = json.loads(instrumentation.to_json(include_trace=False))
+    assert "recent" not in payload
+    assert payload["spans"]["http.get"]["count"] == 2
+
+    text = instrumentation.to_prometheus(prefix="app")
+    lines = text.splitlines()
+    assert 'app_span_seconds_bucket{span="http.get",le="0.01"} 0' in lines
+    assert 'app_span_seconds_bucket{span="http.get",le="0.025"} 1' in lines
+    assert 'app_span_seconds_bucket{span="http.get",le="+Inf"} 2' in lines
+    assert 'app_span_seconds_count{span="http.get"} 2' in lines
+    assert 'app_span_errors_total{span="http.get",error="Timeout"} 1' in lines
+    assert 'app_bytes_in_total{span="http.get"} 512' in lines
+    assert 'app_hits_total{span="only.counted"} 1' in lines
+    # A name with only counters has no histogram.
+    assert 'span="only.counted",le=' not in text
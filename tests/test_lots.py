@@ -0,0 +1,134 @@
+"""Consistency checks of lot matching over seeded random purchase and sale histories."""
+from __future__ import annotations
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Tuple
+
+import pytest
+
+from core.analysis import InflationIndex
+from core.dto import PurchaseLotRow, SaleRow
+from core.lots import COST_BASIS_METHODS, held_quantities, match_lots, remaining_lots
+
+SEEDS = range(25)
+SYMBOLS = ("AAA", "BBB", "CCC")
+CENT = Decimal("0.01")
+# Average cost divides, so its basis can be off by rounding in the last of Decimal's 28 digits.
+AVERAGE_TOLERANCE = Decimal("1e-15")
+
+
+def random_history(seed: int) -> Tuple[List[PurchaseLotRow], List[SaleRow]]:
+    """Purchases and sales of SYMBOLS over 2020-2023; no sale exceeds the shares held at its date."""
+    rng = random.Random(seed)
+    start = date(2020, 1, 1)
+    purchases: List[PurchaseLotRow] = [
+        {
+            "purchase_id": purchase_id,
+            "symbol": rng.choice(SYMBOLS),
+            "market": "NASDAQ",
+            "quantity": Decimal(rng.randint(1, 50_000)) * CENT,
+            "cost": Decimal(rng.randint(100, 100_000)) * CENT,
+            "purchase_date": (start + timedelta(days=rng.randrange(1461))).isoformat(),
+        }
+        for purchase_id in range(1, rng.randint(1, 60) + 1)
+    ]
+    purchases.sort(key=lambda p: p["purchase_date"])
+
+    sales: List[SaleRow] = []
+    sold: Dict[str, Decimal] = {}
+    for day in sorted(start + timedelta(days=rng.randrange(1461)) for _ in range(rng.randint(0, 40))):
+        symbol = rng.choice(SYMBOLS)
+        iso = day.isoformat()
+        held = sum((p["quantity"] for p in purchases if p["symbol"] == symbol and p["purchase_date"] <= iso), Decimal(0))
+        held -= sold.get(symbol, Decimal(0))
+        quantity = (held * Decimal(rng.random())).quantize(CENT, rounding="ROUND_DOWN")
+        if quantity <= 0:
+            continue
+        if rng.random() < 0.1:
+            quantity = held
+        sold[symbol] = sold.get(symbol, Decimal(0)) + quantity
+        sales.append({
+            "symbol": symbol,
+            "quantity": quantity,
+            "price": Decimal(rng.randint(100, 100_000)) * CENT,
+            "sale_date": iso,
+            "lot_id": None,
+        })
+    return purchases, sales
+
+
+def cpi_index() -> InflationIndex:
+    months = [f"{year}-{month:02d}" for year in range(2020, 2024) for month in range(1, 13)]
+    return InflationIndex.from_cpi_index({month: Decimal(250) + Decimal(i) / 4 for i, month in enumerate(months)})
+
+
+def by_symbol(rows, amount) -> Dict[str, Decimal]:
+    totals: Dict[str, Decimal] = {}
+    for row in rows:
+        totals[row["symbol"]] = totals.get(row["symbol"], Decimal(0)) + amount(row)
+    return totals
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("method", COST_BASIS_METHODS)
+def test_realized_and_remaining_basis_add_up_to_total_cost(seed, method):
+    purchases, sales = random_history(seed)
+    total_cost = by_symbol(purchases, lambda p: p["quantity"] * p["cost"])
+    proceeds = by_symbol(sales, lambda s: s["quantity"] * s["price"])
+
+    for gains in match_lots(purchases, sales, cpi_index(), {}, method):
+        sold_basis = proceeds.get(gains.name, Decimal(0)) - gains.realized_nominal_gain
+        difference = abs(sold_basis + gains.remaining_cost - total_cost[gains.name])
+        assert difference <= (AVERAGE_TOLERANCE * total_cost[gains.name] if method == "average" else 0)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_methods_agree_on_quantity_held(seed):
+    purchases, sales = random_history(seed)
+    expected = held_quantities(purchases, sales)
+
+    for method in COST_BASIS_METHODS:
+        gains = match_lots(purchases, sales, cpi_index(), {}, method)
+        assert {g.name: g.held_quantity for g in gains} == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_remaining_lots_hold_the_unsold_shares_and_basis(seed):
+    purchases, sales = random_history(seed)
+    lots = remaining_lots(purchases, sales)
+
+    gains = {g.name: g for g in match_lots(purchases, sales, cpi_index(), {}, "specific")}
+    held = by_symbol(lots, lambda p: p["quantity"])
+    basis = by_symbol(lots, lambda p: p["quantity"] * p["cost"])
+    for name, g in gains.items():
+        assert held.get(name, Decimal(0)) == g.held_quantity
+        assert basis.get(name, Decimal(0)) == g.remaining_cost
+    assert all(p["quantity"] > 0 for p in lots)
+    assert [p["purchase_date"] for p in lots] == sorted(p["purchase_date"] for p in lots)
+
+
+def test_remaining_lots_take_a_named_lot_first():
+    purchases: List[PurchaseLotRow] = [
+        {"purchase_id": 1, "symbol": "AAA", "market": "NASDAQ", "quantity": Decimal(10), "cost": Decimal(5), "purchase_date": "2021-01-04"},
+        {"purchase_id": 2, "symbol": "AAA", "market": "NASDAQ", "quantity": Decimal(10), "cost": Decimal(7), "purchase_date": "2021-02-01"},
+    ]
+    sales: List[SaleRow] = [
+        {"symbol": "AAA", "quantity": Decimal(4), "price": Decimal(9), "sale_date": "2021-03-01", "lot_id": 2},
+        {"symbol": "AAA", "quantity": Decimal(10), "price": Decimal(9), "sale_date": "2021-04-01", "lot_id": None},
+    ]
+
+    assert remaining_lots(purchases, sales) == [{**purchases[1], "quantity": Decimal(6)}]
+    assert remaining_lots(purchases, []) == purchases
+
+
+def test_remaining_lots_reject_overselling():
+    purchases: List[PurchaseLotRow] = [
+        {"purchase_id": 1, "symbol": "AAA", "market": "NASDAQ", "quantity": Decimal(1), "cost": Decimal(5), "purchase_date": "2021-01-04"},
+    ]
+    sales: List[SaleRow] = [
+        {"symbol": "AAA", "quantity": Decimal(2), "price": Decimal(9), "sale_date": "2021-03-01", "lot_id": None},
+    ]
+
+    with pytest.raises(ValueError, match="exceeds"):
+        remaining_lots(purchases, sales)
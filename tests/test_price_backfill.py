@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from data.db import db
+from data.repositories import get_price_history_bounds, load_price_history, save_price_history
+from services.price_backfill import backfill_price_history, missing_ranges
+
+SATURDAY = date(2024, 1, 6)
+TODAY = date(2024, 3, 29)
+
+
+class StubHistory:
+    """Weekday closes of 100 for any range, recording the ranges asked for."""
+
+    def __init__(self):
+        self.requests = []
+
+    def get_price_history(self, symbol, market, start, end):
+        self.requests.append((symbol, start, end))
+        days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+        return {day: Decimal("100") for day in days if day.weekday() < 5}
+
+
+def test_missing_ranges():
+    stored = (date(2024, 2, 1), date(2024, 2, 29))
+    assert missing_ranges(date(2024, 1, 1), date(2024, 3, 31), None) == [(date(2024, 1, 1), date(2024, 3, 31))]
+    assert missing_ranges(date(2024, 2, 1), date(2024, 2, 29), stored) == []
+    assert missing_ranges(date(2024, 1, 15), date(2024, 3, 31), stored) == [
+        (date(2024, 1, 15), date(2024, 1, 31)),
+        (date(2024, 3, 1), date(2024, 3, 31)),
+    ]
+    assert missing_ranges(date(2024, 3, 1), date(2024, 2, 1), stored) == []
+
+
+def test_backfill_fetches_only_new_days(database):
+    provider = StubHistory()
+    first = backfill_price_history([("AAPL", "NASDAQ", date(2024, 1, 2))], provider, end=date(2024, 2, 29))
+    second = backfill_price_history([("AAPL", "NASDAQ", date(2024, 1, 2))], provider, end=TODAY)
+
+    assert first == {"AAPL": 43}
+    assert second == {"AAPL": 21}
+    assert provider.requests == [("AAPL", date(2024, 1, 2), date(2024, 2, 29)), ("AAPL", date(2024, 3, 1), TODAY)]
+
+
+def test_non_trading_start_is_not_refetched(database):
+    provider = StubHistory()
+    backfill_price_history([("AAPL", "NASDAQ", SATURDAY)], provider, end=TODAY)
+    again = backfill_price_history([("AAPL", "NASDAQ", SATURDAY)], provider, end=TODAY)
+
+    assert again == {}
+    assert provider.requests == [("AAPL", SATURDAY, TODAY)]
+    assert get_price_history_bounds("AAPL") == (SATURDAY, date(2024, 3, 29))
+
+
+def test_save_price_history_counts_inserted_rows(database):
+    closes = {date(2024, 1, 2): Decimal("10"), date(2024, 1, 3): Decimal("11")}
+    assert save_price_history("AAPL", closes) == 2
+    assert save_price_history("AAPL", {**closes, date(2024, 1, 4): Decimal("12")}) == 1
+    assert [close for _, close in load_price_history("AAPL", date(2024, 1, 1), date(2024, 1, 31))] == [
+        Decimal("10"), Decimal("11"), Decimal("12")
+    ]
+
+
+def test_range_query_is_a_single_primary_key_scan(database):
+    plan = db.execute_sql(
+        "EXPLAIN QUERY PLAN SELECT date, close FROM pricehistory WHERE symbol = ? AND date BETWEEN ? AND ? ORDER BY date",
+        ("AAPL", "2020-01-01", "2024-12-31"),
+    ).fetchall()
+    details = " ".join(row[-1] for row in plan)
+    assert "USING PRIMARY KEY" in details
+    assert "TEMP B-TREE" not in details
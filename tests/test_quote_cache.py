@@ -0,0 +1,118 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from core import instrumentation
+from data.repositories import save_quote_snapshots
+from infra.quote_cache import QuoteCache
+
+PAIR = {"symbol": "AAPL", "market": "NASDAQ"}
+
+
+class Fetcher:
+    def __init__(self, price):
+        self.price = price
+        self.calls = []
+
+    def __call__(self, pairs):
+        pairs = list(pairs)
+        self.calls.append([p["symbol"] for p in pairs])
+        if self.price is None:  # upstream unreachable
+            return []
+        return [{"symbol": p["symbol"], "price": self.price, "currency": "USD"} for p in pairs]
+
+
+def _wait_for_refresh(cache, refreshes=1, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while cache.stats()["refreshes"] < refreshes and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_fresh_quotes_are_served_from_memory():
+    fetcher = Fetcher(Decimal("200"))
+    cache = QuoteCache(fetcher, default_ttl=60)
+    list(cache.get_prices([PAIR]))
+    assert list(cache.get_prices([PAIR]))[0]["price"] == Decimal("200")
+    assert len(fetcher.calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_stale_quotes_are_served_while_refreshing():
+    fetcher = Fetcher(Decimal("100"))
+    cache = QuoteCache(fetcher, default_ttl=0.05, max_stale_ttls=100)
+    list(cache.get_prices([PAIR]))
+    time.sleep(0.1)
+    fetcher.price = Decimal("200")
+
+    assert list(cache.get_prices([PAIR]))[0]["price"] == Decimal("100")
+    _wait_for_refresh(cache)
+    assert list(cache.get_prices([PAIR]))[0]["price"] == Decimal("200")
+
+
+def test_stale_quotes_already_refreshing_are_not_counted_as_hits():
+    fetcher = Fetcher(Decimal("100"))
+    cache = QuoteCache(fetcher, default_ttl=0.05, max_stale_ttls=100)
+    list(cache.get_prices([PAIR]))
+    time.sleep(0.1)
+    release = threading.Event()
+    upstream = cache._fetcher
+    cache._fetcher = lambda pairs: release.wait(2) and upstream(pairs)
+
+    was_enabled = instrumentation.is_enabled()
+    instrumentation.reset()
+    instrumentation.enable()
+    try:
+        # The first lookup schedules the refresh; the second finds it in flight.
+        list(cache.get_prices([PAIR]))
+        list(cache.get_prices([PAIR]))
+        counters = instrumentation.snapshot()["cache.quotes"]["counters"]
+    finally:
+        release.set()
+        instrumentation.enable(was_enabled)
+        instrumentation.reset()
+    _wait_for_refresh(cache)
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["stale_hits"], stats["misses"]) == (0, 2, 1)
+    assert (counters["hits"], counters["stale"], counters["misses"]) == (0, 2, 0)
+
+
+def test_quotes_past_max_stale_are_fetched_inline():
+    fetcher = Fetcher(Decimal("100"))
+    cache = QuoteCache(fetcher, default_ttl=0.02, max_stale_ttls=2)
+    list(cache.get_prices([PAIR]))
+    time.sleep(0.1)
+    fetcher.price = Decimal("200")
+
+    assert list(cache.get_prices([PAIR]))[0]["price"] == Decimal("200")
+    stats = cache.stats()
+    assert stats["expired"] == 1 and stats["stale_hits"] == 0
+
+
+def test_old_persisted_snapshot_is_not_served(database):
+    save_quote_snapshots([("AAPL", "NASDAQ", Decimal("100"), "USD", datetime.now() - timedelta(days=30))])
+    fetcher = Fetcher(Decimal("200"))
+    cache = QuoteCache(fetcher, persist=True)
+
+    assert [q["price"] for q in cache.get_prices([PAIR])] == [Decimal("200")]
+    assert fetcher.calls == [["AAPL"]]
+
+
+def test_inline_revalidation_returns_the_fetched_quote(database):
+    save_quote_snapshots([("AAPL", "NASDAQ", Decimal("100"), "USD", datetime.now() - timedelta(seconds=400))])
+    fetcher = Fetcher(Decimal("200"))
+    cache = QuoteCache(fetcher, persist=True, revalidate_inline=True)
+
+    assert [q["price"] for q in cache.get_prices([PAIR])] == [Decimal("200")]
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_inline_revalidation_falls_back_to_the_stale_quote():
+    fetcher = Fetcher(Decimal("100"))
+    cache = QuoteCache(fetcher, default_ttl=0.02, max_stale_ttls=100, revalidate_inline=True)
+    list(cache.get_prices([PAIR]))
+    time.sleep(0.05)
+    fetcher.price = None
+
+    assert [q["price"] for q in cache.get_prices([PAIR])] == [Decimal("100")]
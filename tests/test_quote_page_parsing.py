@@ -0,0 +1,53 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from core.currency import parse_price_currency
+from infra.google_finance_price_provider import _soup_price_text, scan_price_text
+
+PAGES = Path(__file__).parent / "fixtures" / "quote_pages"
+EXPECTED = json.loads((PAGES / "expected.json").read_text(encoding="utf-8"))
+
+
+def _chunks(page, size):
+    return (page[i:i + size] for i in range(0, len(page), size))
+
+
+def _price_text(page, chunk_size):
+    """What get_quote extracts: the streaming scan, with BeautifulSoup as the fallback."""
+    text, read = scan_price_text(_chunks(page, chunk_size))
+    return text or _soup_price_text(read)
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+@pytest.mark.parametrize("chunk_size", [7, 512, 16 * 1024, 1 << 20])
+def test_price_text_matches_fixture(name, chunk_size):
+    page = (PAGES / name).read_bytes()
+    assert _price_text(page, chunk_size) == EXPECTED[name]
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_scan_agrees_with_full_parse(name):
+    page = (PAGES / name).read_bytes()
+    text, _ = scan_price_text(_chunks(page, 16 * 1024))
+    if text is not None:
+        assert text == _soup_price_text(page)
+
+
+def test_scan_stops_reading_at_the_price_node():
+    page = (PAGES / "nasdaq_usd.html").read_bytes()
+    text, read = scan_price_text(_chunks(page, 1024))
+    assert text == "$189.84"
+    assert len(read) < len(page)
+
+
+def test_fixture_currencies():
+    currencies = {name: parse_price_currency(text) for name, text in EXPECTED.items() if text}
+    assert currencies == {
+        "nasdaq_usd.html": "USD",
+        "lon_gbx.html": "GBX",
+        "etr_eur.html": "EUR",
+        "entity_thousands.html": "USD",
+        "single_quoted_class.html": "JPY",
+    }
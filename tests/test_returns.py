@@ -0,0 +1,107 @@
+import math
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from core.returns import compute_returns, xirr_batch
+
+
+def _days(*dates):
+    return [float(d.toordinal()) for d in dates]
+
+
+def test_xirr_excel_example():
+    # The XIRR example from Microsoft's Excel documentation: 0.373362535.
+    amounts = [-10000, 2750, 4250, 3250, 2750]
+    days = _days(date(2008, 1, 1), date(2008, 3, 1), date(2008, 10, 30), date(2009, 2, 15), date(2009, 4, 1))
+    assert xirr_batch([amounts], [days])[0] == pytest.approx(0.373362535, abs=1e-8)
+
+
+def test_xirr_single_year_doubling():
+    assert xirr_batch([[-100, 200]], [[0, 365]])[0] == pytest.approx(1.0)
+
+
+def test_xirr_batch_mixes_lengths_and_unsolvable_series():
+    amounts = [[-100, 110], [-10000, 2750, 4250, 3250, 2750], [100, 50], [-100, -50]]
+    days = [[0, 365], _days(date(2008, 1, 1), date(2008, 3, 1), date(2008, 10, 30), date(2009, 2, 15), date(2009, 4, 1)),
+            [0, 365], [0, 365]]
+    rates = xirr_batch(amounts, days)
+    assert rates[0] == pytest.approx(0.10)
+    assert rates[1] == pytest.approx(0.373362535, abs=1e-8)
+    # No sign change, no rate.
+    assert np.isnan(rates[2]) and np.isnan(rates[3])
+
+
+def test_xirr_converges_for_extreme_rates():
+    # A 99% loss and a 1000x gain, both inside XIRR_MAX_ITERATIONS.
+    rates = xirr_batch([[-100, 1], [-1, 1000]], [[0, 365], [0, 365]])
+    assert rates == pytest.approx([-0.99, 999.0], rel=1e-8)
+
+
+def test_single_purchase_twr_and_xirr():
+    purchases = [{"symbol": "AAA", "market": "NYSE", "quantity": Decimal("2"), "cost": Decimal("50"),
+                  "purchase_date": "2023-01-01"}]
+    results, portfolio = compute_returns(purchases, {}, {"AAA": Decimal("55")}, valuation_date=date(2024, 1, 1))
+
+    (metrics,) = results
+    assert metrics.nominal_twr == pytest.approx(0.10)
+    assert metrics.nominal_xirr == pytest.approx(0.10)
+    # Without CPI data real returns equal nominal ones.
+    assert metrics.real_twr == pytest.approx(0.10)
+    assert portfolio.nominal_twr == pytest.approx(0.10)
+
+
+def test_real_returns_remove_inflation():
+    purchases = [{"symbol": "AAA", "market": "NYSE", "quantity": Decimal("1"), "cost": Decimal("100"),
+                  "purchase_date": "2023-01-15"}]
+    cpi = {"2023-01": Decimal("100"), "2024-01": Decimal("105")}
+    (metrics,), _ = compute_returns(purchases, cpi, {"AAA": Decimal("110")}, valuation_date=date(2024, 1, 15))
+
+    assert metrics.real_twr == pytest.approx(1.10 / 1.05 - 1)
+    assert metrics.real_xirr == pytest.approx(1.10 / 1.05 - 1, rel=1e-6)
+
+
+def test_twr_ignores_the_timing_of_contributions():
+    # Price goes 10 -> 20 -> 10; buying more at 20 hurts XIRR but not TWR (which is 0).
+    purchases = [
+        {"symbol": "AAA", "market": "NYSE", "quantity": Decimal("1"), "cost": Decimal("10"), "purchase_date": "2023-01-01"},
+        {"symbol": "AAA", "market": "NYSE", "quantity": Decimal("10"), "cost": Decimal("20"), "purchase_date": "2023-07-01"},
+    ]
+    (metrics,), _ = compute_returns(purchases, {}, {"AAA": Decimal("10")}, valuation_date=date(2024, 1, 1))
+    assert metrics.nominal_twr == pytest.approx(0.0, abs=1e-12)
+    assert metrics.nominal_xirr < -0.5
+
+
+def test_unpriced_symbols_get_nan_and_are_left_out():
+    purchases = [
+        {"symbol": "AAA", "market": "NYSE", "quantity": Decimal("1"), "cost": Decimal("100"), "purchase_date": "2023-01-01"},
+        {"symbol": "BBB", "market": "NYSE", "quantity": Decimal("1"), "cost": Decimal("100"), "purchase_date": "2023-01-01"},
+    ]
+    results, portfolio = compute_returns(purchases, {}, {"AAA": Decimal("110")}, valuation_date=date(2024, 1, 1))
+    assert math.isnan(results[1].nominal_xirr)
+    assert portfolio.nominal_twr == pytest.approx(0.10)
+
+
+def test_sold_out_symbol_needs_no_current_price():
+    purchases = [{"symbol": "AAA", "market": "NYSE", "quantity": Decimal("2"), "cost": Decimal("50"),
+                  "purchase_date": "2023-01-01"}]
+    sales = [{"symbol": "AAA", "quantity": Decimal("2"), "price": Decimal("55"), "sale_date": "2024-01-01", "lot_id": None}]
+    (metrics,), portfolio = compute_returns(purchases, {}, {}, valuation_date=date(2024, 6, 1), sales=sales)
+
+    assert metrics.nominal_twr == pytest.approx(0.10)
+    assert metrics.nominal_xirr == pytest.approx(0.10)
+    assert portfolio.nominal_xirr == pytest.approx(0.10)
+
+
+def test_sale_proceeds_are_a_cash_flow_and_only_held_shares_are_valued():
+    purchases = [{"symbol": "AAA", "market": "NYSE", "quantity": Decimal("2"), "cost": Decimal("50"),
+                  "purchase_date": "2023-01-01"}]
+    sales = [{"symbol": "AAA", "quantity": Decimal("1"), "price": Decimal("55"), "sale_date": "2023-07-01", "lot_id": None}]
+    (metrics,), _ = compute_returns(purchases, {}, {"AAA": Decimal("60.5")}, valuation_date=date(2024, 1, 1), sales=sales)
+
+    # 10% up to the sale, then 10% on the share left.
+    assert metrics.nominal_twr == pytest.approx(0.21)
+    days = _days(date(2023, 1, 1), date(2023, 7, 1), date(2024, 1, 1))
+    assert metrics.nominal_xirr == pytest.approx(xirr_batch([[-100, 55, 60.5]], [days])[0])
@@ -0,0 +1,80 @@
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from core.timeline import build_value_timeline
+from data.repositories import load_month_end_closes, save_price_history
+
+
+def lot(purchase_id, symbol, quantity, cost, purchase_date):
+    return {"purchase_id": purchase_id, "symbol": symbol, "market": "NYSE", "quantity": Decimal(quantity),
+            "cost": Decimal(cost), "purchase_date": purchase_date}
+
+
+PURCHASES = [
+    lot(1, "AAA", 2, 50, "2023-01-05"),
+    lot(2, "BBB", 1, 100, "2023-03-01"),
+    lot(3, "AAA", 1, 60, "2023-03-20"),
+]
+
+
+def test_invested_is_the_running_total_of_cost():
+    timeline = build_value_timeline(PURCHASES, {}, {}, end_month="2023-04")
+
+    assert timeline.months == ["2023-01", "2023-02", "2023-03", "2023-04"]
+    np.testing.assert_allclose(timeline.nominal_invested, [100, 100, 260, 260])
+    # Without CPI, real equals nominal.
+    np.testing.assert_allclose(timeline.real_invested, [100, 100, 260, 260])
+
+
+def test_missing_cpi_months_carry_the_last_value_forward():
+    timeline = build_value_timeline(PURCHASES, {"2023-01": Decimal(100), "2023-03": Decimal(120)}, {}, end_month="2023-04")
+
+    # February reuses January's 100; March's 160 is already in March money.
+    np.testing.assert_allclose(timeline.real_invested, [100, 100, 120 + 160, 120 + 160])
+
+
+def test_months_before_the_first_cpi_observation_borrow_it():
+    timeline = build_value_timeline(PURCHASES, {"2023-02": Decimal(100), "2023-04": Decimal(110)}, {}, end_month="2023-04")
+
+    np.testing.assert_allclose(timeline.real_invested, [100, 100, 260, 286])
+
+
+def test_market_value_uses_month_end_closes_and_carries_them_over_gaps(database):
+    save_price_history("AAA", {
+        date(2023, 1, 13): Decimal(40),
+        date(2023, 1, 31): Decimal(45),
+        date(2023, 3, 31): Decimal(55),
+    })
+    closes = load_month_end_closes(["AAA", "BBB"])
+    assert closes == {"AAA": {"2023-01": Decimal(45), "2023-03": Decimal(55)}}
+
+    timeline = build_value_timeline(PURCHASES, {}, {"AAA": Decimal(70)}, closes, end_month="2023-04")
+
+    # AAA: 2 x 45, February has no close so 45 again, then 3 x 55 and 3 x 70 now.
+    # BBB has no closes or quote, so it stays at its purchase price of 100.
+    np.testing.assert_allclose(timeline.market_value, [90, 90, 165 + 100, 210 + 100])
+
+
+def test_sold_shares_leave_at_their_lot_cost():
+    purchases = [lot(1, "AAA", 10, 10, "2023-01-10")]
+    sales = [{"symbol": "AAA", "quantity": Decimal(4), "price": Decimal(15), "sale_date": "2023-03-20", "lot_id": None}]
+    cpi = {"2023-01": Decimal(100), "2023-03": Decimal(110)}
+
+    timeline = build_value_timeline(purchases, cpi, {"AAA": Decimal(20)}, end_month="2023-04", sales=sales)
+
+    assert timeline.months == ["2023-01", "2023-02", "2023-03", "2023-04"]
+    np.testing.assert_allclose(timeline.nominal_invested, [100, 100, 60, 60])
+    # The 6 shares left cost 60 in January money, restated at CPI 110.
+    np.testing.assert_allclose(timeline.real_invested, [100, 100, 66, 66])
+    # Marked at the sale price in March and the current price at the end.
+    np.testing.assert_allclose(timeline.market_value, [100, 100, 90, 120])
+
+
+def test_oversold_timeline_raises():
+    sales = [{"symbol": "AAA", "quantity": Decimal(11), "price": Decimal(15), "sale_date": "2023-03-20", "lot_id": None}]
+
+    with pytest.raises(ValueError, match="exceeds"):
+        build_value_timeline([lot(1, "AAA", 10, 10, "2023-01-10")], {}, {}, end_month="2023-04", sales=sales)